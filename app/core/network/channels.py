@@ -0,0 +1,56 @@
+# app/core/network/channels.py
+# Классы data channel между хостом и клиентом.
+#
+# RELIABLE - надежный упорядоченный канал: ходы, состояние, чат и служебные
+# сообщения. EPHEMERAL - неупорядоченный, без повторных передач
+# (maxRetransmits=0): карта под курсором, перетаскивание, "печатает...",
+# пинги. Потерянное эфемерное сообщение уже не нужно, а в общем канале
+# его повторная передача задерживала бы следующие за ним ходы.
+#
+# aiortc отправляет сообщения всех каналов соединения через одну очередь
+# SCTP, поэтому эфемерные сообщения не ставятся в очередь: сообщение
+# отправляется, только пока буфер эфемерного канала ниже
+# EPHEMERAL_BUFFER_LIMIT, иначе отбрасывается. Перед ходом в очереди
+# не может оказаться больше этого объема вспомогательного трафика.
+
+RELIABLE = 'reliable'
+EPHEMERAL = 'ephemeral'
+CHANNEL_CLASSES = (RELIABLE, EPHEMERAL)
+
+_LABELS = {RELIABLE: 'game_channel', EPHEMERAL: 'game_ephemeral'}
+_OPTIONS = {RELIABLE: {}, EPHEMERAL: {'ordered': False, 'maxRetransmits': 0}}
+
+# Типы сообщений, которые по умолчанию идут эфемерным каналом
+EPHEMERAL_TYPES = frozenset({'hover', 'drag', 'cursor', 'typing', 'ping', 'pong'})
+EPHEMERAL_BUFFER_LIMIT = 16 * 1024
+
+# Результат отправки эфемерного сообщения, не принятого каналом
+DROPPED = 'dropped'
+
+
+def create_channels(pc, suffix=None):
+    """Каналы всех классов на соединении хоста: {класс: RTCDataChannel}"""
+    return {channel_class: pc.createDataChannel(
+                _LABELS[channel_class] if suffix is None else f"{_LABELS[channel_class]}_{suffix}",
+                **_OPTIONS[channel_class])
+            for channel_class in CHANNEL_CLASSES}
+
+
+def label_class(label):
+    """Класс канала по его метке (на стороне клиента каналы создает хост)"""
+    return EPHEMERAL if label.startswith(_LABELS[EPHEMERAL]) else RELIABLE
+
+
+def message_class(message_data, channel_class=None):
+    """Канал для сообщения: явный или по типу сообщения"""
+    if channel_class is not None:
+        return channel_class
+    return EPHEMERAL if message_data.get('type') in EPHEMERAL_TYPES else RELIABLE
+
+
+def send_ephemeral(channel, payload):
+    """Отправка без очереди; False - канал не открыт или занят, сообщение отброшено"""
+    if channel is None or channel.readyState != 'open' or channel.bufferedAmount >= EPHEMERAL_BUFFER_LIMIT:
+        return False
+    channel.send(payload)
+    return True
@@ -0,0 +1,92 @@
+# app/core/network/framing.py
+# Разбиение больших сообщений data channel на части и их сборка.
+#
+# Некоторые реализации SCTP не принимают сообщения больше 16-64 КБ, а полный
+# снимок, повтор партии или догрузка после переподключения бывают больше.
+# Сообщение длиннее CHUNK_SIZE уходит частями:
+#   байт 0  - CHUNK_MAGIC (не совпадает ни с JSON, ни с game_codec.MAGIC);
+#   4 байта - id сообщения, 4 байта - полная длина, 4 байта - смещение части;
+#   далее   - байты части.
+# Части одного сообщения идут по порядку в надежном канале, но между ними
+# могут оказаться другие сообщения (в том числе части другого сообщения).
+# Получатель собирает сообщение в заранее выделенный bytearray записью
+# через memoryview - без повторных склеек.
+
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+CHUNK_MAGIC = 0xC0
+CHUNK_HEADER = struct.Struct('!BIII')
+CHUNK_SIZE = 16 * 1024  # размер кадра вместе с заголовком
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+MAX_PARTIAL_MESSAGES = 8  # одновременно собираемых сообщений от одного пира
+
+_CHUNK_BODY = CHUNK_SIZE - CHUNK_HEADER.size
+
+
+def needs_chunking(payload):
+    return len(payload) > CHUNK_SIZE
+
+
+def iter_chunks(message_id, payload):
+    """Кадры сообщения по порядку; тело каждого кадра копируется один раз"""
+    view = memoryview(payload)
+    total = len(payload)
+    for offset in range(0, total, _CHUNK_BODY):
+        yield chunk_frame(message_id, view, offset)
+
+
+def chunk_frame(message_id, view, offset):
+    """Кадр части сообщения view (memoryview всего сообщения), начиная с offset"""
+    header = CHUNK_HEADER.pack(CHUNK_MAGIC, message_id, len(view), offset)
+    return b''.join((header, view[offset:offset + _CHUNK_BODY]))
+
+
+def next_offset(offset, total):
+    """Смещение следующей части или None после последней"""
+    offset += _CHUNK_BODY
+    return offset if offset < total else None
+
+
+class Reassembler:
+    """Сборка сообщений из частей для одного пира"""
+
+    def __init__(self):
+        self.partial = {}  # {message_id: [bytearray, memoryview, получено байт]}
+
+    def feed(self, data):
+        """
+        Кадр из канала -> готовое сообщение или None (часть еще не собранного).
+        Обычные сообщения возвращаются как есть, собранные - как bytearray.
+        """
+        if isinstance(data, str) or not data or data[0] != CHUNK_MAGIC:
+            return data
+        if len(data) < CHUNK_HEADER.size:
+            raise ValueError("Truncated chunk header")
+        _, message_id, total, offset = CHUNK_HEADER.unpack_from(data)
+        body = memoryview(data)[CHUNK_HEADER.size:]
+        entry = self.partial.get(message_id)
+        if entry is None:
+            if total > MAX_MESSAGE_SIZE:
+                raise ValueError(f"Chunked message too large: {total} bytes")
+            if len(self.partial) >= MAX_PARTIAL_MESSAGES:
+                raise ValueError("Too many partial messages")
+            buffer = bytearray(total)
+            entry = self.partial[message_id] = [buffer, memoryview(buffer), 0]
+        buffer, view, received = entry
+        end = offset + len(body)
+        if len(buffer) != total or end > total:
+            del self.partial[message_id]
+            raise ValueError(f"Inconsistent chunk for message {message_id}")
+        view[offset:end] = body
+        entry[2] = received = received + len(body)
+        if received < total:
+            return None
+        del self.partial[message_id]
+        view.release()
+        return buffer
+
+    def clear(self):
+        self.partial.clear()
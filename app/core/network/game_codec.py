@@ -0,0 +1,450 @@
+# app/core/network/game_codec.py
+# Компактный бинарный формат игровых сообщений data channel (P2PHost/P2PClient).
+#
+# Формат версии 1:
+#   байт 0 - 0x80 | VERSION (JSON не может начинаться с такого байта,
+#            поэтому получатель различает форматы по первому байту);
+#   байт 1 - тег типа сообщения (MESSAGE_TAGS);
+#   varint - seq + 1 (0 - в сообщении нет seq);
+#   тело   - поля типа в фиксированном порядке:
+#     карта  - один байт: масть << 4 | достоинство (SUITS, VALUES);
+#     масть  - один байт, NO_SUIT - нет;
+#     игрок  - UUID 16 байтами (после байта 0) или varint(длина + 1) + UTF-8;
+#              в состоянии атакующий/защищающийся - индекс в списке игроков;
+#     числа  - varint (LEB128 без знака).
+#   game_delta - varint числа операций, каждая: байт op << 4 | поле
+#     (DELTA_OPS, DELTA_FIELDS) и значение поля в том же виде, что в game_state
+#     (атакующий/защищающийся - байт наличия и игрок).
+#
+# Сообщения других типов и сообщения с полями вне схемы кодируются как JSON
+# (UTF-8) - decode_message понимает оба формата. WIRE_FORMAT=json
+# (переменная окружения FOOL_WIRE_FORMAT) отправляет все в JSON для отладки.
+
+import json
+import os
+
+VERSION = 1
+MAGIC = 0x80 | VERSION
+
+JSON = 'json'
+BINARY = 'binary'
+WIRE_FORMAT = os.environ.get('FOOL_WIRE_FORMAT', BINARY).lower()
+
+SUITS = ('♠', '♥', '♦', '♣')
+VALUES = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+MOVE_ACTIONS = ('attack', 'defend', 'throw_in', 'take', 'pass')
+NO_CARD = 0xFF
+NO_SUIT = 0xFF
+NO_PLAYER = 0xFF
+
+MESSAGE_TAGS = {'game_started': 1, 'game_state': 2, 'move_processed': 3, 'move': 4, 'game_delta': 5}
+_TAG_TYPES = {tag: message_type for message_type, tag in MESSAGE_TAGS.items()}
+
+_CARD_CODES = {(value, suit): suit_index << 4 | value_index
+               for suit_index, suit in enumerate(SUITS) for value_index, value in enumerate(VALUES)}
+_CARDS = {code: card for card, code in _CARD_CODES.items()}
+_SUIT_CODES = {suit: index for index, suit in enumerate(SUITS)}
+_ACTION_CODES = {action: index for index, action in enumerate(MOVE_ACTIONS)}
+
+# Поля каждого типа (кроме type и seq); сообщение с другими полями уходит в JSON
+_FIELDS = {
+    'game_started': frozenset(('players', 'attacker', 'defender', 'trump_suit')),
+    'game_state': frozenset(('game_started', 'players', 'hands_count', 'table', 'discard',
+                             'trump_suit', 'attacker', 'defender')),
+    'move_processed': frozenset(('player', 'data')),
+    'move': frozenset(('action', 'cards')),
+    'game_delta': frozenset(('ops',)),
+}
+# Операции и поля дельты состояния (games.base.state_delta)
+DELTA_OPS = ('set', 'merge', 'append', 'del')
+DELTA_FIELDS = ('game_started', 'players', 'hands_count', 'table', 'discard',
+                'trump_suit', 'attacker', 'defender')
+_DELTA_OP_CODES = {op: index for index, op in enumerate(DELTA_OPS)}
+_DELTA_FIELD_CODES = {field: index for index, field in enumerate(DELTA_FIELDS)}
+_MOVE_FIELDS = frozenset(('action', 'cards'))
+_CARD_FIELDS = frozenset(('value', 'suit'))
+
+
+def encode_message(message_data, wire_format=None):
+    """dict -> bytes для data channel"""
+    if (wire_format or WIRE_FORMAT) == BINARY:
+        encoded = _encode_binary(message_data)
+        if encoded is not None:
+            return encoded
+    return json.dumps(message_data, ensure_ascii=False).encode('utf-8')
+
+
+def decode_message(data):
+    """bytes/bytearray/str из data channel -> dict (бинарный формат или JSON)"""
+    if isinstance(data, str):
+        return json.loads(data)
+    if data and data[0] & 0x80:
+        if data[0] != MAGIC:
+            raise ValueError(f"Unsupported game codec version: {data[0] & 0x7F}")
+        return _decode_binary(data)
+    return json.loads(data)
+
+
+# --- Кодирование ---
+
+def _encode_binary(message):
+    message_type = message.get('type')
+    tag = MESSAGE_TAGS.get(message_type)
+    if tag is None:
+        return None
+    fields = _FIELDS[message_type]
+    keys = message.keys()
+    if len(keys) != len(fields) + 1 + ('seq' in message) or not fields <= keys:
+        return None
+    out = bytearray((MAGIC, tag))
+    if 'seq' in message:
+        # seq: None или не целое не пережило бы декодирование - такие идут в JSON
+        seq = message['seq']
+        if type(seq) is not int or seq < 0:
+            return None
+        _put_varint(out, seq + 1)
+    else:
+        _put_varint(out, 0)
+    try:
+        _ENCODERS[message_type](out, message)
+    except (KeyError, ValueError, TypeError, AttributeError, OverflowError):
+        return None  # значения вне схемы - отправляем JSON
+    return bytes(out)
+
+
+def _put_varint(out, value):
+    if value < 0:
+        raise ValueError("varint must be non-negative")
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+# За столом не больше нескольких игроков, их id повторяются в каждом
+# сообщении - закодированные id кэшируются в обе стороны
+_PLAYER_CACHE_SIZE = 1024
+_player_bytes = {}  # {player_id: bytes}
+_player_ids = {}    # {bytes UUID: player_id}
+
+
+def _encode_player(player_id):
+    if len(player_id) == 36 and player_id[8] == player_id[13] == player_id[18] == player_id[23] == '-':
+        try:
+            packed = bytes.fromhex(player_id.replace('-', ''))
+        except ValueError:
+            packed = None
+        if packed is not None and packed.hex() == player_id.replace('-', ''):
+            return b'\x00' + packed
+    encoded = player_id.encode('utf-8')
+    out = bytearray()
+    _put_varint(out, len(encoded) + 1)
+    return bytes(out + encoded)
+
+
+def _put_player(out, player_id):
+    encoded = _player_bytes.get(player_id)
+    if encoded is None:
+        if len(_player_bytes) >= _PLAYER_CACHE_SIZE:
+            _player_bytes.clear()
+        encoded = _player_bytes[player_id] = _encode_player(player_id)
+    out += encoded
+
+
+def _put_players(out, players):
+    _put_varint(out, len(players))
+    for player_id in players:
+        _put_player(out, player_id)
+
+
+def _card_code(card):
+    # Другие ключи карты (id и т.п.) формат не несет - такое сообщение идет в JSON
+    if card.keys() != _CARD_FIELDS:
+        raise ValueError("unexpected card fields")
+    return _CARD_CODES[(card['value'], card['suit'])]
+
+
+def _put_cards(out, cards):
+    _put_varint(out, len(cards))
+    out += bytes(_card_code(card) for card in cards)
+
+
+def _player_index(players, player_id):
+    return NO_PLAYER if player_id is None else players.index(player_id)
+
+
+def _suit_code(suit):
+    return NO_SUIT if suit is None else _SUIT_CODES[suit]
+
+
+def _encode_game_started(out, message):
+    players = message['players']
+    _put_players(out, players)
+    out.append(_player_index(players, message['attacker']))
+    out.append(_player_index(players, message['defender']))
+    out.append(_suit_code(message['trump_suit']))
+
+
+def _encode_game_state(out, message):
+    players = message['players']
+    hands_count = message['hands_count']
+    if len(hands_count) != len(players):
+        raise ValueError("hands_count does not match players")
+    out.append(1 if message['game_started'] else 0)
+    _put_players(out, players)
+    out += bytes(hands_count[player_id] for player_id in players)
+    _put_table(out, message['table'])
+    _put_varint(out, message['discard'])
+    out.append(_suit_code(message['trump_suit']))
+    out.append(_player_index(players, message['attacker']))
+    out.append(_player_index(players, message['defender']))
+
+
+def _put_table(out, table):
+    _put_varint(out, len(table))
+    for pair in table:
+        if len(pair) != 2:
+            raise ValueError("unexpected table entry")
+        attack, defense = pair['attack'], pair['defense']
+        out.append(_card_code(attack))
+        out.append(NO_CARD if defense is None else _card_code(defense))
+
+
+def _encode_move_body(out, move):
+    if move.keys() != _MOVE_FIELDS:
+        raise ValueError("unexpected move fields")
+    out.append(_ACTION_CODES[move['action']])
+    _put_cards(out, move['cards'])
+
+
+def _encode_move_processed(out, message):
+    _put_player(out, message['player'])
+    _encode_move_body(out, message['data'])
+
+
+def _encode_move(out, message):
+    out.append(_ACTION_CODES[message['action']])
+    _put_cards(out, message['cards'])
+
+
+def _put_hands_count(out, hands_count):
+    _put_varint(out, len(hands_count))
+    for player_id, count in hands_count.items():
+        _put_player(out, player_id)
+        out.append(count)
+
+
+def _put_optional_player(out, player_id):
+    if player_id is None:
+        out.append(0)
+    else:
+        out.append(1)
+        _put_player(out, player_id)
+
+
+def _put_delta_value(out, op, field, value):
+    if op == 'del':
+        return
+    if op == 'merge' and field != 'hands_count' or op == 'append' and field != 'table':
+        raise ValueError(f"unsupported delta op {op} for {field}")
+    if field == 'game_started':
+        out.append(1 if value else 0)
+    elif field == 'players':
+        _put_players(out, value)
+    elif field == 'hands_count':
+        _put_hands_count(out, value)
+    elif field == 'table':
+        _put_table(out, value)
+    elif field == 'discard':
+        _put_varint(out, value)
+    elif field == 'trump_suit':
+        out.append(_suit_code(value))
+    else:
+        _put_optional_player(out, value)
+
+
+def _encode_game_delta(out, message):
+    ops = message['ops']
+    _put_varint(out, len(ops))
+    for op, field, value in ops:
+        out.append(_DELTA_OP_CODES[op] << 4 | _DELTA_FIELD_CODES[field])
+        _put_delta_value(out, op, field, value)
+
+
+_ENCODERS = {
+    'game_started': _encode_game_started,
+    'game_state': _encode_game_state,
+    'move_processed': _encode_move_processed,
+    'move': _encode_move,
+    'game_delta': _encode_game_delta,
+}
+
+
+# --- Декодирование ---
+
+def _get_varint(data, pos):
+    value = data[pos]
+    pos += 1
+    if value < 0x80:
+        return value, pos
+    value &= 0x7F
+    shift = 7
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _get_player(data, pos):
+    length, pos = _get_varint(data, pos)
+    if length == 0:
+        packed = bytes(data[pos:pos + 16])
+        player_id = _player_ids.get(packed)
+        if player_id is None:
+            if len(_player_ids) >= _PLAYER_CACHE_SIZE:
+                _player_ids.clear()
+            h = packed.hex()
+            player_id = _player_ids[packed] = f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+        return player_id, pos + 16
+    end = pos + length - 1
+    return data[pos:end].decode('utf-8'), end
+
+
+def _get_players(data, pos):
+    count, pos = _get_varint(data, pos)
+    players = []
+    for _ in range(count):
+        player_id, pos = _get_player(data, pos)
+        players.append(player_id)
+    return players, pos
+
+
+def _card(code):
+    value, suit = _CARDS[code]
+    return {'value': value, 'suit': suit}
+
+
+def _get_cards(data, pos):
+    count, pos = _get_varint(data, pos)
+    end = pos + count
+    return [_card(code) for code in data[pos:end]], end
+
+
+def _player_at(players, index):
+    return None if index == NO_PLAYER else players[index]
+
+
+def _suit(code):
+    return None if code == NO_SUIT else SUITS[code]
+
+
+def _decode_game_started(data, pos, message):
+    players, pos = _get_players(data, pos)
+    message['players'] = players
+    message['attacker'] = _player_at(players, data[pos])
+    message['defender'] = _player_at(players, data[pos + 1])
+    message['trump_suit'] = _suit(data[pos + 2])
+
+
+def _get_table(data, pos):
+    count, pos = _get_varint(data, pos)
+    table = []
+    for _ in range(count):
+        defense = data[pos + 1]
+        table.append({'attack': _card(data[pos]), 'defense': None if defense == NO_CARD else _card(defense)})
+        pos += 2
+    return table, pos
+
+
+def _decode_game_state(data, pos, message):
+    message['game_started'] = bool(data[pos])
+    players, pos = _get_players(data, pos + 1)
+    message['players'] = players
+    message['hands_count'] = dict(zip(players, data[pos:pos + len(players)]))
+    pos += len(players)
+    message['table'], pos = _get_table(data, pos)
+    message['discard'], pos = _get_varint(data, pos)
+    message['trump_suit'] = _suit(data[pos])
+    message['attacker'] = _player_at(players, data[pos + 1])
+    message['defender'] = _player_at(players, data[pos + 2])
+
+
+def _decode_move_processed(data, pos, message):
+    message['player'], pos = _get_player(data, pos)
+    message['data'] = _get_move(data, pos)
+
+
+def _decode_move(data, pos, message):
+    message.update(_get_move(data, pos))
+
+
+def _get_move(data, pos):
+    action = MOVE_ACTIONS[data[pos]]
+    cards, _ = _get_cards(data, pos + 1)
+    return {'action': action, 'cards': cards}
+
+
+def _get_hands_count(data, pos):
+    count, pos = _get_varint(data, pos)
+    hands_count = {}
+    for _ in range(count):
+        player_id, pos = _get_player(data, pos)
+        hands_count[player_id] = data[pos]
+        pos += 1
+    return hands_count, pos
+
+
+def _get_delta_value(data, pos, field):
+    if field == 'game_started':
+        return bool(data[pos]), pos + 1
+    if field == 'players':
+        return _get_players(data, pos)
+    if field == 'hands_count':
+        return _get_hands_count(data, pos)
+    if field == 'table':
+        return _get_table(data, pos)
+    if field == 'discard':
+        return _get_varint(data, pos)
+    if field == 'trump_suit':
+        return _suit(data[pos]), pos + 1
+    if not data[pos]:
+        return None, pos + 1
+    return _get_player(data, pos + 1)
+
+
+def _decode_game_delta(data, pos, message):
+    count, pos = _get_varint(data, pos)
+    ops = []
+    for _ in range(count):
+        op, field = DELTA_OPS[data[pos] >> 4], DELTA_FIELDS[data[pos] & 0x0F]
+        pos += 1
+        if op == 'del':
+            value = None
+        else:
+            value, pos = _get_delta_value(data, pos, field)
+        ops.append([op, field, value])
+    message['ops'] = ops
+
+
+_DECODERS = {
+    'game_started': _decode_game_started,
+    'game_state': _decode_game_state,
+    'move_processed': _decode_move_processed,
+    'move': _decode_move,
+    'game_delta': _decode_game_delta,
+}
+
+
+def _decode_binary(data):
+    message_type = _TAG_TYPES.get(data[1])
+    if message_type is None:
+        raise ValueError(f"Unknown game message tag: {data[1]}")
+    message = {'type': message_type}
+    seq, pos = _get_varint(data, 2)
+    if seq:
+        message['seq'] = seq - 1
+    _DECODERS[message_type](data, pos, message)
+    return message
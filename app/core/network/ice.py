@@ -0,0 +1,70 @@
+# app/core/network/ice.py
+# Преобразование ICE-кандидатов между сигнальными сообщениями и aiortc.
+# В сигнале кандидат передается как в браузерном RTCIceCandidateInit:
+# {'type': 'ice_candidate', 'candidate': 'candidate:...', 'sdpMid': '0', 'sdpMLineIndex': 0};
+# пустой 'candidate' означает конец кандидатов (end-of-candidates).
+#
+# Trickle ICE: aiortc не генерирует событие icecandidate - все локальные
+# кандидаты собираются внутри setLocalDescription. Поэтому P2PHost/P2PClient
+# отправляют offer/answer сразу после createOffer/createAnswer (ice-ufrag/pwd
+# и fingerprint в нем уже есть), собирают кандидатов параллельно со второй
+# стороной и досылают их отдельными сигналами ice_candidate.
+
+from aiortc.sdp import SessionDescription, candidate_from_sdp, candidate_to_sdp
+
+
+def candidate_from_signal(candidate_data):
+    """dict из сигнала -> aiortc.RTCIceCandidate; None - конец кандидатов"""
+    sdp = candidate_data.get('candidate')
+    if not sdp:
+        return None
+    if sdp.startswith('candidate:'):
+        sdp = sdp[len('candidate:'):]
+    candidate = candidate_from_sdp(sdp)
+    candidate.sdpMid = candidate_data.get('sdpMid')
+    candidate.sdpMLineIndex = candidate_data.get('sdpMLineIndex')
+    return candidate
+
+
+def candidate_to_signal(candidate, sdp_mid, sdp_mline_index):
+    """aiortc.RTCIceCandidate (None - конец кандидатов) -> dict для send_signal"""
+    return {
+        'type': 'ice_candidate',
+        'candidate': f"candidate:{candidate_to_sdp(candidate)}" if candidate is not None else '',
+        'sdpMid': sdp_mid,
+        'sdpMLineIndex': sdp_mline_index
+    }
+
+
+def local_candidates(description):
+    """
+    Сигналы ice_candidate для всех кандидатов из локального описания
+    (RTCPeerConnection.localDescription после сбора) и конец кандидатов
+    для каждой m-строки.
+    """
+    signals = []
+    for index, media in enumerate(SessionDescription.parse(description.sdp).media):
+        for candidate in media.ice_candidates:
+            signals.append(candidate_to_signal(candidate, media.rtp.muxId, index))
+        signals.append(candidate_to_signal(None, media.rtp.muxId, index))
+    return signals
+
+
+async def add_candidate(pc, pending, candidate_data):
+    """
+    Добавление удаленного кандидата в соединение. Кандидаты, пришедшие раньше
+    удаленного описания (offer/answer), aiortc принимать не должен - они
+    копятся в pending до flush_candidates.
+    :return: True, если кандидат добавлен сразу
+    """
+    if pc is None or pc.remoteDescription is None:
+        pending.append(candidate_data)
+        return False
+    await pc.addIceCandidate(candidate_from_signal(candidate_data))
+    return True
+
+
+async def flush_candidates(pc, pending):
+    """Добавление накопленных ранних кандидатов после setRemoteDescription"""
+    while pending:
+        await pc.addIceCandidate(candidate_from_signal(pending.pop(0)))
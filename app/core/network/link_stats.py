@@ -0,0 +1,133 @@
+# app/core/network/link_stats.py
+# Качество канала до пира: пинг/понг поверх data channel и счетчики трафика.
+#
+# Каждая сторона раз в PING_INTERVAL отправляет {'type': 'ping', 'id': N}
+# эфемерным каналом (без повторов - потеря видна как потеря) и отвечает
+# на чужие пинги {'type': 'pong', 'id': N}. По понгам считаются сглаженные
+# (EWMA) RTT и джиттер - как в TCP/RTP, пинг без ответа за PING_TIMEOUT
+# считается потерянным (в том числе отброшенный из-за занятого канала).
+# Пир, от которого DEAD_PEER_TIMEOUT не пришло ни одного сообщения, считается
+# отключенным - не дожидаясь connectionstatechange aiortc (проверка
+# согласия ICE замечает обрыв только через десятки секунд).
+
+import time
+
+PING_INTERVAL = 1.0
+PING_TIMEOUT = 3.0
+DEAD_PEER_TIMEOUT = 5.0
+
+RTT_GAIN = 1 / 8      # как SRTT в TCP
+JITTER_GAIN = 1 / 16  # как джиттер в RTP
+RATE_GAIN = 1 / 4
+
+PING = 'ping'
+PONG = 'pong'
+
+
+def pong_for(ping):
+    """Ответ на пинг пира"""
+    return {'type': PONG, 'id': ping.get('id')}
+
+
+class LinkStats:
+    """RTT, джиттер, потери и трафик одного соединения"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        now = clock()
+        self.rtt = None       # сглаженный RTT, с
+        self.rtt_min = None
+        self.jitter = 0.0     # сглаженное отклонение соседних RTT, с
+        self._last_sample = None  # предыдущий измеренный RTT, с
+        self.pings_sent = 0
+        self.pongs_received = 0
+        self.pings_lost = 0
+        self.outstanding = {}  # {ping_id: время отправки}
+        self._next_ping_id = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.rate_in = 0.0    # байт/с, EWMA по интервалам tick
+        self.rate_out = 0.0
+        self.buffered_amount = 0
+        self.buffered_amount_max = 0
+        self.last_heard = now
+        self._last_tick = (now, 0, 0)
+
+    def received(self, size):
+        """Сообщение от пира (любое, в том числе часть большого)"""
+        self.messages_in += 1
+        self.bytes_in += size
+        self.last_heard = self.clock()
+
+    def sent(self, size):
+        self.messages_out += 1
+        self.bytes_out += size
+
+    def make_ping(self):
+        ping_id = self._next_ping_id
+        self._next_ping_id = (ping_id + 1) & 0xFFFFFFFF
+        self.outstanding[ping_id] = self.clock()
+        self.pings_sent += 1
+        return {'type': PING, 'id': ping_id}
+
+    def handle_pong(self, pong):
+        """Учет понга; поздний (уже потерянный) или чужой понг игнорируется"""
+        sent_at = self.outstanding.pop(pong.get('id'), None)
+        if sent_at is None:
+            return
+        sample = self.clock() - sent_at
+        self.pongs_received += 1
+        if self.rtt is None:
+            self.rtt = sample
+        else:
+            # Как в RTP (RFC 3550): разница с предыдущим замером, а не со сглаженным RTT
+            self.jitter += (abs(sample - self._last_sample) - self.jitter) * JITTER_GAIN
+            self.rtt += (sample - self.rtt) * RTT_GAIN
+        self._last_sample = sample
+        self.rtt_min = sample if self.rtt_min is None else min(self.rtt_min, sample)
+
+    def tick(self, buffered_amount=0):
+        """Периодический учет: потерянные пинги, скорость, bufferedAmount канала"""
+        now = self.clock()
+        for ping_id, sent_at in list(self.outstanding.items()):
+            if now - sent_at > PING_TIMEOUT:
+                del self.outstanding[ping_id]
+                self.pings_lost += 1
+        last_time, last_in, last_out = self._last_tick
+        elapsed = now - last_time
+        if elapsed > 0:
+            self.rate_in += ((self.bytes_in - last_in) / elapsed - self.rate_in) * RATE_GAIN
+            self.rate_out += ((self.bytes_out - last_out) / elapsed - self.rate_out) * RATE_GAIN
+        self._last_tick = (now, self.bytes_in, self.bytes_out)
+        self.buffered_amount = buffered_amount
+        self.buffered_amount_max = max(self.buffered_amount_max, buffered_amount)
+
+    def heard(self):
+        """Отсчет молчания заново (канал только что открыт)"""
+        self.last_heard = self.clock()
+
+    def idle_for(self):
+        """Сколько секунд от пира нет сообщений"""
+        return self.clock() - self.last_heard
+
+    def snapshot(self):
+        answered = self.pongs_received + self.pings_lost
+        return {
+            'rtt_ms': None if self.rtt is None else self.rtt * 1000,
+            'rtt_min_ms': None if self.rtt_min is None else self.rtt_min * 1000,
+            'jitter_ms': self.jitter * 1000,
+            'loss': self.pings_lost / answered if answered else 0.0,
+            'pings_sent': self.pings_sent,
+            'pings_lost': self.pings_lost,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'messages_in': self.messages_in,
+            'messages_out': self.messages_out,
+            'bytes_in_per_s': self.rate_in,
+            'bytes_out_per_s': self.rate_out,
+            'buffered_amount': self.buffered_amount,
+            'buffered_amount_max': self.buffered_amount_max,
+            'idle_ms': self.idle_for() * 1000
+        }
@@ -0,0 +1,83 @@
+# app/core/network/negotiation_stats.py
+# Время установления P2P соединений по фазам: от запроса клиента
+# (join_request -> create_offer_for_client) до открытого data channel.
+# Показывает, где уходит время до начала игры при полном лобби.
+
+import time
+
+PHASES = ('offer_created', 'answer_applied', 'ice_connected', 'channel_open')
+
+
+class NegotiationStats:
+    """Отметки времени фаз согласования для каждого клиента"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = {}  # {peer_id: время запроса}
+        self.marks = {}    # {peer_id: {phase: время}}
+
+    def start(self, peer_id):
+        """Новое согласование с клиентом (повторное - сбрасывает отметки)"""
+        self.started[peer_id] = self.clock()
+        self.marks[peer_id] = {}
+
+    def mark(self, peer_id, phase):
+        """Отметка фазы; повторные отметки той же фазы игнорируются"""
+        marks = self.marks.get(peer_id)
+        if marks is not None and phase not in marks:
+            marks[phase] = self.clock()
+
+    def clear(self):
+        self.started.clear()
+        self.marks.clear()
+
+    def client(self, peer_id):
+        """
+        Фазы одного клиента: {phase: мс от запроса}, 'total_ms' - до открытия
+        канала, 'slowest_phase' - фаза с наибольшим приростом времени.
+        """
+        started = self.started.get(peer_id)
+        if started is None:
+            return None
+        marks = self.marks[peer_id]
+        result = {}
+        previous = started
+        slowest, slowest_ms = None, -1.0
+        for phase in PHASES:
+            if phase not in marks:
+                continue
+            result[phase] = round((marks[phase] - started) * 1000, 1)
+            step = marks[phase] - previous
+            if step > slowest_ms:
+                slowest, slowest_ms = phase, step
+            previous = marks[phase]
+        result['total_ms'] = result.get('channel_open')
+        result['slowest_phase'] = slowest
+        return result
+
+    def snapshot(self):
+        """
+        Сводка по всем клиентам:
+        {'clients': {peer_id: client()}, 'connected', 'pending',
+         'time_to_table_ms' - от первого запроса до последнего открытого канала,
+         'phase_max_ms' - {phase: максимум по клиентам}}
+        """
+        clients = {peer_id: self.client(peer_id) for peer_id in self.started}
+        connected = [peer_id for peer_id, marks in self.marks.items() if 'channel_open' in marks]
+        time_to_table = None
+        if connected:
+            first = min(self.started.values())
+            last = max(self.marks[peer_id]['channel_open'] for peer_id in connected)
+            time_to_table = round((last - first) * 1000, 1)
+        phase_max = {}
+        for phase in PHASES:
+            values = [stats[phase] for stats in clients.values() if phase in stats]
+            if values:
+                phase_max[phase] = max(values)
+        return {
+            'clients': clients,
+            'connected': len(connected),
+            'pending': len(clients) - len(connected),
+            'time_to_table_ms': time_to_table,
+            'phase_max_ms': phase_max
+        }
@@ -0,0 +1,112 @@
+# app/core/network/net_log.py
+# Логирование сетевого слоя клиента без блокировки потоков SocketIO и Kivy.
+# Записи уходят в очередь и выводятся фоновым потоком; частые события
+# (signal, ICE) можно сэмплировать: FOOL_NET_LOG_SAMPLE="signal=0.1".
+# Traceback'и форматируются тоже в фоновом потоке (exc_info=True).
+#
+# Все логгеры пакета core.network (в том числе logging.getLogger(__name__)
+# в p2p_host.py) выводятся через эту очередь после первого get_logger().
+
+import logging
+import logging.handlers
+import os
+import queue
+
+NETWORK_LOGGER = 'core.network'
+
+
+class EventSampler:
+    """Пропускает каждое N-е событие типа (N = 1 / доля)"""
+
+    def __init__(self, ratios=None):
+        self.every = {event: (max(1, round(1 / ratio)) if ratio > 0 else 0)
+                      for event, ratio in (ratios or {}).items()}
+        self.counts = {}
+
+    def take(self, event):
+        """Сколько событий покрывает запись; 0 - пропустить"""
+        every = self.every.get(event, 1)
+        if every <= 1:
+            return every
+        count = self.counts.get(event, 0) + 1
+        self.counts[event] = 0 if count >= every else count
+        return count if count >= every else 0
+
+
+class _Formatter(logging.Formatter):
+    def format(self, record):
+        line = f"[{record.levelname}] {record.name}: {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Форматирование (и traceback) - в потоке слушателя, не в вызывающем
+        return record
+
+
+class NetLogger:
+    """Обертка над logging.Logger: поля key=value и сэмплинг событий"""
+
+    def __init__(self, logger, sampler):
+        self.logger = logger
+        self.sampler = sampler
+
+    def event(self, event, message, level=logging.INFO, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        covered = self.sampler.take(event)
+        if covered:
+            fields['event'] = event
+            if covered > 1:
+                fields['sampled'] = covered
+            self.logger.log(level, message, extra={'fields': fields})
+
+    def debug(self, message, **fields):
+        self.logger.debug(message, extra={'fields': fields})
+
+    def info(self, message, **fields):
+        self.logger.info(message, extra={'fields': fields})
+
+    def warning(self, message, **fields):
+        self.logger.warning(message, extra={'fields': fields})
+
+    def error(self, message, exc_info=False, **fields):
+        self.logger.error(message, exc_info=exc_info, extra={'fields': fields})
+
+
+_listener = None
+_sampler = None
+
+
+def _setup():
+    global _listener, _sampler
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(_Formatter())
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+    root = logging.getLogger(NETWORK_LOGGER)
+    root.setLevel(os.environ.get('FOOL_NET_LOG_LEVEL', 'INFO').upper())
+    root.propagate = False
+    root.addHandler(_QueueHandler(log_queue))
+
+    ratios = {}
+    for part in os.environ.get('FOOL_NET_LOG_SAMPLE', '').split(','):
+        if '=' in part:
+            event, ratio = part.split('=', 1)
+            ratios[event.strip()] = float(ratio)
+    _sampler = EventSampler(ratios)
+
+
+def get_logger(name):
+    """NetLogger для модуля core.network.*"""
+    if _listener is None:
+        _setup()
+    return NetLogger(logging.getLogger(name), _sampler)
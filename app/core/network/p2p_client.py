@@ -0,0 +1,246 @@
+# app/core/network/p2p_client.py
+import asyncio
+from aiortc import RTCPeerConnection, RTCSessionDescription
+import logging
+
+from core.network.channels import EPHEMERAL, label_class, message_class, send_ephemeral
+from core.network.framing import Reassembler, iter_chunks, needs_chunking
+from core.network.game_codec import decode_message, encode_message
+from core.network.ice import add_candidate, flush_candidates, local_candidates
+from core.network.link_stats import DEAD_PEER_TIMEOUT, PING, PING_INTERVAL, PONG, LinkStats, pong_for
+
+logger = logging.getLogger(__name__)
+
+class P2PClient:
+    """Клиент P2P соединения - одно соединение с хостом игры"""
+
+    def __init__(self, on_host_message_callback=None, on_ready_callback=None, on_disconnect_callback=None,
+                 on_ice_candidate_callback=None, configuration=None, trickle_ice=True,
+                 heartbeat_interval=PING_INTERVAL, dead_peer_timeout=DEAD_PEER_TIMEOUT):
+        """Параметры trickle ICE и пингов - как у P2PHost"""
+        self.host_id = None
+        self.connection = None  # RTCPeerConnection
+        self.data_channel = None  # RTCDataChannel, создается хостом
+        self.ephemeral_channel = None  # канал без повторов (channels.EPHEMERAL), если хост его открыл
+        self.ready = False
+        self.on_host_message_callback = on_host_message_callback
+        self.on_ready_callback = on_ready_callback
+        self.on_disconnect_callback = on_disconnect_callback
+        self.on_ice_candidate_callback = on_ice_candidate_callback
+        self.configuration = configuration
+        self.trickle_ice = trickle_ice
+        self.gathering = None  # asyncio.Task - setLocalDescription и сбор кандидатов
+        self.pending_candidates = []  # кандидаты хоста, пришедшие раньше offer
+        self.reassembler = Reassembler()  # сообщения хоста, пришедшие частями (framing)
+        self._next_message_id = 0
+        self.link_stats = LinkStats()  # RTT, потери, трафик текущего соединения
+        self.heartbeat_interval = heartbeat_interval
+        self.dead_peer_timeout = dead_peer_timeout
+        self._heartbeat_task = None
+
+    async def handle_offer_from_host(self, host_id, offer_sdp):
+        """Обработка оффера хоста; возвращает ответ для отправки через сигнальный сервер"""
+        try:
+            if self.connection is not None:
+                await self.close()
+            self.host_id = host_id
+            pc = RTCPeerConnection(configuration=self.configuration)
+            self.connection = pc
+
+            self._setup_connection_events(pc)
+
+            await pc.setRemoteDescription(
+                RTCSessionDescription(offer_sdp["sdp"], offer_sdp["type"])
+            )
+            await flush_candidates(pc, self.pending_candidates)
+            answer = await pc.createAnswer()
+            if self.trickle_ice:
+                # Кандидаты собираются в фоне и уходят отдельными сигналами
+                self.gathering = asyncio.ensure_future(self._set_local_description(pc, answer))
+                logger.info(f"Answer created for host {host_id} (trickle ICE)")
+                return {"sdp": answer.sdp, "type": answer.type}
+            await pc.setLocalDescription(answer)
+
+            logger.info(f"Answer created for host {host_id}")
+            return {
+                "sdp": pc.localDescription.sdp,
+                "type": pc.localDescription.type
+            }
+        except Exception as e:
+            logger.error(f"Error handling offer from host {host_id}: {e}")
+            return None
+
+    async def _set_local_description(self, pc, answer):
+        """setLocalDescription (сбор кандидатов) и отправка кандидатов хосту"""
+        try:
+            await pc.setLocalDescription(answer)
+        except Exception as e:
+            logger.error(f"Error gathering ICE candidates for host {self.host_id}: {e}")
+            return
+        if self.on_ice_candidate_callback and self.connection is pc:
+            for candidate_data in local_candidates(pc.localDescription):
+                self.on_ice_candidate_callback(self.host_id, candidate_data)
+
+    async def handle_ice_candidate_from_host(self, candidate_data):
+        """Обработка ICE кандидата от хоста; до offer кандидаты копятся"""
+        try:
+            if await add_candidate(self.connection, self.pending_candidates, candidate_data):
+                logger.info(f"ICE candidate added for host {self.host_id}")
+            else:
+                logger.info("ICE candidate from host buffered until offer")
+        except Exception as e:
+            logger.error(f"Error handling ICE candidate from host {self.host_id}: {e}")
+
+    def _setup_connection_events(self, pc):
+        """Настройка событий соединения"""
+        @pc.on("connectionstatechange")
+        def on_connectionstatechange():
+            logger.info(f"Connection state with host {self.host_id}: {pc.connectionState}")
+            if pc.connectionState in ["failed", "closed"]:
+                self._handle_disconnect()
+
+        @pc.on("datachannel")
+        def on_datachannel(channel):
+            # Каналы игры создает хост (P2PHost.create_offer_for_client)
+            if label_class(channel.label) == EPHEMERAL:
+                self.ephemeral_channel = channel
+                self._setup_message_event(channel)
+                return
+            self.data_channel = channel
+            self._setup_data_channel_events(channel)
+            if channel.readyState == "open":
+                self._handle_open()
+
+    def _setup_data_channel_events(self, channel):
+        """Настройка событий data channel"""
+        @channel.on("open")
+        def on_open():
+            self._handle_open()
+
+        self._setup_message_event(channel)
+
+        @channel.on("close")
+        def on_close():
+            logger.info(f"Data channel closed for host {self.host_id}")
+            self._handle_disconnect()
+
+    def _setup_message_event(self, channel):
+        """Прием сообщений канала любого класса"""
+        @channel.on("message")
+        def on_message(message):
+            try:
+                self.link_stats.received(len(message))
+                message = self.reassembler.feed(message)
+                if message is None:
+                    return  # часть большого сообщения
+                data = decode_message(message)
+                if data.get('type') == PING:
+                    self._send(encode_message(pong_for(data)), EPHEMERAL)
+                    return
+                if data.get('type') == PONG:
+                    self.link_stats.handle_pong(data)
+                    return
+                if self.on_host_message_callback:
+                    self.on_host_message_callback(self.host_id, data)
+            except (ValueError, IndexError):
+                logger.error("Failed to decode message")
+            except Exception as e:
+                logger.error(f"Error processing message from host {self.host_id}: {e}")
+
+    def _handle_open(self):
+        if self.ready:
+            return
+        logger.info(f"Data channel opened with host {self.host_id}")
+        self.ready = True
+        self.link_stats = LinkStats()
+        if self.heartbeat_interval:
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
+        if self.on_ready_callback:
+            self.on_ready_callback(self.host_id)
+
+    def _handle_disconnect(self):
+        """Обработка отключения от хоста"""
+        if self.connection is None:
+            return
+        logger.info(f"Disconnected from host {self.host_id}")
+        was_ready = self.ready
+        if self.gathering is not None:
+            self.gathering.cancel()
+            self.gathering = None
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        self.pending_candidates = []
+        self.reassembler.clear()
+        self.connection = None
+        self.data_channel = None
+        self.ephemeral_channel = None
+        self.ready = False
+        if was_ready and self.on_disconnect_callback:
+            self.on_disconnect_callback(self.host_id)
+
+    def send_message(self, message_data, channel=None):
+        """
+        Отправка сообщения хосту.
+        :param channel: класс канала (channels.RELIABLE/EPHEMERAL); по умолчанию -
+            по типу сообщения. Эфемерное сообщение при занятом канале отбрасывается,
+            без эфемерного канала (старый хост) уходит надежным.
+        """
+        if not self.data_channel or not self.ready:
+            logger.warning(f"Host {self.host_id} not ready or channel not available")
+            return False
+
+        channel_class = message_class(message_data, channel)
+        try:
+            sent = self._send(encode_message(message_data), channel_class)
+        except Exception as e:
+            logger.error(f"Error sending message to host {self.host_id}: {e}")
+            return False
+        if sent and channel_class != EPHEMERAL:
+            logger.info(f"Message sent to host {self.host_id}: {message_data.get('type', 'unknown')}")
+        return sent
+
+    def _send(self, payload, channel_class):
+        """Отправка закодированного сообщения; False - эфемерное сообщение отброшено"""
+        if channel_class == EPHEMERAL and self.ephemeral_channel is not None:
+            if not send_ephemeral(self.ephemeral_channel, payload):
+                return False
+        elif needs_chunking(payload):
+            # Клиент шлет хосту мало данных - части сразу, без очереди
+            for frame in iter_chunks(self._next_message_id, payload):
+                self.data_channel.send(frame)
+            self._next_message_id = (self._next_message_id + 1) & 0xFFFFFFFF
+        else:
+            self.data_channel.send(payload)
+        self.link_stats.sent(len(payload))
+        return True
+
+    def get_link_stats(self):
+        """Качество соединения с хостом (см. LinkStats.snapshot); None без соединения"""
+        return self.link_stats.snapshot() if self.ready else None
+
+    async def _heartbeat(self):
+        """Пинги хосту; молчащий хост считается отключенным"""
+        while self.ready:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not self.ready:
+                break
+            self.link_stats.tick(self.data_channel.bufferedAmount)
+            if self.link_stats.idle_for() > self.dead_peer_timeout:
+                logger.warning(f"Host {self.host_id} silent for {self.link_stats.idle_for():.1f}s, closing connection")
+                asyncio.ensure_future(self.close())
+                break
+            try:
+                self._send(encode_message(self.link_stats.make_ping()), EPHEMERAL)
+            except Exception as e:
+                logger.error(f"Error sending ping to host {self.host_id}: {e}")
+
+    async def close(self):
+        """Закрытие соединения с хостом"""
+        pc = self.connection
+        self._handle_disconnect()
+        if pc is not None:
+            try:
+                await pc.close()
+            except Exception as e:
+                logger.error(f"Error closing connection with host {self.host_id}: {e}")
@@ -1,37 +1,115 @@
 # app/core/network/p2p_host.py
 import asyncio
 from aiortc import RTCPeerConnection, RTCSessionDescription
-import json
 import logging
+import time
+
+from core.network.channels import DROPPED, EPHEMERAL, RELIABLE, create_channels, message_class, send_ephemeral
+from core.network.ice import add_candidate, flush_candidates, local_candidates
+from core.network.link_stats import DEAD_PEER_TIMEOUT, PING, PING_INTERVAL, PONG, LinkStats, pong_for
+from core.network.negotiation_stats import NegotiationStats
+from core.network.framing import Reassembler
+from core.network.game_codec import decode_message, encode_message
+from core.network.send_queue import DEFAULT_QUEUE_SIZE, NOT_READY, QUEUED, SendQueue, coalesce_key, is_priority
 
 logger = logging.getLogger(__name__)
 
+MAX_OFFER_POOL = 5
+# Собранные заранее кандидаты (srflx - привязка NAT) со временем устаревают
+OFFER_POOL_TTL = 120.0
+
 class P2PHost:
     """Хост P2P соединения - управляет соединениями с несколькими клиентами"""
     
-    def __init__(self, on_client_message_callback=None):
+    def __init__(self, on_client_message_callback=None, on_client_ready_callback=None,
+                 on_client_disconnect_callback=None, on_ice_candidate_callback=None,
+                 configuration=None, trickle_ice=True, offer_pool_size=0,
+                 send_queue_size=DEFAULT_QUEUE_SIZE, heartbeat_interval=PING_INTERVAL,
+                 dead_peer_timeout=DEAD_PEER_TIMEOUT):
+        """
+        :param on_ice_candidate_callback: (client_id, candidate_data) - локальный
+            ICE-кандидат для отправки клиенту через сигнальный сервер (trickle ICE).
+        :param configuration: RTCConfiguration (STUN/TURN серверы).
+        :param trickle_ice: отдавать offer до сбора кандидатов; без него offer
+            содержит все кандидаты и готов только после их сбора.
+        :param offer_pool_size: сколько клиентов ожидается (обычно мест в игре
+            минус хост); столько соединений с готовым offer и собранными
+            кандидатами держится заранее, за вычетом уже подключенных.
+        :param send_queue_size: предел очереди отправки одного клиента.
+        :param heartbeat_interval: период пингов клиентам, с (None - без пингов).
+        :param dead_peer_timeout: клиент, молчащий дольше (с), отключается.
+        """
         self.connections = {}  # {client_id: RTCPeerConnection}
-        self.data_channels = {}  # {client_id: RTCDataChannel}
+        self.data_channels = {}  # {client_id: RTCDataChannel} - надежный канал (ходы, состояние)
+        self.ephemeral_channels = {}  # {client_id: RTCDataChannel} - без повторов (channels.EPHEMERAL)
+        self.ephemeral_dropped = 0  # эфемерных сообщений отброшено из-за занятого канала
         self.on_client_message_callback = on_client_message_callback
+        self.on_client_ready_callback = on_client_ready_callback
+        self.on_client_disconnect_callback = on_client_disconnect_callback
+        self.on_ice_candidate_callback = on_ice_candidate_callback
+        self.configuration = configuration
+        self.trickle_ice = trickle_ice
         self.client_ready = {}  # {client_id: bool}
+        self.send_queue_size = send_queue_size
+        self.send_queues = {}  # {client_id: SendQueue}
+        self.reassemblers = {}  # {client_id: Reassembler} - сообщения клиента, пришедшие частями
+        self.gathering = {}  # {client_id: asyncio.Task} - setLocalDescription и сбор кандидатов
+        self.pending_candidates = {}  # {client_id: [candidate_data]} - пришли раньше answer
+        self.offer_pool_size = min(offer_pool_size, MAX_OFFER_POOL)
+        self.offer_pool = []  # [(RTCPeerConnection, {класс: RTCDataChannel}, created_at)]
+        self._pool_task = None
+        self.negotiation_stats = NegotiationStats()  # время фаз согласования по клиентам
+        self.link_stats = {}  # {client_id: LinkStats} - RTT, потери, трафик
+        self.heartbeat_interval = heartbeat_interval
+        self.dead_peer_timeout = dead_peer_timeout
+        self._heartbeat_task = None
         
     async def create_offer_for_client(self, client_id):
         """Создание оффера для нового клиента"""
+        self.negotiation_stats.start(client_id)
+        offer = await self._create_offer(client_id)
+        if offer is not None:
+            self.negotiation_stats.mark(client_id, 'offer_created')
+        return offer
+        
+    async def create_offers_for_clients(self, client_ids):
+        """Офферы для нескольких клиентов одновременно: {client_id: offer или None}"""
+        offers = await asyncio.gather(*(self.create_offer_for_client(client_id) for client_id in client_ids))
+        return dict(zip(client_ids, offers))
+        
+    def get_negotiation_stats(self):
+        """Время фаз согласования по клиентам (см. NegotiationStats.snapshot)"""
+        return self.negotiation_stats.snapshot()
+        
+    async def _create_offer(self, client_id):
         try:
-            pc = RTCPeerConnection()
-            self.connections[client_id] = pc
-            
-            # Создаем data channel для клиента
-            channel = pc.createDataChannel(f"game_channel_{client_id}")
-            self.data_channels[client_id] = channel
-            self.client_ready[client_id] = False
-            
-            # Настраиваем события для соединения
-            self._setup_connection_events(client_id, pc)
-            self._setup_data_channel_events(client_id, channel)
+            pooled = self._take_pooled_offer()
+            if pooled is not None:
+                # Готовое соединение из пула: offer уже содержит все кандидаты
+                pc, channels = pooled
+                self._attach_client(client_id, pc, channels)
+                self._refill_offer_pool()
+                logger.info(f"Pooled offer assigned to client {client_id}")
+                return {
+                    "sdp": pc.localDescription.sdp,
+                    "type": pc.localDescription.type
+                }
+                
+            pc = RTCPeerConnection(configuration=self.configuration)
+            # Создаем data channel каждого класса для клиента
+            self._attach_client(client_id, pc, create_channels(pc, client_id))
+            self._refill_offer_pool()
             
             # Создаем оффер
             offer = await pc.createOffer()
+            if self.trickle_ice:
+                # Кандидаты собираются в фоне и уходят отдельными сигналами
+                self.gathering[client_id] = asyncio.ensure_future(
+                    self._set_local_description(client_id, pc, offer)
+                )
+                logger.info(f"Offer created for client {client_id} (trickle ICE)")
+                return {"sdp": offer.sdp, "type": offer.type}
+                
             await pc.setLocalDescription(offer)
             
             logger.info(f"Offer created for client {client_id}")
@@ -43,6 +121,89 @@ class P2PHost:
             logger.error(f"Error creating offer for client {client_id}: {e}")
             return None
             
+    def _attach_client(self, client_id, pc, channels):
+        """Регистрация соединения клиента и настройка событий"""
+        previous = self.connections.get(client_id)
+        if previous is not None and previous is not pc:
+            # Клиент переподключается (resume -> новый join_request): старое соединение
+            # закрывается, и его события уже не трогают новое (см. проверки "is pc")
+            self._drop_client(client_id)
+            asyncio.ensure_future(previous.close())
+        channel = channels[RELIABLE]
+        self.connections[client_id] = pc
+        self.data_channels[client_id] = channel
+        self.ephemeral_channels[client_id] = channels[EPHEMERAL]
+        self.client_ready[client_id] = False
+        link_stats = self.link_stats[client_id] = LinkStats()
+        self.send_queues[client_id] = SendQueue(channel, self.send_queue_size, link_stats=link_stats)
+        self.reassemblers[client_id] = Reassembler()
+        self._setup_connection_events(client_id, pc)
+        self._setup_data_channel_events(client_id, pc, channel)
+        self._setup_message_event(client_id, pc, channels[EPHEMERAL])
+        
+    def set_offer_pool_size(self, size):
+        """Изменение размера пула (например, при смене числа мест в лобби)"""
+        self.offer_pool_size = max(0, min(size, MAX_OFFER_POOL))
+        self._refill_offer_pool()
+        
+    def _offer_pool_target(self):
+        return max(0, self.offer_pool_size - len(self.connections))
+        
+    def _take_pooled_offer(self):
+        """Свежее соединение из пула или None"""
+        now = time.monotonic()
+        while self.offer_pool:
+            pc, channels, created_at = self.offer_pool.pop(0)
+            if now - created_at < OFFER_POOL_TTL and pc.connectionState == "new":
+                return pc, channels
+            asyncio.ensure_future(pc.close())
+        return None
+        
+    def _refill_offer_pool(self):
+        """Фоновое пополнение пула до нужного размера"""
+        if self._pool_task is None or self._pool_task.done():
+            self._pool_task = asyncio.ensure_future(self._fill_offer_pool())
+            
+    async def _fill_offer_pool(self):
+        while True:
+            missing = self._offer_pool_target() - len(self.offer_pool)
+            if missing <= 0:
+                break
+            entries = await asyncio.gather(
+                *(self._create_pooled_offer() for _ in range(missing)), return_exceptions=True
+            )
+            failed = [entry for entry in entries if isinstance(entry, Exception)]
+            self.offer_pool.extend(entry for entry in entries if not isinstance(entry, Exception))
+            if failed:
+                logger.error(f"Error pre-creating offers: {failed[0]}")
+                break
+        # Лишние соединения (клиенты подключились) закрываем
+        while len(self.offer_pool) > self._offer_pool_target():
+            pc, _, _ = self.offer_pool.pop()
+            await pc.close()
+        logger.info(f"Offer pool: {len(self.offer_pool)} ready")
+        
+    async def _create_pooled_offer(self):
+        pc = RTCPeerConnection(configuration=self.configuration)
+        channels = create_channels(pc)
+        try:
+            await pc.setLocalDescription(await pc.createOffer())
+        except BaseException:  # в том числе отмена при close_all_connections
+            await pc.close()
+            raise
+        return pc, channels, time.monotonic()
+        
+    async def _set_local_description(self, client_id, pc, offer):
+        """setLocalDescription (сбор кандидатов) и отправка кандидатов клиенту"""
+        try:
+            await pc.setLocalDescription(offer)
+        except Exception as e:
+            logger.error(f"Error gathering ICE candidates for client {client_id}: {e}")
+            return
+        if self.on_ice_candidate_callback and self.connections.get(client_id) is pc:
+            for candidate_data in local_candidates(pc.localDescription):
+                self.on_ice_candidate_callback(client_id, candidate_data)
+            
     async def handle_answer_from_client(self, client_id, answer_sdp):
         """Обработка ответа от клиента"""
         try:
@@ -51,9 +212,15 @@ class P2PHost:
                 logger.error(f"No connection found for client {client_id}")
                 return False
                 
+            gathering = self.gathering.pop(client_id, None)
+            if gathering is not None:
+                # answer можно применить только после setLocalDescription(offer)
+                await gathering
             await pc.setRemoteDescription(
                 RTCSessionDescription(answer_sdp["sdp"], answer_sdp["type"])
             )
+            self.negotiation_stats.mark(client_id, 'answer_applied')
+            await flush_candidates(pc, self.pending_candidates.pop(client_id, []))
             
             logger.info(f"Answer handled from client {client_id}")
             return True
@@ -68,14 +235,11 @@ class P2PHost:
             if not pc:
                 return
                 
-            from aiortc import RTCIceCandidate
-            candidate = RTCIceCandidate(
-                sdpMid=candidate_data.get('sdpMid'),
-                sdpMLineIndex=candidate_data.get('sdpMLineIndex'),
-                candidate=candidate_data.get('candidate')
-            )
-            await pc.addIceCandidate(candidate)
-            logger.info(f"ICE candidate added for client {client_id}")
+            pending = self.pending_candidates.setdefault(client_id, [])
+            if await add_candidate(pc, pending, candidate_data):
+                logger.info(f"ICE candidate added for client {client_id}")
+            else:
+                logger.info(f"ICE candidate from client {client_id} buffered until answer")
         except Exception as e:
             logger.error(f"Error handling ICE candidate from client {client_id}: {e}")
             
@@ -87,81 +251,227 @@ class P2PHost:
             if pc.connectionState == "connected":
                 logger.info(f"Client {client_id} connected successfully")
             elif pc.connectionState in ["failed", "closed", "disconnected"]:
-                self._handle_client_disconnect(client_id)
+                self._handle_client_disconnect(client_id, pc)
                 
-        @pc.on("icecandidate")
-        def on_icecandidate(candidate):
-            if candidate:
-                # Отправляем ICE кандидат клиенту через сигнальный сервер
-                # Здесь будет вызов callback
-                pass
+        @pc.on("iceconnectionstatechange")
+        def on_iceconnectionstatechange():
+            if self.connections.get(client_id) is pc and pc.iceConnectionState in ("completed", "connected"):
+                self.negotiation_stats.mark(client_id, 'ice_connected')
                 
-    def _setup_data_channel_events(self, client_id, channel):
+    def _setup_data_channel_events(self, client_id, pc, channel):
         """Настройка событий data channel"""
         @channel.on("open")
         def on_open():
+            if self.connections.get(client_id) is not pc:
+                return  # канал замененного соединения
             logger.info(f"Data channel opened for client {client_id}")
             self.client_ready[client_id] = True
+            self.negotiation_stats.mark(client_id, 'channel_open')
+            link_stats = self.link_stats.get(client_id)
+            if link_stats is not None:
+                link_stats.heard()
+            self._start_heartbeat()
+            if self.on_client_ready_callback:
+                self.on_client_ready_callback(client_id)
             
+        self._setup_message_event(client_id, pc, channel)
+        
+        @channel.on("close")
+        def on_close():
+            if self.connections.get(client_id) is not pc:
+                return
+            logger.info(f"Data channel closed for client {client_id}")
+            self.client_ready[client_id] = False
+            self._handle_client_disconnect(client_id, pc)
+            
+    def _setup_message_event(self, client_id, pc, channel):
+        """Прием сообщений канала любого класса"""
         @channel.on("message")
         def on_message(message):
-            logger.info(f"Message received from client {client_id}")
+            if self.connections.get(client_id) is not pc:
+                return
             try:
-                data = json.loads(message)
+                link_stats = self.link_stats.get(client_id)
+                if link_stats is not None:
+                    link_stats.received(len(message))
+                reassembler = self.reassemblers.get(client_id)
+                message = reassembler.feed(message) if reassembler is not None else message
+                if message is None:
+                    return  # часть большого сообщения
+                data = decode_message(message)
+                if data.get('type') == PING:
+                    self._send_ephemeral(client_id, encode_message(pong_for(data)))
+                    return
+                if data.get('type') == PONG:
+                    if link_stats is not None:
+                        link_stats.handle_pong(data)
+                    return
+                logger.info(f"Message received from client {client_id}")
                 if self.on_client_message_callback:
                     self.on_client_message_callback(client_id, data)
-            except json.JSONDecodeError:
-                logger.error("Failed to decode JSON message")
+            except (ValueError, IndexError):
+                logger.error("Failed to decode message")
             except Exception as e:
                 logger.error(f"Error processing message from client {client_id}: {e}")
-                
-        @channel.on("close")
-        def on_close():
-            logger.info(f"Data channel closed for client {client_id}")
-            self.client_ready[client_id] = False
-            self._handle_client_disconnect(client_id)
             
-    def _handle_client_disconnect(self, client_id):
-        """Обработка отключения клиента"""
+    def _handle_client_disconnect(self, client_id, pc=None):
+        """
+        Обработка отключения клиента.
+        :param pc: соединение, сообщившее об отключении; событие уже замененного
+            соединения клиента игнорируется
+        """
+        if client_id not in self.connections:
+            return
+        if pc is not None and self.connections[client_id] is not pc:
+            return
         logger.info(f"Client {client_id} disconnected")
+        self._drop_client(client_id)
+        if self.on_client_disconnect_callback:
+            self.on_client_disconnect_callback(client_id)
+        # Место освободилось - пул снова нужен
+        self._refill_offer_pool()
+        
+    def _drop_client(self, client_id):
+        """Удаление соединения клиента и всего, что к нему относится"""
         # Удаляем соединение и канал
         if client_id in self.connections:
             del self.connections[client_id]
         if client_id in self.data_channels:
             del self.data_channels[client_id]
+        self.ephemeral_channels.pop(client_id, None)
         if client_id in self.client_ready:
             del self.client_ready[client_id]
+        send_queue = self.send_queues.pop(client_id, None)
+        if send_queue is not None:
+            send_queue.close()
+        self.reassemblers.pop(client_id, None)
+        self.link_stats.pop(client_id, None)
+        gathering = self.gathering.pop(client_id, None)
+        if gathering is not None:
+            gathering.cancel()
+        self.pending_candidates.pop(client_id, None)
             
-    def send_message_to_client(self, client_id, message_data):
-        """Отправка сообщения конкретному клиенту"""
-        channel = self.data_channels.get(client_id)
-        if not channel or not self.client_ready.get(client_id, False):
-            logger.warning(f"Client {client_id} not ready or channel not available")
-            return False
-            
+    def send_message_to_client(self, client_id, message_data, coalesce=None, channel=None):
+        """
+        Отправка сообщения конкретному клиенту (через его очередь отправки).
+        :param coalesce: ключ слияния - неотправленное сообщение с тем же ключом
+            заменяется этим (для снимков состояния из COALESCED_TYPES - по типу).
+        :param channel: класс канала (channels.RELIABLE/EPHEMERAL); по умолчанию -
+            по типу сообщения. Эфемерное сообщение при занятом канале отбрасывается.
+        """
+        if message_class(message_data, channel) == EPHEMERAL:
+            return self._send_ephemeral(client_id, encode_message(message_data)) == QUEUED
         try:
-            message_json = json.dumps(message_data, ensure_ascii=False)
-            channel.send(message_json)
-            logger.info(f"Message sent to client {client_id}: {message_data.get('type', 'unknown')}")
-            return True
+            result = self._enqueue(client_id, encode_message(message_data), coalesce_key(message_data, coalesce),
+                                   is_priority(message_data))
         except Exception as e:
             logger.error(f"Error sending message to client {client_id}: {e}")
             return False
+        if result != QUEUED:
+            logger.warning(f"Message to client {client_id} not sent: {result}")
+            return False
+        logger.info(f"Message sent to client {client_id}: {message_data.get('type', 'unknown')}")
+        return True
+        
+    def broadcast_message(self, message_data, exclude_client=None, coalesce=None, channel=None):
+        """
+        Отправка сообщения всем клиентам. Сообщение сериализуется один раз,
+        один и тот же буфер ставится в очередь каждого клиента.
+        :param coalesce: ключ слияния, как в send_message_to_client.
+        :param channel: класс канала, как в send_message_to_client.
+        :return: {client_id: результат постановки в очередь} (см. send_queue,
+            для эфемерных сообщений - QUEUED или channels.DROPPED)
+        """
+        payload = encode_message(message_data)
+        if message_class(message_data, channel) == EPHEMERAL:
+            return {client_id: self._send_ephemeral(client_id, payload)
+                    for client_id in self.ephemeral_channels if client_id != exclude_client}
+        key = coalesce_key(message_data, coalesce)
+        priority = is_priority(message_data)
+        results = {client_id: self._enqueue(client_id, payload, key, priority)
+                   for client_id in self.send_queues if client_id != exclude_client}
+        queued = sum(1 for result in results.values() if result == QUEUED)
+        logger.info(f"Broadcast {message_data.get('type', 'unknown')} queued for {queued} of {len(results)} clients")
+        return results
+        
+    def _send_ephemeral(self, client_id, payload):
+        if not self.client_ready.get(client_id, False):
+            return NOT_READY
+        try:
+            if send_ephemeral(self.ephemeral_channels.get(client_id), payload):
+                link_stats = self.link_stats.get(client_id)
+                if link_stats is not None:
+                    link_stats.sent(len(payload))
+                return QUEUED
+        except Exception as e:
+            logger.error(f"Error sending ephemeral message to client {client_id}: {e}")
+        self.ephemeral_dropped += 1
+        return DROPPED
+        
+    def _enqueue(self, client_id, payload, key=None, priority=False):
+        send_queue = self.send_queues.get(client_id)
+        if send_queue is None or not self.client_ready.get(client_id, False):
+            return NOT_READY
+        return send_queue.put(payload, key, priority)
+        
+    def get_link_stats(self, client_id=None):
+        """
+        Качество соединений (см. LinkStats.snapshot): {client_id: статистика}
+        или статистика одного клиента (None, если его нет).
+        """
+        if client_id is not None:
+            link_stats = self.link_stats.get(client_id)
+            return link_stats.snapshot() if link_stats is not None else None
+        return {client_id: link_stats.snapshot() for client_id, link_stats in self.link_stats.items()}
+        
+    def _start_heartbeat(self):
+        if self.heartbeat_interval and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
             
-    def broadcast_message(self, message_data, exclude_client=None):
-        """Отправка сообщения всем клиентам"""
-        success_count = 0
-        for client_id in list(self.data_channels.keys()):
-            if client_id != exclude_client:
-                if self.send_message_to_client(client_id, message_data):
-                    success_count += 1
-                    
-        logger.info(f"Broadcast message sent to {success_count} clients")
-        return success_count
+    async def _heartbeat(self):
+        """Пинги готовым клиентам и отключение молчащих"""
+        while self.connections:
+            await asyncio.sleep(self.heartbeat_interval)
+            for client_id, link_stats in list(self.link_stats.items()):
+                channel = self.data_channels.get(client_id)
+                if channel is None or not self.client_ready.get(client_id, False):
+                    continue
+                link_stats.tick(channel.bufferedAmount)
+                if link_stats.idle_for() > self.dead_peer_timeout:
+                    logger.warning(f"Client {client_id} silent for {link_stats.idle_for():.1f}s, closing connection")
+                    asyncio.ensure_future(self.close_connection(client_id))
+                    continue
+                self._send_ephemeral(client_id, encode_message(link_stats.make_ping()))
+                
+    def get_send_queue_stats(self):
+        """Состояние очередей отправки: {client_id: SendQueue.stats()}"""
+        return {client_id: send_queue.stats() for client_id, send_queue in self.send_queues.items()}
         
+    async def close_connection(self, client_id):
+        """Закрытие соединения с одним клиентом"""
+        pc = self.connections.get(client_id)
+        if not pc:
+            return
+        self._handle_client_disconnect(client_id)
+        try:
+            await pc.close()
+            logger.info(f"Connection closed for client {client_id}")
+        except Exception as e:
+            logger.error(f"Error closing connection for client {client_id}: {e}")
+            
     async def close_all_connections(self):
         """Закрытие всех соединений"""
-        for client_id, pc in self.connections.items():
+        self.offer_pool_size = 0
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._pool_task is not None:
+            self._pool_task.cancel()
+            self._pool_task = None
+        for pc, _, _ in self.offer_pool:
+            await pc.close()
+        self.offer_pool.clear()
+        for client_id, pc in list(self.connections.items()):
             try:
                 await pc.close()
                 logger.info(f"Connection closed for client {client_id}")
@@ -170,4 +480,15 @@ class P2PHost:
                 
         self.connections.clear()
         self.data_channels.clear()
-        self.client_ready.clear()
\ No newline at end of file
+        self.ephemeral_channels.clear()
+        self.client_ready.clear()
+        for send_queue in self.send_queues.values():
+            send_queue.close()
+        self.send_queues.clear()
+        self.reassemblers.clear()
+        self.link_stats.clear()
+        self.negotiation_stats.clear()
+        for gathering in self.gathering.values():
+            gathering.cancel()
+        self.gathering.clear()
+        self.pending_candidates.clear()
\ No newline at end of file
@@ -0,0 +1,56 @@
+# app/core/network/room_list.py
+# Локальная копия каталога комнат сигнального сервера для лобби.
+# Страницы ('rooms') и изменения ('rooms_diff') применяются к одному
+# словарю, поэтому после подписки список не нужно перезапрашивать целиком.
+
+
+class RoomList:
+    """Открытые комнаты, известные клиенту, в порядке создания"""
+
+    def __init__(self, game=None, mode=None, min_free_seats=1):
+        self.game = game
+        self.mode = mode
+        self.min_free_seats = min_free_seats
+        self.rooms = {}  # {room: описание от сервера}
+        self.next_cursor = None
+
+    def set_filter(self, game=None, mode=None, min_free_seats=1):
+        """Смена фильтра; загруженные комнаты сбрасываются"""
+        self.game = game
+        self.mode = mode
+        self.min_free_seats = min_free_seats
+        self.rooms.clear()
+        self.next_cursor = None
+
+    def apply_page(self, data):
+        """Ответ на list_rooms/subscribe_rooms"""
+        if not data.get('cursor'):
+            self.rooms.clear()
+        for room in data.get('rooms', []):
+            self.rooms[room['room']] = room
+        self.next_cursor = data.get('next_cursor')
+
+    def apply_diff(self, diff):
+        """Изменение каталога: add/update/remove"""
+        room = diff.get('room', {})
+        name = room.get('room')
+        if not name:
+            return
+        if diff.get('op') == 'remove' or not self._matches(room):
+            self.rooms.pop(name, None)
+        elif name not in self.rooms and self.next_cursor is not None \
+                and room.get('seq', 0) > self.next_cursor:
+            # Комнаты после курсора придут со следующей страницей
+            return
+        else:
+            self.rooms[name] = room
+
+    def _matches(self, room):
+        return room.get('open', True) \
+            and (not self.game or room.get('game') == self.game) \
+            and (not self.mode or room.get('mode') == self.mode) \
+            and room.get('free_seats', 0) >= self.min_free_seats
+
+    def visible(self):
+        """Комнаты для отображения"""
+        return sorted(self.rooms.values(), key=lambda room: room.get('seq', 0))
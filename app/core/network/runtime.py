@@ -0,0 +1,383 @@
+# app/core/network/runtime.py
+# Сетевой рантайм P2P: один долгоживущий поток с циклом asyncio, которому
+# принадлежат все RTCPeerConnection (P2PHost или P2PClient).
+#
+# Поток Kivy общается с ним только через очереди:
+#   - команды (CreateOffer, AcceptAnswer, ...) - submit() из любого потока,
+#     выполняются в цикле asyncio и возвращают concurrent.futures.Future;
+#   - события (OfferCreated, IceCandidateGathered, PeerConnected, ...) - складываются в очередь,
+#     poll() забирает их в потоке Kivy.
+# Команды разных пиров выполняются конкурентно, команды одного пира -
+# строго в порядке отправки (offer -> answer -> ICE).
+#
+# Состояние игры синхронизируется здесь же (state_sync): хост после
+# AttachGame рассылает дельты PublishState и сам отвечает на state_resync,
+# клиент собирает StateReplica и отдает в поток Kivy событие StateUpdated
+# вместо сырых game_state/game_delta.
+#
+# Пример для Kivy:
+#     runtime = NetworkRuntime('host', wakeup=lambda: Clock.schedule_once(process, 0))
+#     runtime.start()
+#     runtime.submit(CreateOffer(client_id))
+#     def process(dt):
+#         for event in runtime.poll():
+#             ...
+
+import asyncio
+import queue
+import threading
+from typing import Any, NamedTuple, Optional
+
+from core.network.net_log import get_logger
+from core.network.state_sync import DELTA, RESYNC, SNAPSHOT, HostStateSync, StateReplica
+
+log = get_logger(__name__)
+
+HOST = 'host'
+CLIENT = 'client'
+
+
+# --- Команды (поток Kivy -> цикл asyncio) ---
+
+class CreateOffer(NamedTuple):
+    """Хост: новое соединение с клиентом и offer для него"""
+    peer_id: str
+
+
+class CreateOffers(NamedTuple):
+    """Хост: offer для нескольких клиентов сразу (согласуются параллельно)"""
+    peer_ids: tuple
+
+
+class AcceptAnswer(NamedTuple):
+    """Хост: answer клиента на наш offer"""
+    peer_id: str
+    answer: dict
+
+
+class AcceptOffer(NamedTuple):
+    """Клиент: offer хоста; ответ придет событием AnswerCreated"""
+    peer_id: str
+    offer: dict
+
+
+class AddIceCandidate(NamedTuple):
+    peer_id: str
+    candidate: dict
+
+
+class SendMessage(NamedTuple):
+    peer_id: str
+    message: dict
+    coalesce: Optional[str] = None  # ключ слияния (только хост, см. send_queue)
+    channel: Optional[str] = None   # класс канала (см. channels); по умолчанию - по типу
+
+
+class Broadcast(NamedTuple):
+    """Хост: сообщение всем клиентам"""
+    message: dict
+    exclude: Optional[str] = None
+    coalesce: Optional[str] = None
+    channel: Optional[str] = None
+
+
+class SetOfferPool(NamedTuple):
+    """Хост: сколько клиентов ожидается - для них заранее готовятся offer"""
+    size: int
+
+
+class GetNegotiationStats(NamedTuple):
+    """Хост: время фаз согласования по клиентам (результат в Future)"""
+    pass
+
+
+class GetLinkStats(NamedTuple):
+    """RTT, потери и трафик (LinkStats.snapshot): хост - по клиентам или одного, клиент - до хоста"""
+    peer_id: Optional[str] = None
+
+
+class AttachGame(NamedTuple):
+    """Хост: игра, состояние которой рассылается клиентам (подключенным - снимок сразу)"""
+    game: Any
+
+
+class PublishState(NamedTuple):
+    """Хост: рассылка дельты game.commit_state(), зафиксированной в потоке Kivy"""
+    delta: dict
+
+
+class ClosePeer(NamedTuple):
+    peer_id: str
+
+
+class CloseAll(NamedTuple):
+    pass
+
+
+# --- События (цикл asyncio -> поток Kivy) ---
+
+class OfferCreated(NamedTuple):
+    peer_id: str
+    offer: dict
+
+
+class AnswerCreated(NamedTuple):
+    peer_id: str
+    answer: dict
+
+
+class IceCandidateGathered(NamedTuple):
+    """Локальный ICE-кандидат для отправки пиру (пустой candidate - конец кандидатов)"""
+    peer_id: str
+    candidate: dict
+
+
+class PeerConnected(NamedTuple):
+    """Data channel с пиром открыт"""
+    peer_id: str
+
+
+class PeerDisconnected(NamedTuple):
+    peer_id: str
+
+
+class MessageReceived(NamedTuple):
+    peer_id: str
+    message: dict
+
+
+class StateUpdated(NamedTuple):
+    """Клиент: новая версия состояния игры (state - только для чтения)"""
+    seq: int
+    state: dict
+
+
+class CommandFailed(NamedTuple):
+    command: Any
+    error: str
+
+
+class NetworkRuntime:
+    """Поток asyncio с P2PHost (role='host') или P2PClient (role='client')"""
+
+    def __init__(self, role=HOST, wakeup=None):
+        """
+        :param role: 'host' или 'client'.
+        :param wakeup: вызывается из потока asyncio, когда в очереди появились
+            события, которые еще не забрал poll() (один раз на пачку событий).
+        """
+        if role not in (HOST, CLIENT):
+            raise ValueError(f"Unknown network role: {role}")
+        self.role = role
+        self.wakeup = wakeup
+        self.loop = None
+        self.thread = None
+        self.peer = None  # P2PHost или P2PClient, доступен только из цикла asyncio
+        self.state_sync = None  # HostStateSync хоста после AttachGame, только из цикла asyncio
+        self.replica = StateReplica(on_resync=self._request_resync)  # состояние игры у клиента
+        self.events = queue.SimpleQueue()
+        self._locks = {}  # {peer_id: asyncio.Lock}, только из цикла asyncio
+        self._wakeup_lock = threading.Lock()
+        self._wakeup_pending = False
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Запуск потока; возвращается, когда цикл готов принимать команды"""
+        if self.running:
+            return
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, args=(ready,), name=f"p2p-{self.role}", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def stop(self, timeout=5.0):
+        """Закрытие всех соединений и остановка потока"""
+        if not self.running:
+            return
+        try:
+            self.submit(CloseAll()).result(timeout)
+        except Exception as e:
+            log.warning("Network runtime: closing connections failed", error=e)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+        self.thread = None
+
+    def submit(self, command):
+        """
+        Отправка команды в цикл asyncio (из любого потока).
+        :return: concurrent.futures.Future с результатом команды
+        """
+        if not self.running:
+            raise RuntimeError("Network runtime is not running")
+        return asyncio.run_coroutine_threadsafe(self._execute(command), self.loop)
+
+    def poll(self):
+        """Все накопившиеся события (вызывать в потоке Kivy)"""
+        with self._wakeup_lock:
+            self._wakeup_pending = False
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    # --- Поток asyncio ---
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.peer = self._create_peer()
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            log.info("Network runtime stopped", role=self.role)
+
+    def _create_peer(self):
+        if self.role == HOST:
+            from core.network.p2p_host import P2PHost
+            return P2PHost(
+                on_client_message_callback=self._on_client_message,
+                on_client_ready_callback=lambda peer_id: self._emit(PeerConnected(peer_id)),
+                on_client_disconnect_callback=self._on_client_disconnect,
+                on_ice_candidate_callback=lambda peer_id, candidate: self._emit(IceCandidateGathered(peer_id, candidate))
+            )
+        from core.network.p2p_client import P2PClient
+        return P2PClient(
+            on_host_message_callback=self._on_host_message,
+            on_ready_callback=self._on_host_ready,
+            on_disconnect_callback=lambda peer_id: self._emit(PeerDisconnected(peer_id)),
+            on_ice_candidate_callback=lambda peer_id, candidate: self._emit(IceCandidateGathered(peer_id, candidate))
+        )
+
+    def _on_client_message(self, peer_id, message):
+        # Запросы догонки хост обслуживает сам; до AttachGame догонять нечего
+        if message.get('type') == RESYNC:
+            if self.state_sync is not None:
+                self.state_sync.handle_message(peer_id, message)
+            return
+        self._emit(MessageReceived(peer_id, message))
+
+    def _on_client_disconnect(self, peer_id):
+        if self.state_sync is not None:
+            self.state_sync.client_left(peer_id)
+        self._emit(PeerDisconnected(peer_id))
+
+    def _on_host_message(self, peer_id, message):
+        if message.get('type') in (SNAPSHOT, DELTA):
+            if self.replica.apply(message):
+                self._emit(StateUpdated(self.replica.seq, self.replica.state))
+            return
+        self._emit(MessageReceived(peer_id, message))
+
+    def _on_host_ready(self, peer_id):
+        # Клиент сам сообщает свою версию: после переподключения хост дошлет
+        # пропущенные дельты, новому клиенту (seq None) - снимок
+        self._request_resync(self.replica.resume_message())
+        self._emit(PeerConnected(peer_id))
+
+    def _request_resync(self, message):
+        if self.peer is not None:
+            self.peer.send_message(message)
+
+    def _emit(self, event):
+        self.events.put(event)
+        if self.wakeup is None:
+            return
+        with self._wakeup_lock:
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+        try:
+            self.wakeup()
+        except Exception:
+            log.error("Network runtime: wakeup callback failed", exc_info=True)
+
+    async def _execute(self, command):
+        peer_id = getattr(command, 'peer_id', None)
+        try:
+            if peer_id is None:
+                return await self._dispatch(command)
+            lock = self._locks.get(peer_id)
+            if lock is None:
+                lock = self._locks[peer_id] = asyncio.Lock()
+            async with lock:
+                return await self._dispatch(command)
+        except Exception as e:
+            log.error("Network command failed", exc_info=True, command=type(command).__name__, peer=peer_id)
+            self._emit(CommandFailed(command, str(e)))
+            raise
+
+    async def _dispatch(self, command):
+        peer = self.peer
+        host = self.role == HOST
+        if isinstance(command, CreateOffer) and host:
+            offer = await peer.create_offer_for_client(command.peer_id)
+            if offer is None:
+                raise RuntimeError(f"Failed to create offer for {command.peer_id}")
+            self._emit(OfferCreated(command.peer_id, offer))
+            return offer
+        if isinstance(command, CreateOffers) and host:
+            # Каждый клиент - под своей блокировкой, все вместе - параллельно
+            offers = await asyncio.gather(
+                *(self._execute(CreateOffer(peer_id)) for peer_id in command.peer_ids), return_exceptions=True
+            )
+            return {peer_id: (None if isinstance(offer, Exception) else offer)
+                    for peer_id, offer in zip(command.peer_ids, offers)}
+        if isinstance(command, AcceptAnswer) and host:
+            if not await peer.handle_answer_from_client(command.peer_id, command.answer):
+                raise RuntimeError(f"Failed to accept answer from {command.peer_id}")
+            return True
+        if isinstance(command, AcceptOffer) and not host:
+            answer = await peer.handle_offer_from_host(command.peer_id, command.offer)
+            if answer is None:
+                raise RuntimeError(f"Failed to accept offer from {command.peer_id}")
+            self._emit(AnswerCreated(command.peer_id, answer))
+            return answer
+        if isinstance(command, AddIceCandidate):
+            if host:
+                return await peer.handle_ice_candidate_from_client(command.peer_id, command.candidate)
+            return await peer.handle_ice_candidate_from_host(command.candidate)
+        if isinstance(command, SendMessage):
+            if host:
+                return peer.send_message_to_client(command.peer_id, command.message, command.coalesce,
+                                                   command.channel)
+            return peer.send_message(command.message, command.channel)
+        if isinstance(command, Broadcast) and host:
+            return peer.broadcast_message(command.message, exclude_client=command.exclude,
+                                          coalesce=command.coalesce, channel=command.channel)
+        if isinstance(command, SetOfferPool) and host:
+            return peer.set_offer_pool_size(command.size)
+        if isinstance(command, GetNegotiationStats) and host:
+            return peer.get_negotiation_stats()
+        if isinstance(command, GetLinkStats):
+            if host:
+                return peer.get_link_stats(command.peer_id)
+            return peer.get_link_stats()
+        if isinstance(command, AttachGame) and host:
+            self.state_sync = HostStateSync(command.game, peer.send_message_to_client, peer.broadcast_message)
+            for peer_id, ready in list(peer.client_ready.items()):
+                if ready:
+                    self.state_sync.client_ready(peer_id)
+            return True
+        if isinstance(command, PublishState) and host:
+            if self.state_sync is None:
+                raise RuntimeError("No game attached")
+            return self.state_sync.publish(command.delta)
+        if isinstance(command, ClosePeer):
+            self._locks.pop(command.peer_id, None)
+            if host:
+                return await peer.close_connection(command.peer_id)
+            return await peer.close()
+        if isinstance(command, CloseAll):
+            self._locks.clear()
+            if host:
+                return await peer.close_all_connections()
+            return await peer.close()
+        raise ValueError(f"Command {type(command).__name__} is not supported for role '{self.role}'")
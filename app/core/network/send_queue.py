@@ -0,0 +1,228 @@
+# app/core/network/send_queue.py
+# Очередь отправки в data channel одного клиента.
+#
+# Сообщение кодируется один раз (game_codec.encode_message), и один и тот же
+# объект bytes ставится в очереди всех получателей рассылки. Очередь ограничена
+# числом сообщений и байтами: если клиент не успевает забирать данные, новые
+# сообщения отклоняются (QUEUE_FULL), а не копятся в памяти хоста.
+#
+# Обратное давление: пока bufferedAmount канала выше верхней отметки,
+# очередь не сбрасывается в канал; отправка продолжается по событию
+# bufferedamountlow (нижняя отметка). Так буфер SCTP медленного клиента
+# не растет без предела.
+#
+# Слияние устаревших состояний: сообщения с ключом слияния (снимки состояния,
+# COALESCED_TYPES) заменяют еще не отправленное сообщение с тем же ключом.
+# Новое сообщение встает в конец очереди, после всех ходов, поставленных
+# раньше него, - ходы и чат не переупорядочиваются и не теряются, а медленный
+# клиент получает сразу актуальное состояние вместо череды старых.
+#
+# Большие сообщения (длиннее framing.CHUNK_SIZE) уходят частями. Пока такое
+# сообщение отправляется, в буфере канала держится не больше нижней отметки,
+# а срочные сообщения (PRIORITY_TYPES - ходы, чат) отправляются между частями:
+# снимок или повтор партии не задерживает ходы. Срочные сообщения обгоняют
+# несрочные, но между собой порядок сохраняют; остальные сообщения (дельты
+# состояния) идут строго после начатого большого сообщения.
+
+import asyncio
+from collections import deque
+import logging
+
+from core.network.framing import chunk_frame, needs_chunking, next_offset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_QUEUE_BYTES = 1024 * 1024
+HIGH_WATERMARK = 256 * 1024
+LOW_WATERMARK = 64 * 1024
+
+# Снимки состояния: из нескольких неотправленных важен только последний
+COALESCED_TYPES = frozenset({'game_state', 'lobby_state'})
+# Живые события партии: отправляются раньше несрочных и между частями больших сообщений
+PRIORITY_TYPES = frozenset({'move', 'move_processed', 'chat'})
+
+# Результаты постановки в очередь
+QUEUED = 'queued'
+QUEUE_FULL = 'queue_full'
+NOT_READY = 'not_ready'
+CLOSED = 'closed'
+
+
+def coalesce_key(message_data, coalesce=None):
+    """Ключ слияния: явный или тип сообщения для снимков состояния; None - без слияния"""
+    if coalesce is not None:
+        return coalesce
+    message_type = message_data.get('type')
+    return message_type if message_type in COALESCED_TYPES else None
+
+
+def is_priority(message_data):
+    return message_data.get('type') in PRIORITY_TYPES
+
+
+class SendQueue:
+    """Ограниченная очередь отправки в RTCDataChannel с учетом bufferedAmount"""
+
+    def __init__(self, channel, maxsize=DEFAULT_QUEUE_SIZE, max_bytes=DEFAULT_QUEUE_BYTES,
+                 high_watermark=HIGH_WATERMARK, low_watermark=LOW_WATERMARK, link_stats=None):
+        """:param link_stats: LinkStats соединения - учет отправленного трафика"""
+        self.channel = channel
+        self.link_stats = link_stats
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.queue = deque()  # [[key, payload]]; payload None - заменено более новым
+        self.urgent = deque()  # срочные payload (PRIORITY_TYPES)
+        self.current = None   # [message_id, memoryview, смещение] - большое сообщение в отправке
+        self._next_message_id = 0
+        self.latest = {}      # {key: запись в очереди}
+        self.pending = 0      # неотправленных сообщений (без замененных)
+        self.pending_bytes = 0
+        self.sent = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.chunks_sent = 0
+        self.paused = False   # ждем bufferedamountlow
+        self.closed = False
+        self._flush_scheduled = False
+        channel.bufferedAmountLowThreshold = low_watermark
+        channel.on("bufferedamountlow", self._on_buffered_amount_low)
+
+    def __len__(self):
+        return self.pending
+
+    def put(self, payload, key=None, priority=False):
+        """
+        Постановка bytes в очередь; результат - одна из констант модуля.
+        :param priority: срочное сообщение (см. PRIORITY_TYPES); без слияния.
+        """
+        if self.closed:
+            return CLOSED
+        if self.channel.readyState != 'open':
+            return NOT_READY
+        previous = self.latest.get(key) if key is not None else None
+        freed = len(previous[1]) if previous is not None else 0
+        if (self.pending - (previous is not None) >= self.maxsize
+                or self.pending_bytes - freed + len(payload) > self.max_bytes):
+            self.rejected += 1
+            return QUEUE_FULL
+        if priority and key is None and not needs_chunking(payload):
+            self.urgent.append(payload)
+            self.pending += 1
+            self.pending_bytes += len(payload)
+            self._schedule_flush()
+            return QUEUED
+        if previous is not None:
+            previous[1] = None
+            self.pending -= 1
+            self.pending_bytes -= freed
+            self.coalesced += 1
+        entry = [key, payload]
+        self.queue.append(entry)
+        self.pending += 1
+        self.pending_bytes += len(payload)
+        if key is not None:
+            self.latest[key] = entry
+        if len(self.queue) > 2 * self.pending + 16:
+            # Замененные записи не должны копиться при долгой паузе
+            self.queue = deque(entry for entry in self.queue if entry[1] is not None)
+        self._schedule_flush()
+        return QUEUED
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled and not self.paused:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        """Отправка накопленного, пока буфер канала ниже верхней отметки"""
+        self._flush_scheduled = False
+        queue = self.queue
+        urgent = self.urgent
+        while (urgent or self.current is not None or queue) and not self.closed:
+            buffered = self.channel.bufferedAmount
+            if buffered >= self.high_watermark:
+                self.paused = True
+                return
+            chunk = False
+            if urgent:
+                payload = urgent.popleft()
+                self.pending -= 1
+                self.pending_bytes -= len(payload)
+            elif self.current is not None:
+                if buffered > self.low_watermark:
+                    # Перед срочным сообщением не больше нижней отметки частей
+                    self.paused = True
+                    return
+                payload = self._next_chunk()
+                chunk = True
+            else:
+                entry = queue.popleft()
+                key, payload = entry
+                if payload is None:
+                    continue
+                if key is not None and self.latest.get(key) is entry:
+                    del self.latest[key]
+                if needs_chunking(payload):
+                    self.current = [self._next_message_id, memoryview(payload), 0]
+                    self._next_message_id = (self._next_message_id + 1) & 0xFFFFFFFF
+                    continue
+                self.pending -= 1
+                self.pending_bytes -= len(payload)
+            if not self._send(payload):
+                return
+            if not chunk or self.current is None:
+                self.sent += 1
+        self.paused = False
+
+    def _next_chunk(self):
+        message_id, view, offset = self.current
+        frame = chunk_frame(message_id, view, offset)
+        following = next_offset(offset, len(view))
+        self.pending_bytes -= (following if following is not None else len(view)) - offset
+        self.chunks_sent += 1
+        if following is None:
+            self.current = None
+            self.pending -= 1
+        else:
+            self.current[2] = following
+        return frame
+
+    def _send(self, payload):
+        try:
+            self.channel.send(payload)
+        except Exception as e:
+            logger.error(f"Error sending queued message ({self.pending} left): {e}")
+            self.close()
+            return False
+        if self.link_stats is not None:
+            self.link_stats.sent(len(payload))
+        return True
+
+    def _on_buffered_amount_low(self):
+        if self.paused and not self.closed:
+            self.paused = False
+            self.flush()
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'pending_bytes': self.pending_bytes,
+            'buffered_amount': self.channel.bufferedAmount,
+            'paused': self.paused,
+            'sent': self.sent,
+            'rejected': self.rejected,
+            'coalesced': self.coalesced,
+            'chunks_sent': self.chunks_sent
+        }
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self.urgent.clear()
+        self.current = None
+        self.latest.clear()
+        self.pending = 0
+        self.pending_bytes = 0
@@ -0,0 +1,134 @@
+# app/core/network/signal_codec.py
+# Компактный бинарный формат события signal (копия server/signal_codec.py -
+# сервер и приложение разворачиваются отдельно, формат должен совпадать).
+#
+# JSON-конверт signal повторяет sender/target/room/type на верхнем уровне
+# и type внутри data, а SDP offer/answer (несколько КБ) идет как есть.
+# Формат msgpack-z1:
+#   - конверт - массив MessagePack [версия, sender, target, room, type, data];
+#   - известные типы сигналов и ключи data заменены короткими числами;
+#   - type внутри data не дублируется;
+#   - client_id (UUID) sender/target передаются 16 байтами вместо 36 символов;
+#   - SDP минифицируется (пустые строки, CRLF -> LF) и сжимается zlib
+#     с предустановленным словарем типичных строк SDP.
+#
+# Кодек включается, только если установлен msgpack и обе стороны его
+# объявили (см. SignalingClient.connect и SignalingService.connect).
+
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # без msgpack остается обычный JSON-конверт
+    msgpack = None
+
+CODEC_NAME = 'msgpack-z1'
+VERSION = 1
+
+SIGNAL_TYPES = ('offer', 'answer', 'ice_candidate', 'join_request', 'game_start', 'player_joined', 'player_left')
+DATA_KEYS = ('type', 'sdp', 'candidate', 'sdpMid', 'sdpMLineIndex', 'data', 'sent_at')
+
+_TYPE_CODES = {name: code for code, name in enumerate(SIGNAL_TYPES, 1)}
+_KEY_CODES = {name: code for code, name in enumerate(DATA_KEYS)}
+
+# Словарь zlib: частые строки SDP (WebRTC data channel, aiortc и браузеры).
+# Менять только вместе с VERSION - словарь должен совпадать у обеих сторон.
+SDP_DICTIONARY = (
+    "v=0\no=- 0 0 IN IP4 0.0.0.0\ns=-\nt=0 0\na=group:BUNDLE 0\na=msid-semantic:WMS *\n"
+    "a=extmap-allow-mixed\nm=application 9 UDP/DTLS/SCTP webrtc-datachannel\n"
+    "c=IN IP4 0.0.0.0\na=mid:0\na=sctp-port:5000\na=max-message-size:262144\n"
+    "a=ice-ufrag:\na=ice-pwd:\na=ice-options:trickle\na=fingerprint:sha-256 \n"
+    "a=setup:actpass\na=setup:active\na=setup:passive\n"
+    "a=candidate: 1 udp 2130706431 typ host typ srflx raddr rport generation 0 network-cost 999\n"
+    "a=end-of-candidates\n"
+).encode('ascii')
+
+
+def available():
+    """Можно ли использовать бинарный кодек в этом процессе"""
+    return msgpack is not None
+
+
+def minify_sdp(sdp):
+    """Строки SDP без пустых и без CR"""
+    return '\n'.join(line.strip() for line in sdp.splitlines() if line.strip())
+
+
+def restore_sdp(minified):
+    # RFC 4566: строки SDP разделяются CRLF
+    return '\r\n'.join(minified.split('\n')) + '\r\n'
+
+
+def compress_sdp(sdp):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, SDP_DICTIONARY)
+    return compressor.compress(minify_sdp(sdp).encode('utf-8')) + compressor.flush()
+
+
+def decompress_sdp(blob):
+    decompressor = zlib.decompressobj(-15, SDP_DICTIONARY)
+    return restore_sdp((decompressor.decompress(blob) + decompressor.flush()).decode('utf-8'))
+
+
+def _pack_id(value):
+    # Канонический UUID (SignalingClient.client_id) -> 16 байт; остальное как есть
+    if isinstance(value, str) and len(value) == 36 and value[8] == value[13] == value[18] == value[23] == '-':
+        try:
+            packed = bytes.fromhex(value.replace('-', ''))
+        except ValueError:
+            return value
+        if packed.hex() == value.replace('-', ''):  # только нижний регистр восстановится точно
+            return packed
+    return value
+
+
+def _unpack_id(value):
+    if isinstance(value, bytes) and len(value) == 16:
+        h = value.hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    return value
+
+
+def encode_signal(sender, target, room, signal_type, data):
+    """Конверт signal -> bytes"""
+    body = {}
+    for key, value in (data or {}).items():
+        if key == 'type' and value == signal_type:
+            continue
+        if key == 'sdp' and isinstance(value, str):
+            value = compress_sdp(value)
+        body[_KEY_CODES.get(key, key)] = value
+    return msgpack.packb([VERSION, _pack_id(sender), _pack_id(target), room,
+                          _TYPE_CODES.get(signal_type, signal_type), body], use_bin_type=True)
+
+
+def decode_envelope(blob):
+    """
+    bytes -> (sender, target, room, type, body) без распаковки SDP:
+    этого достаточно, чтобы сервер выбрал адресата.
+    """
+    version, sender, target, room, signal_type, body = msgpack.unpackb(blob, raw=False, strict_map_key=False)
+    if version != VERSION:
+        raise ValueError(f"Unsupported signal codec version: {version}")
+    if isinstance(signal_type, int):
+        # Коды типов начинаются с 1: 0 и отрицательные не должны попадать в конец кортежа
+        if not 1 <= signal_type <= len(SIGNAL_TYPES):
+            raise ValueError(f"Unknown signal type code: {signal_type}")
+        signal_type = SIGNAL_TYPES[signal_type - 1]
+    return _unpack_id(sender), _unpack_id(target), room, signal_type, body
+
+
+def decode_signal(blob):
+    """bytes -> JSON-конверт signal {'sender', 'target', 'room', 'type', 'data'}"""
+    sender, target, room, signal_type, body = decode_envelope(blob)
+    data = {}
+    for key, value in body.items():
+        if isinstance(key, int):
+            if not 0 <= key < len(DATA_KEYS):
+                raise ValueError(f"Unknown signal data key code: {key}")
+            key = DATA_KEYS[key]
+        if key == 'sdp' and isinstance(value, bytes):
+            value = decompress_sdp(value)
+        data[key] = value
+    if signal_type is not None:
+        data.setdefault('type', signal_type)
+    return {'sender': sender, 'target': target, 'room': room, 'type': signal_type, 'data': data}
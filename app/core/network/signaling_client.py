@@ -3,13 +3,46 @@ import socketio
 import threading
 import json
 import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from typing import Callable, Any
 
+from core.network import signal_codec
+from core.network.net_log import get_logger
+
+log = get_logger(__name__)
+
 # --- ЗАМЕНИТЕ НА ВАШ URL С RENDER ---
 # Убедитесь, что URL содержит только допустимые символы без пробелов
 SERVER_URL = "https://fool-p2p-app.onrender.com"
 # --- КОНЕЦ ЗАМЕНЫ ---
 
+# Сколько ждать готовности (wait_connected/wait_joined/wait_host), с
+CONNECT_TIMEOUT = 15
+JOIN_TIMEOUT = 10
+HOST_TIMEOUT = 10
+
+
+class JoinError(Exception):
+    """Сервер отклонил join (комната не найдена, неверный пароль и т.п.)"""
+
+
+def _resolve(future, result=None, error=None):
+    """Завершение future, если оно еще не завершено (события могут повторяться)"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _wait(future, timeout, what):
+    """Результат future; TimeoutError с понятным сообщением, если не дождались"""
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        raise TimeoutError(f"{what}: no response in {timeout} s") from None
+
 class SignalingClient:
     def __init__(self, on_signal: Callable[[dict], None]):
         """
@@ -21,120 +54,262 @@ class SignalingClient:
         self.client_id = str(uuid.uuid4())  # Генерируем уникальный ID
         self.on_signal_callback = on_signal
         self.found_host_callback = None
+        # Каталог комнат: ответы на list_rooms/subscribe_rooms и изменения подписки
+        self.rooms_callback = None
+        self.rooms_diff_callback = None
+        # Подбор игроков: сервер собрал комнату / состояние очереди
+        self.matched_callback = None
+        self.match_queued_callback = None
+        # Сессия возобновлена после обрыва сокета: resumed_callback(data) с host_id и is_host
+        self.resumed_callback = None
         self.is_host = False
         self.room_password = None
+        # Токен возобновления от сервера (joined/matched/resumed): после обрыва
+        # сокета место в комнате возвращается одним событием resume вместо join
+        self.resume_token = None
+        # Бинарный кодек signal, согласованный с сервером при подключении (None - JSON)
+        self.codec = None
+        # Описание комнаты для каталога (хост): game, mode, deck_size, max_players, public
+        self.listing = None
+        # Готовность (concurrent.futures.Future): сокет подключен, ответ на join,
+        # хост комнаты известен. Лобби ждет их вместо фиксированных пауз
+        self.connected = Future()
+        self.joined = Future()
+        self.host_found = Future()
+        self._connect_thread = None
         self._setup_events()
-        print(f"SignalingClient initialized. Client ID: {self.client_id}")
-        print(f"Target server URL: '{SERVER_URL}'")
+        log.info("SignalingClient initialized", client_id=self.client_id, server=SERVER_URL)
 
     def _setup_events(self):
         @self.sio.event
         def connect():
-            print(f"[SocketIO Event] Connected to signaling server: {SERVER_URL}")
-            print(f"[SocketIO Event] Assigned SID: {self.sio.sid if hasattr(self.sio, 'sid') else 'N/A'}")
+            log.info("Connected to signaling server", server=SERVER_URL, sid=self.sio.get_sid())
+            _resolve(self.connected)
             # Автоматически присоединяемся к комнате после подключения
+            # (после обрыва - возобновляем сессию по токену)
             if self.room:
-                self._join_room_internal()
+                self._enter_room()
 
         @self.sio.event
         def disconnect():
-            print("[SocketIO Event] Disconnected from signaling server")
+            # При переподключении кодек согласуется заново
+            self.codec = None
+            # wait_connected после обрыва ждет автоматического переподключения
+            if self.connected.done():
+                self.connected = Future()
+            log.info("Disconnected from signaling server")
+
+        @self.sio.on('codec')
+        def on_codec(data):
+            if data.get('codec') == signal_codec.CODEC_NAME:
+                self.codec = signal_codec.CODEC_NAME
+                log.info("Binary signal codec enabled", codec=self.codec)
 
         @self.sio.event
         def connect_error(data):
              # Обрабатываем ошибку подключения на уровне SocketIO
-             print(f"[SocketIO Event] Connection Error: {data}")
              # data может содержать словарь с 'message' и 'error'
              if isinstance(data, dict):
-                 message = data.get('message', 'Unknown connection error (dict)')
-                 error_details = data.get('error', '')
-                 print(f"  - Message: {message}")
-                 if error_details:
-                     print(f"  - Error Details: {error_details}")
+                 log.error("Connection error",
+                           message=data.get('message', 'Unknown connection error (dict)'),
+                           details=data.get('error', ''))
              else:
-                 print(f"  - Error Data (raw): {data}")
+                 log.error("Connection error", data=data)
 
 
         @self.sio.on('joined')
         def on_joined(data):
             status = data.get('status')
             message = data.get('message', '')
-            print(f"[SocketIO Event] 'joined' received: status={status}, message={message}")
-            
+
             if status == 'success':
-                print(f"Successfully joined room: {self.room}")
+                self.resume_token = data.get('resume_token')
+                log.info("Joined room", room=self.room)
                 # Если мы хост, сообщаем об этом
                 if self.is_host:
                     self._announce_host()
+                _resolve(self.joined, data)
+                # Хост уже в комнате - сервер сообщает его в joined, host_available не ждем
+                if not self.is_host and data.get('host_id'):
+                    self._host_found(data['host_id'])
             elif status == 'error':
-                print(f"Failed to join room: {message}")
+                log.warning("Failed to join room", room=self.room, message=message)
+                _resolve(self.joined, error=JoinError(message))
+
+        @self.sio.on('resumed')
+        def on_resumed(data):
+            if data.get('status') != 'success':
+                # Токен истек или комната удалена - обычный join (роль хоста
+                # существующей комнаты без токена не вернуть - хост получит ошибку)
+                log.warning("Session resume failed, joining again", room=self.room, message=data.get('message'))
+                self.resume_token = None
+                self._join_room_internal()
+                return
+            self.resume_token = data.get('resume_token')
+            self.is_host = bool(data.get('is_host'))
+            log.info("Session resumed", room=self.room, is_host=self.is_host, host_id=data.get('host_id'))
+            _resolve(self.joined, data)
+            if not self.is_host and data.get('host_id'):
+                _resolve(self.host_found, data['host_id'])
+            if self.resumed_callback:
+                self.resumed_callback(data)
+
+        @self.sio.on('resume_token')
+        def on_resume_token(data):
+            # Сервер продлевает токен, пока сокет подключен
+            if data.get('room') == self.room and self.resume_token:
+                self.resume_token = data.get('resume_token')
 
         @self.sio.on('signal')
         def on_signal(data):
-            print(f"[SocketIO Event] 'signal' received: type={data.get('type', 'unknown')}")
+            log.event('signal', "Signal received", type=data.get('type', 'unknown'))
             if self.on_signal_callback:
                 self.on_signal_callback(data)
 
+        @self.sio.on('signal_bin')
+        def on_signal_bin(blob):
+            try:
+                data = signal_codec.decode_signal(blob)
+            except Exception as e:
+                log.error("Malformed binary signal", error=e)
+                return
+            on_signal(data)
+
         @self.sio.on('host_available')
         def on_host_available(data):
             host_id = data.get('host_id')
             room = data.get('room')
-            print(f"[SocketIO Event] 'host_available' received: host_id={host_id}, room={room}")
+            log.info("Host available", host_id=host_id, room=room)
             if not self.is_host and host_id != self.client_id:
                 # Если мы не хост и это не наш ID, пытаемся подключиться
-                if self.found_host_callback:
-                    self.found_host_callback(host_id)
-                else:
-                    print("Host found, but no callback set")
+                self._host_found(host_id)
+
+        @self.sio.on('rooms')
+        def on_rooms(data):
+            log.event('rooms', "Room directory page received",
+                      count=len(data.get('rooms', [])), next_cursor=data.get('next_cursor'))
+            if self.rooms_callback:
+                self.rooms_callback(data)
+
+        @self.sio.on('rooms_diff')
+        def on_rooms_diff(data):
+            if self.rooms_diff_callback:
+                self.rooms_diff_callback(data)
+
+        @self.sio.on('match_queued')
+        def on_match_queued(data):
+            log.info("Matchmaking status", status=data.get('status'),
+                     queued=data.get('queued'), needed=data.get('needed'))
+            if self.match_queued_callback:
+                self.match_queued_callback(data)
+
+        @self.sio.on('matched')
+        def on_matched(data):
+            # Сервер уже добавил нас в комнату и выбрал хоста - join не нужен
+            self.room = data.get('room')
+            self.room_password = None
+            self.is_host = bool(data.get('is_host'))
+            self.resume_token = data.get('resume_token')
+            log.info("Match found", room=self.room, is_host=self.is_host, host_id=data.get('host_id'))
+            _resolve(self.joined, data)
+            if self.matched_callback:
+                self.matched_callback(data)
+
+    def _host_found(self, host_id):
+        _resolve(self.host_found, host_id)
+        if self.found_host_callback:
+            self.found_host_callback(host_id)
+        else:
+            log.warning("Host found, but no callback set")
 
     def connect(self):
-        """Подключается к серверу в отдельном потоке, чтобы не блокировать UI."""
+        """
+        Подключается к серверу в отдельном потоке, чтобы не блокировать UI.
+        :return: Future, завершающийся при подключении (или ошибкой подключения)
+        """
+        if self.sio.connected or (self._connect_thread is not None and self._connect_thread.is_alive()):
+            return self.connected
+        if self.connected.done():
+            # Повторная попытка после ошибки подключения
+            self.connected = Future()
+
         def run():
             try:
-                print(f"[Connect Method] Attempting to connect to {SERVER_URL}")
-                # Добавим больше информации о попытке подключения
-                print(f"[Connect Method] Using transports: ['websocket', 'polling']")
-                # Попробуем с reconnection=False, чтобы сразу увидеть ошибку
-                self.sio.connect(SERVER_URL, transports=['websocket', 'polling'], wait_timeout=10) # Увеличиваем wait_timeout
-                print("[Connect Method] SocketIO connection established, starting wait loop...")
+                log.info("Connecting", server=SERVER_URL, transports="websocket,polling")
+                # Объявляем серверу бинарный кодек signal, если доступен msgpack
+                auth = {'codecs': [signal_codec.CODEC_NAME]} if signal_codec.available() else None
+                self.sio.connect(SERVER_URL, transports=['websocket', 'polling'], wait_timeout=10, # Увеличиваем wait_timeout
+                                 auth=auth)
                 self.sio.wait()  # Блокирует поток, ожидая события
-                print("[Connect Method] SocketIO wait loop ended.")
+                log.info("SocketIO wait loop ended")
             except socketio.exceptions.ConnectionError as conn_err:
                 # Более конкретная обработка ошибки подключения
-                print(f"[Connect Method] SignalingClient connection error (ConnectionError): {conn_err}")
-                # Попробуем получить больше деталей, если возможно
-                print(f"  - Type: {type(conn_err)}")
-                if hasattr(conn_err, '__cause__') and conn_err.__cause__:
-                     print(f"  - Cause: {conn_err.__cause__}")
-                     print(f"  - Cause Type: {type(conn_err.__cause__)}")
-                # Выводим traceback для полной информации
-                import traceback
-                print("[Connect Method] Full traceback for ConnectionError:")
-                traceback.print_exc()
+                log.error("SignalingClient connection error", exc_info=True,
+                          error=conn_err, cause=conn_err.__cause__)
+                _resolve(self.connected, error=conn_err)
             except Exception as e:
                 # Остальные ошибки
-                print(f"[Connect Method] SignalingClient connection error (General Exception): {e}")
-                print(f"  - Type: {type(e)}")
-                import traceback
-                print("[Connect Method] Full traceback for General Exception:")
-                traceback.print_exc()
+                log.error("SignalingClient connection error (general)", exc_info=True, error=e)
+                _resolve(self.connected, error=e)
+
+        self._connect_thread = threading.Thread(target=run, daemon=True)
+        self._connect_thread.start()
+        return self.connected
+
+    def wait_connected(self, timeout: float = CONNECT_TIMEOUT):
+        """Блокирует (вне потока UI) до подключения к серверу; TimeoutError/ConnectionError"""
+        _wait(self.connected, timeout, "Signaling server connection")
+
+    def wait_joined(self, timeout: float = JOIN_TIMEOUT) -> dict:
+        """Ответ сервера на join/resume; JoinError при отказе, TimeoutError без ответа"""
+        return _wait(self.joined, timeout, "Joining room")
 
-        print("[Connect Method] Starting connection thread...")
-        thread = threading.Thread(target=run, daemon=True)
-        thread.start()
-        print("[Connect Method] Connection thread started.")
+    def wait_host(self, timeout: float = HOST_TIMEOUT) -> str:
+        """client_id хоста комнаты (из joined, resumed или host_available)"""
+        return _wait(self.host_found, timeout, "Waiting for host")
 
     def join_room(self, room_name: str, password: str = None):
-        """Публичный метод для присоединения к комнате."""
-        print(f"[Join Room Method] Request to join room: {room_name}")
+        """
+        Публичный метод для присоединения к комнате.
+        :return: Future ответа сервера (см. wait_joined)
+        """
+        if room_name != self.room:
+            self.resume_token = None
         self.room = room_name
         self.room_password = password
+        # Каждая попытка ждет свой ответ сервера
+        if self.joined.done():
+            self.joined = Future()
+        if self.host_found.done() and not self.resume_token:
+            self.host_found = Future()
         if self.sio.connected:
-            print("[Join Room Method] Already connected, joining room immediately.")
-            self._join_room_internal()
+            self._enter_room()
         else:
-             print("[Join Room Method] Not connected yet, room will be joined after connection.")
+            log.info("Not connected yet, room will be joined after connection", room=room_name)
         # Если не подключены, комната будет присоединена при подключении
+        return self.joined
+
+    def _enter_room(self):
+        """resume, если есть токен для текущей комнаты, иначе join"""
+        if self.resume_token:
+            self._resume_internal()
+        else:
+            self._join_room_internal()
+
+    def _resume_internal(self):
+        """Возобновление сессии: место в комнате (и роль хоста) по токену за один ответ"""
+        try:
+            payload = {
+                'room': self.room,
+                'client_id': self.client_id,
+                'token': self.resume_token
+            }
+            if self.is_host and self.listing:
+                payload['listing'] = self.listing
+            self.sio.emit('resume', payload)
+            log.info("'resume' emitted", room=self.room, is_host=self.is_host)
+        except Exception as e:
+            log.error("Error emitting 'resume'", exc_info=True, error=e)
 
     def _join_room_internal(self):
         """Внутренний метод присоединения к комнате."""
@@ -142,17 +317,17 @@ class SignalingClient:
             payload = {
                 'room': self.room,
                 'password': self.room_password,
-                'is_host': self.is_host
+                'is_host': self.is_host,
+                # Постоянный ID: по нему сервер возвращает нам комнату/место
+                # после переподключения или перезапуска сервера
+                'client_id': self.client_id
             }
-            print(f"[_join_room_internal] Emitting 'join' with payload: {payload}")
+            if self.is_host and self.listing:
+                payload['listing'] = self.listing
             self.sio.emit('join', payload)
-            print(f"[_join_room_internal] 'join' event emitted for room: {self.room}")
+            log.info("'join' emitted", room=self.room, is_host=self.is_host)
         except Exception as e:
-            print(f"[_join_room_internal] Error emitting 'join' event: {e}")
-            print(f"  - Type: {type(e)}")
-            import traceback
-            print("[_join_room_internal] Full traceback:")
-            traceback.print_exc()
+            log.error("Error emitting 'join'", exc_info=True, error=e)
 
     def _announce_host(self):
         """Объявляем себя как хост."""
@@ -162,15 +337,10 @@ class SignalingClient:
                 'room': self.room
             }
             try:
-                print(f"[_announce_host] Emitting 'host_available' with payload: {payload}")
                 self.sio.emit('host_available', payload)
-                print(f"[_announce_host] 'host_available' event emitted for room {self.room}")
+                log.info("'host_available' emitted", room=self.room)
             except Exception as e:
-                print(f"[_announce_host] Error emitting 'host_available' event: {e}")
-                print(f"  - Type: {type(e)}")
-                import traceback
-                print("[_announce_host] Full traceback:")
-                traceback.print_exc()
+                log.error("Error emitting 'host_available'", exc_info=True, error=e)
 
     def send_signal(self, target_id: str, signal_data: dict):
         """
@@ -179,34 +349,78 @@ class SignalingClient:
         :param signal_data: Словарь с данными сигнала (sdp или candidate).
         """
         if not self.room:
-            print("[send_signal] Error: Not in a room")
+            log.warning("send_signal: not in a room")
+            return
+
+        try:
+            if self.codec:
+                self.sio.emit('signal_bin', signal_codec.encode_signal(
+                    self.client_id, target_id, self.room, signal_data.get('type'), signal_data))
+            else:
+                self.sio.emit('signal', {
+                    'sender': self.client_id,
+                    'target': target_id,
+                    'room': self.room,
+                    'type': signal_data.get('type'),
+                    'data': signal_data
+                })
+            log.event('signal', "Signal emitted", target=target_id, type=signal_data.get('type'))
+        except Exception as e:
+            log.error("Error emitting 'signal'", exc_info=True, error=e)
+
+    def list_rooms(self, game: str = None, mode: str = None, min_free_seats: int = 1,
+                   cursor: int = None, limit: int = 20):
+        """Запрос страницы каталога комнат; ответ придет в rooms_callback"""
+        self._emit_request('list_rooms', {
+            'game': game, 'mode': mode, 'min_free_seats': min_free_seats,
+            'cursor': cursor, 'limit': limit
+        })
+
+    def subscribe_rooms(self, game: str = None, mode: str = None, min_free_seats: int = 1, limit: int = 20):
+        """Подписка на изменения каталога игры; первая страница придет в rooms_callback"""
+        self._emit_request('subscribe_rooms', {
+            'game': game, 'mode': mode, 'min_free_seats': min_free_seats, 'limit': limit
+        })
+
+    def unsubscribe_rooms(self, game: str = None):
+        self._emit_request('unsubscribe_rooms', {'game': game})
+
+    def update_listing(self, **changes):
+        """Изменение описания своей комнаты в каталоге (хост): mode, max_players, open"""
+        if not self.room:
+            return
+        changes['room'] = self.room
+        self._emit_request('update_listing', changes)
+
+    def find_match(self, game: str, mode: str, deck_size: int, players_count: int, can_host: bool = True):
+        """Постановка в очередь подбора игроков; результат придет в matched_callback"""
+        self._emit_request('matchmake', {
+            'game': game,
+            'mode': mode,
+            'deck_size': deck_size,
+            'players_count': players_count,
+            'client_id': self.client_id,
+            'can_host': can_host
+        })
+
+    def cancel_match(self):
+        self._emit_request('cancel_matchmaking', {})
+
+    def _emit_request(self, event: str, payload: dict):
+        if not self.sio.connected:
+            log.warning("Request skipped: not connected", event_name=event)
             return
-            
-        payload = {
-            'sender': self.client_id,
-            'target': target_id,
-            'room': self.room,
-            'type': signal_data.get('type'),
-            'data': signal_data
-        }
-        print(f"[send_signal] Emitting 'signal' to {target_id} via server: type={signal_data.get('type')}")
         try:
-            self.sio.emit('signal', payload)
-            print(f"[send_signal] 'signal' event emitted successfully.")
+            self.sio.emit(event, payload)
         except Exception as e:
-            print(f"[send_signal] Error emitting 'signal' event: {e}")
-            print(f"  - Type: {type(e)}")
-            import traceback
-            print("[send_signal] Full traceback:")
-            traceback.print_exc()
+            log.error(f"Error emitting '{event}'", exc_info=True, error=e)
 
     def found_host(self, host_id: str):
         """Вызывается, когда найден доступный хост"""
-        print(f"[found_host] Callback called with host_id: {host_id}")
         if self.found_host_callback:
             self.found_host_callback(host_id)
         else:
-             print("[found_host] No callback function set.")
+            log.warning("found_host: no callback function set", host_id=host_id)
 
 # --- Пример использования (для тестирования отдельно) ---
 if __name__ == "__main__":
@@ -227,4 +441,4 @@ if __name__ == "__main__":
             pass
     except KeyboardInterrupt:
         if client.sio.connected:
-            client.sio.disconnect()
\ No newline at end of file
+            client.sio.disconnect()
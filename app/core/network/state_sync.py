@@ -0,0 +1,175 @@
+# app/core/network/state_sync.py
+# Синхронизация состояния игры по версиям.
+#
+# Хост после каждого хода рассылает дельту (BaseGame.commit_state):
+# {'type': 'game_delta', 'seq': N, 'ops': [...]} - только изменившиеся поля.
+# Клиент применяет дельту, если она продолжает его версию (seq == его seq + 1).
+# Полный снимок ({'type': 'game_state', 'seq': N, ...}) уходит только
+# подключившемуся клиенту и клиенту, чья очередь отправки не приняла дельту.
+# Переподключившийся клиент (и клиент с разрывом последовательности)
+# сообщает свою версию ({'type': 'state_resync', 'seq': его seq}), и хост
+# досылает ему пропущенные дельты из истории последних HISTORY_SIZE версий;
+# снимок - если клиент отстал сильнее или снимок в канале короче этих дельт.
+
+from collections import deque
+import logging
+
+from core.network.game_codec import encode_message
+from core.network.send_queue import QUEUED
+from games.base.state_delta import apply_delta
+
+logger = logging.getLogger(__name__)
+
+DELTA = 'game_delta'
+SNAPSHOT = 'game_state'
+RESYNC = 'state_resync'
+
+HISTORY_SIZE = 64  # последних дельт, из которых хост догоняет клиента
+
+
+class HostStateSync:
+    """Рассылка версий состояния игры хостом"""
+
+    def __init__(self, game, send, broadcast, history_size=HISTORY_SIZE):
+        """
+        :param game: игра (BaseGame) - источник дельт и снимков
+        :param send: send(client_id, message) -> bool, например P2PHost.send_message_to_client
+        :param broadcast: broadcast(message) -> {client_id: результат}, например P2PHost.broadcast_message
+        :param history_size: сколько последних дельт хранить для догонки клиентов
+        """
+        self.game = game
+        self.send = send
+        self.broadcast = broadcast
+        self.stale = set()  # клиенты, пропустившие дельту, - им нужен снимок
+        self.history = deque(maxlen=history_size)
+        # Последняя разосланная версия; снимок может быть новее (ход зафиксирован,
+        # дельта еще не разослана) - такую дельту реплика со снимком пропустит
+        self.seq = game.state_seq
+
+    def publish(self, delta=None):
+        """
+        Рассылка дельты; возвращает дельту или None.
+        :param delta: уже зафиксированная дельта (game.commit_state() в потоке игры,
+            рассылка - в потоке сети, см. runtime.PublishState); None - зафиксировать здесь
+        """
+        if delta is None:
+            delta = self.game.commit_state()
+        if delta is None:
+            return None
+        self.seq = delta['seq']
+        self.history.append(delta)
+        # Снимок уже содержит эту версию - дельту отставшие клиенты пропустят
+        for client_id in list(self.stale):
+            self.send_snapshot(client_id)
+        results = self.broadcast(delta)
+        if isinstance(results, dict):
+            self.stale.update(client_id for client_id, result in results.items() if result != QUEUED)
+        return delta
+
+    def send_snapshot(self, client_id):
+        """Полный снимок клиенту; при неудаче клиент остается в stale"""
+        if self.send(client_id, self.game.get_state_snapshot()):
+            self.stale.discard(client_id)
+            return True
+        self.stale.add(client_id)
+        return False
+
+    def catch_up(self, client_id, seq):
+        """
+        Догонка клиента с версии seq: пропущенные дельты из истории,
+        если она их покрывает, иначе снимок. True - клиенту все отправлено.
+        """
+        current = self.seq
+        if seq == current and client_id not in self.stale:
+            return True
+        if not self.history or seq > current or self.history[0]['seq'] > seq + 1 or client_id in self.stale:
+            return self.send_snapshot(client_id)
+        missed = [delta for delta in self.history if delta['seq'] > seq]
+        # Маленькое состояние бывает дешевле отправить целиком, чем серию дельт
+        snapshot_size = len(encode_message(self.game.get_state_snapshot()))
+        if sum(len(encode_message(delta)) for delta in missed) >= snapshot_size:
+            return self.send_snapshot(client_id)
+        for delta in missed:
+            if not self.send(client_id, delta):
+                # Дальше дельты пойдут с разрывом - клиенту нужен снимок
+                self.stale.add(client_id)
+                return False
+        return True
+
+    def client_ready(self, client_id, seq=None):
+        """
+        Клиент подключился или переподключился.
+        :param seq: последняя версия, подтвержденная клиентом (None - состояния у него нет)
+        """
+        if seq is None:
+            self.send_snapshot(client_id)
+        else:
+            self.catch_up(client_id, seq)
+
+    def client_left(self, client_id):
+        self.stale.discard(client_id)
+
+    def handle_message(self, client_id, message_data):
+        """Обработка запроса догонки; True - сообщение относилось к синхронизации"""
+        if message_data.get('type') != RESYNC:
+            return False
+        seq = message_data.get('seq')
+        logger.info(f"Client {client_id} requested state resync from seq {seq}, "
+                    f"current seq {self.seq}")
+        if isinstance(seq, int):
+            self.catch_up(client_id, seq)
+        else:
+            self.send_snapshot(client_id)
+        return True
+
+
+class StateReplica:
+    """Копия состояния игры у клиента, собираемая из снимков и дельт"""
+
+    def __init__(self, on_resync=None):
+        """:param on_resync: on_resync(message) - отправка запроса снимка хосту"""
+        self.on_resync = on_resync
+        self.reset()
+
+    def reset(self):
+        """Сброс: до снимка состояние неизвестно (после переподключения - см. resume_message)"""
+        self.state = {}
+        self.seq = 0
+        self.awaiting_snapshot = False
+
+    def apply(self, message_data):
+        """
+        Применение game_state/game_delta.
+        :return: True, если состояние изменилось
+        """
+        message_type = message_data.get('type')
+        if message_type == SNAPSHOT:
+            self.state = {key: value for key, value in message_data.items() if key not in ('type', 'seq')}
+            self.seq = message_data.get('seq', 0)
+            self.awaiting_snapshot = False
+            return True
+        if message_type != DELTA:
+            return False
+        seq = message_data['seq']
+        if seq <= self.seq:
+            return False  # уже учтено снимком
+        if seq != self.seq + 1:
+            if not self.awaiting_snapshot:
+                logger.warning(f"State delta gap: have seq {self.seq}, got {seq}; requesting resync")
+                self.awaiting_snapshot = True
+                if self.on_resync:
+                    self.on_resync({'type': RESYNC, 'seq': self.seq})
+            return False
+        # Следующая по порядку дельта (в том числе досланная хостом после resync)
+        self.state = apply_delta(self.state, message_data['ops'])
+        self.seq = seq
+        self.awaiting_snapshot = False
+        return True
+
+    def resume_message(self):
+        """
+        Запрос догонки после переподключения к хосту: хост дошлет дельты
+        с подтвержденной версии вместо полного снимка.
+        """
+        self.awaiting_snapshot = True
+        return {'type': RESYNC, 'seq': self.seq if self.state else None}
@@ -9,19 +9,34 @@ from kivy.uix.popup import Popup
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 from kivy.metrics import dp
+import logging
 import threading
 import asyncio
-import time
+
+from core.network.room_list import RoomList
+from core.network.runtime import (
+    NetworkRuntime, CreateOffers, AcceptAnswer, SetOfferPool, GetNegotiationStats, AcceptOffer, AddIceCandidate,
+    AttachGame, PublishState,
+    OfferCreated, AnswerCreated, IceCandidateGathered, PeerConnected, PeerDisconnected, MessageReceived,
+    StateUpdated, CommandFailed
+)
+
+logger = logging.getLogger(__name__)
 
 class LobbyScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.signaling_client = None
-        self.p2p_host = None # Только для хоста
-        self.p2p_client = None # Только для клиента
+        self.network = None # NetworkRuntime: все P2P соединения в отдельном потоке asyncio
+        self.host_id = None # Только для клиента
+        self.host_connected = False # Открыт data channel с хостом (только для клиента)
+        self.host_requested = False # join_request хосту отправлен, соединение согласуется
+        self.pending_joins = [] # join_request текущего кадра (хост согласует их вместе)
+        self.direct_peers = set() # Клиенты с открытым data channel (только для хоста)
         self.connected_players = []
         self.is_host = False
         self.game_params = {} # Для хранения параметров игры
+        self.synced_game = None # Игра, состояние которой хост рассылает клиентам (AttachGame)
         
         # UI элементы
         self.status_label = None
@@ -33,6 +48,16 @@ class LobbyScreen(Screen):
         self.room_name_input = None
         self.password_input = None
         self.start_game_btn = None
+        # Кнопка входа в комнату: create_room_btn в UI хоста, connect_btn в UI клиента.
+        # Роль может смениться без перестройки UI (подбор назначает хоста сервер)
+        self.create_room_btn = None
+        self.connect_btn = None
+        # Обозреватель каталога комнат (только для клиента)
+        self.room_list = None
+        self.rooms_grid = None
+        self.more_rooms_btn = None
+        self.room_browser = None
+        self.matchmaking = False # В очереди подбора игроков
         
     def on_pre_enter(self):
         # Определяем, является ли пользователь хостом
@@ -159,6 +184,11 @@ class LobbyScreen(Screen):
         self.create_room_btn.bind(on_press=self.create_room)
         parent_layout.add_widget(self.create_room_btn)
         
+        # Кнопка "Найти игру" - сервер подберет игроков с теми же параметрами
+        self.find_match_btn = Button(text='Найти игру', size_hint_y=None, height=dp(50))
+        self.find_match_btn.bind(on_press=self.find_match)
+        parent_layout.add_widget(self.find_match_btn)
+        
         # Список игроков
         self._setup_players_list(parent_layout)
         
@@ -174,6 +204,11 @@ class LobbyScreen(Screen):
         self.connect_btn.bind(on_press=self.show_connect_popup)
         parent_layout.add_widget(self.connect_btn)
         
+        # Кнопка "Список комнат" - открытые игры из каталога сигнального сервера
+        self.browse_btn = Button(text='Список комнат', size_hint_y=None, height=dp(50))
+        self.browse_btn.bind(on_press=self.show_room_browser)
+        parent_layout.add_widget(self.browse_btn)
+        
         # Информация о подключении
         self.connection_info = Label(
             text='Введите название комнаты для подключения',
@@ -200,16 +235,11 @@ class LobbyScreen(Screen):
         self.players_scroll.add_widget(self.players_layout)
         parent_layout.add_widget(self.players_scroll)
         
-    def create_room(self, instance):
-        """Создание комнаты (для хоста)"""
-        # Валидация параметров
+    def _selected_game_params(self):
+        """Проверенные параметры игры из выпадающих списков; None при ошибке"""
         if self.mode_button.text == 'Выбрать режим':
             self.show_error("Пожалуйста, выберите режим игры")
-            return
-            
-        if not self.room_name_input.text.strip():
-            self.show_error("Пожалуйста, введите название комнаты")
-            return
+            return None
             
         # Проверка количества карт и игроков
         deck_text = self.deck_button.text
@@ -221,17 +251,30 @@ class LobbyScreen(Screen):
         min_cards_needed = players_count * 6
         if deck_size < min_cards_needed:
             self.show_error(f"Для {players_count} игроков нужно минимум {min_cards_needed} карт. Выбрано {deck_size}.")
-            return
+            return None
             
-        # Сохраняем параметры
-        self.game_params = {
+        return {
             'mode': self.mode_button.text.lower(),
             'deck_size': deck_size,
-            'players_count': players_count,
-            'room_name': self.room_name_input.text.strip(),
-            'password': self.password_input.text
+            'players_count': players_count
         }
         
+    def create_room(self, instance):
+        """Создание комнаты (для хоста)"""
+        # Валидация параметров
+        params = self._selected_game_params()
+        if params is None:
+            return
+            
+        if not self.room_name_input.text.strip():
+            self.show_error("Пожалуйста, введите название комнаты")
+            return
+            
+        # Сохраняем параметры
+        self.game_params = dict(params,
+                                room_name=self.room_name_input.text.strip(),
+                                password=self.password_input.text)
+        
         app = self.get_app()
         app.game_manager.game_mode = self.game_params['mode']
         app.game_manager.room_name = self.game_params['room_name']
@@ -244,7 +287,87 @@ class LobbyScreen(Screen):
         # Запускаем подключение в отдельном потоке
         threading.Thread(target=self._connect_as_host, daemon=True).start()
         
-    def show_connect_popup(self, instance):
+    def find_match(self, instance):
+        """Поиск игры через очередь подбора сервера (повторное нажатие - отмена)"""
+        if self.matchmaking:
+            self.matchmaking = False
+            if self.signaling_client:
+                self.signaling_client.cancel_match()
+            self.find_match_btn.text = 'Найти игру'
+            self.create_room_btn.disabled = False
+            self.status_label.text = 'Поиск игры отменен'
+            return
+            
+        params = self._selected_game_params()
+        if params is None:
+            return
+        self.game_params = dict(params, room_name=None, password='')
+        self.get_app().game_manager.game_mode = params['mode']
+        self.get_app().game_manager.max_players = params['players_count']
+        
+        self.matchmaking = True
+        self.find_match_btn.text = 'Отменить поиск'
+        self.create_room_btn.disabled = True
+        self.status_label.text = 'Поиск игроков...'
+        threading.Thread(target=self._start_matchmaking, daemon=True).start()
+        
+    def _start_matchmaking(self):
+        """Подключение к сигнальному серверу и постановка в очередь подбора"""
+        try:
+            from kivy.clock import Clock
+            
+            if self.signaling_client is None:
+                self._create_client_signaling()
+            self.signaling_client.wait_connected()
+            self.signaling_client.matched_callback = \
+                lambda data: Clock.schedule_once(lambda dt: self.on_matched(data), 0)
+            self.signaling_client.match_queued_callback = \
+                lambda data: Clock.schedule_once(lambda dt: self.on_match_queued(data), 0)
+            self.signaling_client.find_match(self._game_name(), self.game_params['mode'],
+                                             self.game_params['deck_size'], self.game_params['players_count'])
+        except Exception as e:
+            logger.error(f"Matchmaking failed: {e}")
+            message = str(e)
+            from kivy.clock import Clock
+            Clock.schedule_once(lambda dt: self.on_connection_error(message), 0)
+            
+    def on_match_queued(self, data):
+        """Состояние очереди подбора"""
+        if data.get('status') == 'queued':
+            self.status_label.text = f"Поиск игроков: {data.get('queued', 1)} из {data.get('needed', 2)}"
+        elif data.get('status') == 'error':
+            self.matchmaking = False
+            self.find_match_btn.text = 'Найти игру'
+            self.create_room_btn.disabled = False
+            self.status_label.text = f"Ошибка поиска: {data.get('message', 'Неизвестная ошибка')}"
+            
+    def on_matched(self, data):
+        """Сервер собрал комнату и выбрал хоста"""
+        self.matchmaking = False
+        self.find_match_btn.disabled = True
+        self.find_match_btn.text = 'Игра найдена'
+        
+        app = self.get_app()
+        room_name = data['room']
+        self.game_params['room_name'] = room_name
+        app.game_manager.room_name = room_name
+        app.game_manager.room_password = None
+        self.is_host = bool(data.get('is_host'))
+        app.game_manager.is_host = self.is_host
+        
+        if self.is_host:
+            self._start_network('host')
+            self.status_label.text = "Игра найдена. Вы хост, ожидание подключения игроков..."
+            self.add_player_to_list("Вы (хост)")
+        else:
+            self.status_label.text = "Игра найдена. Подключение к хосту..."
+            self.add_player_to_list("Вы")
+        own_id = self.signaling_client.client_id
+        for player_id in data.get('players', []):
+            if player_id != own_id:
+                self.add_player_to_list(f"Игрок {player_id[:6]}")
+                
+    def show_connect_popup(self, instance, room_name=''):
         """Показать popup для подключения клиента"""
         content = BoxLayout(orientation='vertical', padding=dp(15), spacing=dp(10))
         
@@ -262,6 +385,7 @@ class LobbyScreen(Screen):
         content.add_widget(room_label)
         
         room_input = TextInput(
+            text=room_name,
             hint_text='Введите название комнаты',
             size_hint_y=None,
             height=dp(40),
@@ -324,74 +448,348 @@ class LobbyScreen(Screen):
         
         popup.open()
         
+    def show_room_browser(self, instance):
+        """Показать список открытых комнат с обновлением в реальном времени"""
+        self.room_list = RoomList(game=self._game_name())
+        content = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(8))
+        
+        # Фильтр по режиму
+        filter_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        for mode in ['Все', 'Подкидной', 'Переводной']:
+            btn = Button(text=mode)
+            btn.bind(on_press=lambda btn: self._set_room_filter(None if btn.text == 'Все' else btn.text.lower()))
+            filter_layout.add_widget(btn)
+        content.add_widget(filter_layout)
+        
+        # Список комнат
+        rooms_scroll = ScrollView()
+        self.rooms_grid = GridLayout(cols=1, spacing=dp(3), size_hint_y=None)
+        self.rooms_grid.bind(minimum_height=self.rooms_grid.setter('height'))
+        rooms_scroll.add_widget(self.rooms_grid)
+        content.add_widget(rooms_scroll)
+        
+        # Кнопки
+        buttons_layout = BoxLayout(size_hint_y=None, height=dp(45), spacing=dp(10))
+        self.more_rooms_btn = Button(text='Ещё', disabled=True)
+        self.more_rooms_btn.bind(on_press=self._load_more_rooms)
+        close_btn = Button(text='Закрыть')
+        buttons_layout.add_widget(self.more_rooms_btn)
+        buttons_layout.add_widget(close_btn)
+        content.add_widget(buttons_layout)
+        
+        popup = Popup(
+            title='Открытые комнаты',
+            content=content,
+            size_hint=(0.9, 0.8)
+        )
+        self.room_browser = popup
+        
+        def on_dismiss(instance):
+            self.room_browser = None
+            if self.signaling_client and self.room_list:
+                self.signaling_client.unsubscribe_rooms(self.room_list.game)
+                
+        close_btn.bind(on_press=popup.dismiss)
+        popup.bind(on_dismiss=on_dismiss)
+        popup.open()
+        self._render_room_list()
+        
+        threading.Thread(target=self._start_browsing, daemon=True).start()
+        
+    def _start_browsing(self):
+        """Подключение к сигнальному серверу (если нужно) и подписка на каталог"""
+        try:
+            if self.signaling_client is None:
+                self._create_client_signaling()
+            self.signaling_client.wait_connected()
+            self.signaling_client.subscribe_rooms(self.room_list.game, self.room_list.mode)
+        except Exception as e:
+            logger.error(f"Room directory subscription failed: {e}")
+            message = f"Ошибка загрузки списка комнат: {e}"
+            from kivy.clock import Clock
+            Clock.schedule_once(lambda dt: setattr(self.status_label, 'text', message), 0)
+            
+    def _set_room_filter(self, mode):
+        """Смена фильтра режима в списке комнат"""
+        self.room_list.set_filter(game=self.room_list.game, mode=mode)
+        self._render_room_list()
+        if self.signaling_client:
+            self.signaling_client.subscribe_rooms(self.room_list.game, mode)
+            
+    def _load_more_rooms(self, instance):
+        """Следующая страница каталога"""
+        if self.signaling_client and self.room_list.next_cursor is not None:
+            self.more_rooms_btn.disabled = True
+            self.signaling_client.list_rooms(self.room_list.game, self.room_list.mode,
+                                             cursor=self.room_list.next_cursor)
+            
+    def on_rooms_page(self, data):
+        """Страница каталога от сервера"""
+        if self.room_list is None or data.get('mode') != self.room_list.mode:
+            return # Ответ на запрос со старым фильтром
+        self.room_list.apply_page(data)
+        self._render_room_list()
+        
+    def on_rooms_diff(self, diff):
+        """Изменение каталога: комната добавлена, обновлена или удалена"""
+        if self.room_list is None:
+            return
+        self.room_list.apply_diff(diff)
+        self._render_room_list()
+        
+    def _render_room_list(self):
+        """Перерисовка списка комнат"""
+        if self.rooms_grid is None or self.room_browser is None:
+            return
+        self.rooms_grid.clear_widgets()
+        rooms = self.room_list.visible()
+        if not rooms:
+            self.rooms_grid.add_widget(Label(text='Нет открытых комнат', size_hint_y=None, height=dp(30)))
+        for room in rooms:
+            text = f"{room['room']} · {room.get('mode') or '-'} · {room.get('players', 0)}/{room.get('max_players', 2)}"
+            if room.get('has_password'):
+                text += ' (пароль)'
+            btn = Button(text=text, size_hint_y=None, height=dp(40))
+            btn.bind(on_press=lambda btn, room=room: self._join_from_browser(room))
+            self.rooms_grid.add_widget(btn)
+        self.more_rooms_btn.disabled = self.room_list.next_cursor is None
+        
+    def _join_from_browser(self, room):
+        """Подключение к комнате, выбранной в списке"""
+        if self.room_browser:
+            self.room_browser.dismiss()
+        if room.get('has_password'):
+            self.show_connect_popup(None, room_name=room['room'])
+            return
+            
+        app = self.get_app()
+        app.game_manager.room_name = room['room']
+        app.game_manager.room_password = ''
+        
+        self.status_label.text = f"Подключение к комнате '{room['room']}'..."
+        self.connect_btn.disabled = True
+        threading.Thread(target=self._connect_as_client, daemon=True).start()
+        
+    def _game_name(self):
+        """Идентификатор игры для каталога комнат"""
+        app = self.get_app()
+        game = app.game_manager.current_game or getattr(app, 'game_selected', None)
+        return game.lower() if game else None
+        
     def _connect_as_host(self):
         """Подключение в роли хоста"""
+        from core.network.signaling_client import SignalingClient, JoinError
+        from kivy.clock import Clock
         try:
-            from core.network.signaling_client import SignalingClient
-            from core.network.p2p_host import P2PHost
             
             def on_signal_received(data):
                 # Обработка сигналов в основном потоке Kivy
-                from kivy.clock import Clock
                 Clock.schedule_once(lambda dt: self.handle_signal(data), 0)
                 
             def on_host_found(host_id):
                 # Для хоста это не используется
                 pass
                 
-            self.signaling_client = SignalingClient(on_signal=on_signal_received)
-            self.signaling_client.is_host = True
+            # Повторная попытка использует прежний SignalingClient: тот же client_id
+            # и токен возобновления возвращают хосту его комнату, а соединения
+            # с игроками в сетевом рантайме остаются
+            if self.signaling_client is None:
+                self.signaling_client = SignalingClient(on_signal=on_signal_received)
+                self.signaling_client.is_host = True
+                self.signaling_client.resumed_callback = \
+                    lambda data: Clock.schedule_once(lambda dt: self.on_session_resumed(data), 0)
+                # Публикуем комнату в каталоге сервера
+                self.signaling_client.listing = {
+                    'game': self._game_name(),
+                    'mode': self.game_params['mode'],
+                    'deck_size': self.game_params['deck_size'],
+                    'max_players': self.game_params['players_count'],
+                    'public': True
+                }
             
-            # Создаем P2P хост
-            self.p2p_host = P2PHost(on_client_message_callback=self.handle_client_message)
+            # P2P соединения с клиентами живут в потоке сетевого рантайма
+            self._start_network('host')
             
             self.signaling_client.connect()
             
-            # Присоединяемся к комнате
-            time.sleep(1) # Небольшая задержка для установления соединения
+            # Присоединяемся к комнате: join уйдет сразу после подключения сокета
             self.signaling_client.join_room(
                 self.game_params['room_name'], 
                 self.game_params['password']
             )
+            self.signaling_client.wait_connected()
+            self.signaling_client.wait_joined()
             
             # Обновляем UI в основном потоке
-            from kivy.clock import Clock
             Clock.schedule_once(lambda dt: self.on_host_connected(), 0)
             
+        except JoinError as e:
+            message = str(e)
+            Clock.schedule_once(lambda dt: self.on_join_error(message), 0)
         except Exception as e:
             print(f"Ошибка подключения хоста: {e}")
-            from kivy.clock import Clock
-            Clock.schedule_once(lambda dt: self.on_connection_error(str(e)), 0)
+            message = str(e) or type(e).__name__
+            Clock.schedule_once(lambda dt: self.on_connection_error(message), 0)
+            
+    def _create_client_signaling(self):
+        """Создание и подключение SignalingClient в роли клиента"""
+        from core.network.signaling_client import SignalingClient
+        from kivy.clock import Clock
+        
+        def on_signal_received(data):
+            Clock.schedule_once(lambda dt: self.handle_signal(data), 0)
+            
+        def on_host_found(host_id):
+            Clock.schedule_once(lambda dt: self.on_host_found(host_id), 0)
+            
+        self.signaling_client = SignalingClient(on_signal=on_signal_received)
+        self.signaling_client.is_host = False
+        self.signaling_client.found_host_callback = on_host_found
+        self.signaling_client.rooms_callback = \
+            lambda data: Clock.schedule_once(lambda dt: self.on_rooms_page(data), 0)
+        self.signaling_client.rooms_diff_callback = \
+            lambda diff: Clock.schedule_once(lambda dt: self.on_rooms_diff(diff), 0)
+        self.signaling_client.resumed_callback = \
+            lambda data: Clock.schedule_once(lambda dt: self.on_session_resumed(data), 0)
+        
+        self.signaling_client.connect()
             
     def _connect_as_client(self):
         """Подключение в роли клиента"""
+        from core.network.signaling_client import JoinError
+        from kivy.clock import Clock
         try:
-            from core.network.signaling_client import SignalingClient
+            # Клиент мог уже подключиться к серверу для просмотра списка комнат
+            if self.signaling_client is None:
+                self._create_client_signaling()
+            else:
+                self.signaling_client.connect() # повторная попытка после ошибки подключения
             
-            def on_signal_received(data):
-                from kivy.clock import Clock
-                Clock.schedule_once(lambda dt: self.handle_signal(data), 0)
-                
-            def on_host_found(host_id):
-                from kivy.clock import Clock
-                Clock.schedule_once(lambda dt: self.on_host_found(host_id), 0)
-                
-            self.signaling_client = SignalingClient(on_signal=on_signal_received)
-            self.signaling_client.is_host = False
-            self.signaling_client.found_host_callback = on_host_found
-            
-            self.signaling_client.connect()
-            
-            # Присоединяемся к комнате
-            time.sleep(1) # Небольшая задержка
+            # Присоединяемся к комнате: join уйдет сразу после подключения сокета
             room_name = self.get_app().game_manager.room_name
             room_password = self.get_app().game_manager.room_password
             self.signaling_client.join_room(room_name, room_password)
+            self.signaling_client.wait_connected()
+            self.signaling_client.wait_joined()
+            
+            # Соединение с хостом запускает found_host_callback; здесь - только таймаут
+            try:
+                self.signaling_client.wait_host()
+            except TimeoutError:
+                Clock.schedule_once(lambda dt: setattr(self.status_label, 'text', "Ожидание хоста комнаты..."), 0)
             
+        except JoinError as e:
+            message = str(e)
+            Clock.schedule_once(lambda dt: self.on_join_error(message), 0)
         except Exception as e:
             print(f"Ошибка подключения клиента: {e}")
-            from kivy.clock import Clock
-            Clock.schedule_once(lambda dt: self.on_connection_error(str(e)), 0)
+            message = str(e) or type(e).__name__
+            Clock.schedule_once(lambda dt: self.on_connection_error(message), 0)
+            
+    def _start_network(self, role):
+        """Запуск сетевого рантайма P2P (можно вызывать из любого потока)"""
+        from kivy.clock import Clock
+        
+        if self.network is not None:
+            if self.network.role == role and self.network.running:
+                return
+            self.network.stop()
+        self.network = NetworkRuntime(
+            role, wakeup=lambda: Clock.schedule_once(self._process_network_events, 0)
+        )
+        self.synced_game = None
+        self.network.start()
+        if role == 'host':
+            # Соединения для ожидаемых игроков готовятся заранее
+            self.network.submit(SetOfferPool(self.game_params.get('players_count', 2) - 1))
+        
+    def _stop_network(self):
+        """Остановка рантайма в фоне, чтобы не ждать закрытия соединений в потоке UI"""
+        if self.network is not None:
+            threading.Thread(target=self.network.stop, daemon=True).start()
+            self.network = None
+            self.synced_game = None
+            
+    def _process_network_events(self, dt=None):
+        """События сетевого рантайма (в потоке Kivy)"""
+        if self.network is None:
+            return
+        for event in self.network.poll():
+            if isinstance(event, (OfferCreated, AnswerCreated)):
+                # Передаем offer/answer пиру через сигнальный сервер
+                description = event.offer if isinstance(event, OfferCreated) else event.answer
+                if self.signaling_client:
+                    self.signaling_client.send_signal(event.peer_id, description)
+            elif isinstance(event, IceCandidateGathered):
+                # Trickle ICE: кандидаты досылаются после offer/answer
+                if self.signaling_client:
+                    self.signaling_client.send_signal(event.peer_id, event.candidate)
+            elif isinstance(event, PeerConnected):
+                if self.is_host:
+                    self.direct_peers.add(event.peer_id)
+                    self.status_label.text = f"Игрок {event.peer_id[:6]} подключен напрямую"
+                    if len(self.direct_peers) >= self.game_params.get('players_count', 2) - 1:
+                        self._report_negotiation_stats()
+                else:
+                    self.host_connected = True
+                    self.status_label.text = "Соединение с хостом установлено"
+            elif isinstance(event, PeerDisconnected):
+                if self.is_host:
+                    self.direct_peers.discard(event.peer_id)
+                    self.status_label.text = f"Прямое соединение с игроком {event.peer_id[:6]} потеряно"
+                else:
+                    self.host_connected = False
+                    self.host_requested = False
+                    self.status_label.text = "Соединение с хостом потеряно"
+            elif isinstance(event, StateUpdated):
+                self.handle_game_state(event.seq, event.state)
+            elif isinstance(event, MessageReceived):
+                if self.is_host:
+                    self.handle_client_message(event.peer_id, event.message)
+                else:
+                    self.handle_host_message(event.message)
+            elif isinstance(event, CommandFailed):
+                if not self.is_host:
+                    self.host_requested = False
+                self.status_label.text = f"Ошибка P2P соединения: {event.error}"
+                
+    def _flush_join_requests(self, dt=None):
+        """Все join_request, пришедшие за кадр, согласуются параллельно"""
+        peer_ids, self.pending_joins = tuple(self.pending_joins), []
+        if peer_ids and self.network:
+            self.network.submit(CreateOffers(peer_ids))
+            
+    def _report_negotiation_stats(self):
+        """Время до стола: все ожидаемые игроки подключены напрямую"""
+        def report(future):
+            if future.exception() is None:
+                stats = future.result()
+                logger.info(f"Time to table: {stats['time_to_table_ms']} ms, "
+                            f"phase max: {stats['phase_max_ms']}")
+                
+        self.network.submit(GetNegotiationStats()).add_done_callback(report)
+        
+    def on_host_found(self, host_id):
+        """Хост комнаты известен - запрашиваем у него P2P соединение"""
+        if self.is_host or not self.signaling_client:
+            return
+        if host_id == self.host_id and (self.host_connected or self.host_requested):
+            # Хост уже известен (из joined и затем host_available, или хост возобновил
+            # сессию сигналинга) - прямое соединение с ним живо или согласуется
+            return
+        self.host_id = host_id
+        self.host_requested = True
+        self._start_network('client')
+        self.status_label.text = "Хост найден. Установка соединения..."
+        self.signaling_client.send_signal(host_id, {'type': 'join_request'})
+        
+    def on_session_resumed(self, data):
+        """Сокет сигналинга переподключился и вернул место в комнате по токену"""
+        self.status_label.text = "Соединение с сервером восстановлено"
+        host_id = data.get('host_id')
+        # Хост известен из ответа resume - не ждем host_available
+        if not self.is_host and host_id:
+            self.on_host_found(host_id)
             
     def on_host_connected(self):
         """Вызывается при успешном подключении хоста"""
@@ -403,17 +801,27 @@ class LobbyScreen(Screen):
         """Вызывается при ошибке подключения"""
         self.status_label.text = f"Ошибка подключения: {error_message}"
         
+        self._enable_entry_button()
         if self.is_host:
-            self.create_room_btn.disabled = False
             # Планируем повторную попытку через 2 секунды
             from kivy.clock import Clock
             Clock.schedule_once(self._retry_host_connection, 2)
         else:
-            self.connect_btn.disabled = False
             # Планируем повторную попытку через 2 секунды
             from kivy.clock import Clock
             Clock.schedule_once(self._retry_client_connection, 2)
             
+    def on_join_error(self, error_message):
+        """Сервер отклонил join - повтор не поможет (имя занято, неверный пароль)"""
+        self.status_label.text = f"Ошибка: {error_message}"
+        self._enable_entry_button()
+        
+    def _enable_entry_button(self):
+        """Снова разрешить вход в комнату кнопкой того UI, который построен"""
+        for button in (self.create_room_btn, self.connect_btn):
+            if button is not None:
+                button.disabled = False
+            
     def _retry_host_connection(self, dt):
         """Повторная попытка подключения для хоста"""
         self.status_label.text = "Повторная попытка подключения..."
@@ -466,6 +874,23 @@ class LobbyScreen(Screen):
                 if current_players < 2:
                     self.start_game_btn.disabled = True
                     
+        elif signal_type == 'join_request' and self.is_host and self.network:
+            # Клиент просит соединение - offer уйдет ему событием OfferCreated
+            if not self.pending_joins:
+                from kivy.clock import Clock
+                Clock.schedule_once(self._flush_join_requests, 0)
+            if data.get('sender') not in self.pending_joins:
+                self.pending_joins.append(data.get('sender'))
+            
+        elif signal_type == 'offer' and not self.is_host and self.network:
+            self.network.submit(AcceptOffer(data.get('sender'), signal_data))
+            
+        elif signal_type == 'answer' and self.is_host and self.network:
+            self.network.submit(AcceptAnswer(data.get('sender'), signal_data))
+            
+        elif signal_type == 'ice_candidate' and self.network:
+            self.network.submit(AddIceCandidate(data.get('sender'), signal_data))
+            
         elif signal_type == 'game_start':
             # Переход к игровому экрану
             game_name = self.get_app().game_manager.current_game.lower()
@@ -488,6 +913,30 @@ class LobbyScreen(Screen):
         # TODO: Реализовать обработку сообщений от клиентов
         print(f"Получено сообщение от клиента {client_id}: {message_data}")
         
+    def handle_host_message(self, message_data):
+        """Обработка сообщений от хоста (только для клиента)"""
+        print(f"Получено сообщение от хоста {self.host_id}: {message_data}")
+        
+    def handle_game_state(self, seq, state):
+        """Новая версия состояния игры от хоста (только для клиента) - игровому экрану"""
+        if self.get_app().sm.has_screen('game'):
+            self.get_app().sm.get_screen('game').handle_network_message(dict(state, type='game_state', seq=seq))
+            
+    def publish_game_state(self):
+        """
+        Рассылка хода клиентам (только для хоста): фиксация в потоке Kivy,
+        рассылка дельты - в сетевом рантайме. Вызывать после каждого хода.
+        """
+        game = self.get_app().game_manager.game_logic
+        if not self.is_host or self.network is None or game is None:
+            return
+        if game is not self.synced_game:
+            self.synced_game = game
+            self.network.submit(AttachGame(game))
+        delta = game.commit_state()
+        if delta is not None:
+            self.network.submit(PublishState(delta))
+        
     def add_player_to_list(self, player_name):
         """Добавление игрока в список"""
         if player_name not in self.connected_players:
@@ -532,6 +981,10 @@ class LobbyScreen(Screen):
             # Отправляем через сигнальный сервер
             # В реальной реализации нужно отправить всем игрокам
             self.signaling_client.send_signal('all', signal_data)
+            # Игра началась - убираем комнату из списка открытых
+            self.signaling_client.update_listing(open=False)
+        # Подключенные клиенты получат снимок стартового состояния
+        self.publish_game_state()
             
     def leave_lobby(self, instance):
         """Выход из лобби"""
@@ -542,6 +995,13 @@ class LobbyScreen(Screen):
                     self.signaling_client.sio.disconnect()
             except:
                 pass
+            self.signaling_client = None
+        self._stop_network()
+        self.host_id = None
+        self.host_connected = False
+        self.host_requested = False
+        self.pending_joins = []
+        self.direct_peers.clear()
                 
         # Очищаем данные менеджера игры
         if self.get_app().game_manager:
@@ -1,5 +1,8 @@
 # app/games/base/base_game.py
 from abc import ABC, abstractmethod
+import copy
+
+from games.base.state_delta import diff_state
 
 class BaseGame(ABC):
     """Базовый класс для всех игр"""
@@ -14,6 +17,10 @@ class BaseGame(ABC):
         self.players = []
         self.game_state = {}
         self.is_started = False
+        self.state_seq = 0              # версия последнего зафиксированного состояния
+        # (state_seq, копия get_game_state() этой версии) - одним значением, чтобы
+        # снимок из потока сети не смешал версию и состояние соседних ходов
+        self._committed = (0, {})
         
     @classmethod
     def get_game_info(cls):
@@ -44,6 +51,24 @@ class BaseGame(ABC):
         """Проверка, закончилась ли игра"""
         pass
         
+    def commit_state(self):
+        """
+        Фиксация изменений состояния после хода: новая версия и дельта от предыдущей.
+        :return: сообщение {'type': 'game_delta', 'seq', 'ops'} или None, если ничего не изменилось
+        """
+        state = copy.deepcopy(self.get_game_state())
+        ops = diff_state(self._committed[1], state)
+        if not ops:
+            return None
+        self.state_seq += 1
+        self._committed = (self.state_seq, state)
+        return {'type': 'game_delta', 'seq': self.state_seq, 'ops': ops}
+        
+    def get_state_snapshot(self):
+        """Полный снимок зафиксированного состояния (для новых и отставших клиентов)"""
+        seq, state = self._committed
+        return dict(state, type='game_state', seq=seq)
+        
     def add_player(self, player_id):
         """Добавление игрока"""
         if player_id not in self.players:
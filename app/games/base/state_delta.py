@@ -0,0 +1,55 @@
+# app/games/base/state_delta.py
+# Дельты состояния игры: разница между двумя версиями get_game_state()
+# в виде списка операций над полями верхнего уровня.
+#
+# Операции ([op, поле, значение]):
+#   set    - поле заменяется значением;
+#   merge  - в словарь добавляются/обновляются ключи значения (счетчики карт);
+#   append - список дополняется элементами значения (карты на стол);
+#   del    - поле удаляется (значение None).
+# Значения - обычные JSON-совместимые структуры, операции применяются по порядку.
+
+SET = 'set'
+MERGE = 'merge'
+APPEND = 'append'
+DELETE = 'del'
+
+_MISSING = object()
+
+
+def diff_state(old, new):
+    """Операции, превращающие old в new"""
+    ops = []
+    for field, value in new.items():
+        previous = old.get(field, _MISSING)
+        if previous == value:
+            continue
+        if isinstance(previous, dict) and isinstance(value, dict) and previous.keys() <= value.keys():
+            ops.append([MERGE, field, {key: item for key, item in value.items()
+                                       if previous.get(key, _MISSING) != item}])
+        elif (isinstance(previous, list) and isinstance(value, list)
+              and len(value) > len(previous) and value[:len(previous)] == previous):
+            ops.append([APPEND, field, value[len(previous):]])
+        else:
+            ops.append([SET, field, value])
+    for field in old:
+        if field not in new:
+            ops.append([DELETE, field, None])
+    return ops
+
+
+def apply_delta(state, ops):
+    """Новое состояние: state с примененными операциями (state не изменяется)"""
+    state = dict(state)
+    for op, field, value in ops:
+        if op == SET:
+            state[field] = value
+        elif op == MERGE:
+            state[field] = {**state.get(field, {}), **value}
+        elif op == APPEND:
+            state[field] = state.get(field, []) + value
+        elif op == DELETE:
+            state.pop(field, None)
+        else:
+            raise ValueError(f"Unknown state delta op: {op}")
+    return state
@@ -0,0 +1,92 @@
+# benchmarks/bench_broadcast.py
+# Стоимость рассылки состояния игры всем клиентам P2PHost.broadcast_message:
+# сериализация на каждого получателя (как было) против одной сериализации
+# и общего буфера в очередях отправки. Каналы - заглушки без сети.
+#
+# Запуск: python benchmarks/bench_broadcast.py [--clients 5] [--iterations 2000]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from core.network.p2p_host import P2PHost
+from core.network.send_queue import SendQueue
+
+
+class NullChannel:
+    readyState = 'open'
+    bufferedAmount = 0
+    bufferedAmountLowThreshold = 0
+
+    def on(self, event, handler):
+        pass
+
+    def send(self, data):
+        pass
+
+
+def game_state(players):
+    """Состояние стола "Дурака" примерно того же размера, что в игре"""
+    suits = ('♠', '♥', '♦', '♣')
+    ranks = ('6', '7', '8', '9', '10', 'В', 'Д', 'К', 'Т')
+    deck = [f"{rank}{suit}" for suit in suits for rank in ranks]
+    return {
+        'type': 'game_state',
+        'trump': '♥',
+        'deck_left': 12,
+        'table': [{'attack': deck[n], 'defense': deck[n + 1]} for n in range(0, 8, 2)],
+        'players': [{'id': f"player-{n}", 'name': f"Игрок {n}", 'cards': 6} for n in range(players)],
+        'turn': 'player-0'
+    }
+
+
+def legacy_broadcast(channels, message_data):
+    # Прежняя реализация: json.dumps и отправка для каждого клиента
+    for channel in channels:
+        channel.send(json.dumps(message_data, ensure_ascii=False))
+
+
+async def run(args):
+    message = game_state(args.clients + 1)
+    host = P2PHost()
+    channels = [NullChannel() for _ in range(args.clients)]
+    for n, channel in enumerate(channels):
+        client_id = f"client-{n}"
+        host.send_queues[client_id] = SendQueue(channel)
+        host.client_ready[client_id] = True
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        legacy_broadcast(channels, message)
+    legacy = (time.perf_counter() - start) / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        host.broadcast_message(message)
+        await asyncio.sleep(0)  # сброс очередей
+    queued = (time.perf_counter() - start) / args.iterations
+
+    size = len(json.dumps(message, ensure_ascii=False).encode('utf-8'))
+    print(f"clients={args.clients} message={size} bytes")
+    print(f"per-client json.dumps: {legacy * 1e6:.1f} us/broadcast")
+    print(f"serialize once + send queues: {queued * 1e6:.1f} us/broadcast")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_channels.py
+# Задержка ходов при потоке вспомогательного трафика (перетаскивание карты):
+# все сообщения в одном надежном канале (как было) против эфемерного канала
+# без повторов для drag (channels.EPHEMERAL). Хост и клиент в одном процессе,
+# соединение через loopback.
+#
+# Запуск: python benchmarks/bench_channels.py [--seconds 3] [--drag-size 1024] [--drag-rate 10000]
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from core.network.channels import RELIABLE
+from core.network.p2p_client import P2PClient
+from core.network.p2p_host import P2PHost
+
+
+async def run_case(args, drag_channel):
+    """Задержки ходов хост -> клиент, мс; drag_channel=None - маршрут по типу"""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    latencies = []
+    drags = [0]
+    host = None
+
+    def on_message(_, message):
+        if message['type'] == 'move':
+            latencies.append((time.perf_counter() - message['sent']) * 1000)
+        else:
+            drags[0] += 1
+
+    client = P2PClient(on_host_message_callback=on_message,
+                       on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                           host.handle_ice_candidate_from_client('guest', candidate)))
+    host = P2PHost(on_client_ready_callback=lambda _: ready.done() or ready.set_result(None),
+                   on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                       client.handle_ice_candidate_from_host(candidate)))
+    answer = await client.handle_offer_from_host('host', await host.create_offer_for_client('guest'))
+    await host.handle_answer_from_client('guest', answer)
+    await asyncio.wait_for(ready, 10)
+    await asyncio.sleep(0.2)  # эфемерный канал открывается вслед за основным
+
+    drag = {'type': 'drag', 'card': {'value': 'Q', 'suit': '♠'}, 'path': 'x' * args.drag_size}
+    end = time.perf_counter() + args.seconds
+    next_move = 0.0
+    sent_drags = 0
+    while time.perf_counter() < end:
+        now = time.perf_counter()
+        if now >= next_move:
+            host.send_message_to_client('guest', {'type': 'move', 'sent': now})
+            next_move = now + 0.05
+        for _ in range(args.drag_rate // 100):
+            host.send_message_to_client('guest', drag, channel=drag_channel)
+            sent_drags += 1
+        await asyncio.sleep(0.01)
+    moves = int(args.seconds / 0.05)
+    for _ in range(100):
+        if len(latencies) >= moves:
+            break
+        await asyncio.sleep(0.05)
+    await host.close_all_connections()
+    await client.close()
+    return latencies, drags[0], sent_drags
+
+
+async def run(args):
+    for name, drag_channel in (('single reliable channel', RELIABLE), ('ephemeral drag channel', None)):
+        latencies, received, sent = await run_case(args, drag_channel)
+        latencies.sort()
+        print(f"{name}: moves {len(latencies)}, latency median {statistics.median(latencies):.1f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms, max {latencies[-1]:.1f} ms; "
+              f"drags delivered {received} of {sent}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--drag-size', type=int, default=1024, help='байт в сообщении drag')
+    parser.add_argument('--drag-rate', type=int, default=10000, help='сообщений drag в секунду')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_chunking.py
+# Большое сообщение (повтор партии / догрузка после переподключения) и ходы
+# в одном надежном канале: одно сообщение целиком (как было) против отправки
+# частями через очередь (framing, SendQueue) со срочными ходами между частями.
+# Плюс стоимость сборки: склейка частей против framing.Reassembler.
+#
+# Запуск: python benchmarks/bench_chunking.py [--size 2000000] [--seconds 2]
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from core.network.framing import CHUNK_HEADER, Reassembler, iter_chunks
+from core.network.game_codec import encode_message
+from core.network.p2p_client import P2PClient
+from core.network.p2p_host import P2PHost
+
+
+def replay(size):
+    """Повтор партии: список ходов JSON размером около size байт"""
+    move = {'type': 'move', 'action': 'attack', 'cards': [{'value': '10', 'suit': '♥'}], 'note': 'x' * 64}
+    count = size // len(encode_message(dict(move, type='replay_move')))
+    return {'type': 'replay', 'moves': [dict(move, n=n) for n in range(count)]}
+
+
+async def run_case(args, chunked):
+    """Задержки ходов (мс) и время доставки большого сообщения (мс)"""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    latencies = []
+    delivered = []
+    host = None
+
+    def on_message(_, message):
+        if message['type'] == 'move':
+            latencies.append((time.perf_counter() - message['sent']) * 1000)
+        else:
+            delivered.append(time.perf_counter())
+
+    client = P2PClient(on_host_message_callback=on_message,
+                       on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                           host.handle_ice_candidate_from_client('guest', candidate)))
+    host = P2PHost(on_client_ready_callback=lambda _: ready.done() or ready.set_result(None),
+                   on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                       client.handle_ice_candidate_from_host(candidate)))
+    answer = await client.handle_offer_from_host('host', await host.create_offer_for_client('guest'))
+    await host.handle_answer_from_client('guest', answer)
+    await asyncio.wait_for(ready, 10)
+    host.send_queues['guest'].max_bytes = 2 * args.size
+
+    big = replay(args.size)
+    start = time.perf_counter()
+    if chunked:
+        host.send_message_to_client('guest', big)
+    else:
+        host.data_channels['guest'].send(encode_message(big))
+    end = start + args.seconds
+    while time.perf_counter() < end:
+        host.send_message_to_client('guest', {'type': 'move', 'sent': time.perf_counter()})
+        await asyncio.sleep(0.01)
+    for _ in range(200):
+        if delivered and len(latencies) >= args.seconds / 0.01 * 0.9:
+            break
+        await asyncio.sleep(0.05)
+    await host.close_all_connections()
+    await client.close()
+    return latencies, (delivered[0] - start) * 1000 if delivered else float('nan')
+
+
+def reassembly_cost(size, rounds=20):
+    payload = os.urandom(size)
+    frames = list(iter_chunks(1, payload))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        message = b''
+        for frame in frames:
+            message += frame[CHUNK_HEADER.size:]
+    concat = (time.perf_counter() - start) / rounds
+    reassembler = Reassembler()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            message = reassembler.feed(frame)
+    assert message == payload
+    preallocated = (time.perf_counter() - start) / rounds
+    return len(frames), concat, preallocated
+
+
+async def run(args):
+    for name, chunked in (('single message', False), ('chunked + priority moves', True)):
+        latencies, delivery = await run_case(args, chunked)
+        latencies.sort()
+        print(f"{name}: big message delivered in {delivery:.0f} ms; moves {len(latencies)}, "
+              f"latency median {statistics.median(latencies):.1f} ms, max {latencies[-1]:.1f} ms")
+    frames, concat, preallocated = reassembly_cost(args.size)
+    print(f"reassembly of {frames} chunks: bytes += {concat * 1000:.2f} ms, "
+          f"preallocated bytearray {preallocated * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=2000000, help='байт в большом сообщении')
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_codec.py
+# Размер и стоимость кодирования одного согласования WebRTC (offer, answer,
+# N ICE-кандидатов с каждой стороны): JSON-конверт signal против msgpack-z1.
+#
+# Запуск: python benchmarks/bench_codec.py [--candidates 4] [--iterations 2000]
+import argparse
+import json
+import os
+import sys
+import time
+
+server_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server')
+if server_root not in sys.path:
+    sys.path.insert(0, server_root)
+
+import signal_codec
+
+# SDP offer data channel в формате aiortc
+SAMPLE_SDP = (
+    "v=0\r\n"
+    "o=- 3912345678 3912345678 IN IP4 0.0.0.0\r\n"
+    "s=-\r\n"
+    "t=0 0\r\n"
+    "a=group:BUNDLE 0\r\n"
+    "a=msid-semantic:WMS *\r\n"
+    "m=application 50123 DTLS/SCTP 5000\r\n"
+    "c=IN IP4 192.168.1.23\r\n"
+    "a=mid:0\r\n"
+    "a=sctpmap:5000 webrtc-datachannel 65535\r\n"
+    "a=max-message-size:65536\r\n"
+    "a=candidate:a1b2c3d4e5f60718293a4b5c6d7e8f90 1 udp 2130706431 192.168.1.23 50123 typ host\r\n"
+    "a=candidate:0f9e8d7c6b5a49382716f5e4d3c2b1a0 1 udp 1694498815 85.140.10.200 50123 typ srflx "
+    "raddr 192.168.1.23 rport 50123\r\n"
+    "a=end-of-candidates\r\n"
+    "a=ice-ufrag:Xq3B\r\n"
+    "a=ice-pwd:t9L2sK0pQwErTyUiOpAsDfGh\r\n"
+    "a=fingerprint:sha-256 6B:8B:5D:EA:59:04:20:23:29:C8:87:1C:CF:87:32:BE:"
+    "EB:30:75:5A:2B:2F:7A:7E:1C:DC:F1:A6:09:2E:28:4E\r\n"
+    "a=setup:actpass\r\n"
+)
+SAMPLE_CANDIDATE = {
+    'type': 'ice_candidate',
+    'candidate': 'candidate:a1b2c3d4e5f60718293a4b5c6d7e8f90 1 udp 2130706431 192.168.1.23 50123 typ host',
+    'sdpMid': '0',
+    'sdpMLineIndex': 0
+}
+HOST_ID = '3f1c9a2e-8b7d-4c55-a1e2-9d0f6b7c8a11'
+GUEST_ID = '7a2b3c4d-1e2f-4a5b-8c9d-0e1f2a3b4c5d'
+ROOM = 'friday-game'
+
+
+def negotiation(candidates):
+    """Сигналы одного согласования: (sender, target, type, data)"""
+    messages = [(HOST_ID, GUEST_ID, 'offer', {'type': 'offer', 'sdp': SAMPLE_SDP}),
+                (GUEST_ID, HOST_ID, 'answer', {'type': 'answer', 'sdp': SAMPLE_SDP.replace('actpass', 'active')})]
+    for _ in range(candidates):
+        messages.append((HOST_ID, GUEST_ID, 'ice_candidate', SAMPLE_CANDIDATE))
+        messages.append((GUEST_ID, HOST_ID, 'ice_candidate', SAMPLE_CANDIDATE))
+    return messages
+
+
+def encode_json(messages):
+    return [json.dumps({'sender': sender, 'target': target, 'room': ROOM, 'type': signal_type, 'data': data})
+            for sender, target, signal_type, data in messages]
+
+
+def encode_binary(messages):
+    return [signal_codec.encode_signal(sender, target, ROOM, signal_type, data)
+            for sender, target, signal_type, data in messages]
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--candidates', type=int, default=4, help='ICE-кандидатов с каждой стороны')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    if not signal_codec.available():
+        sys.exit("msgpack is not installed")
+
+    messages = negotiation(args.candidates)
+    json_payloads = encode_json(messages)
+    binary_payloads = encode_binary(messages)
+    json_bytes = sum(len(payload.encode('utf-8')) for payload in json_payloads)
+    binary_bytes = sum(len(payload) for payload in binary_payloads)
+
+    print(f"messages per negotiation: {len(messages)}")
+    print(f"json:       {json_bytes} bytes, encode {timed(lambda: encode_json(messages), args.iterations) * 1e6:.1f} us")
+    print(f"msgpack-z1: {binary_bytes} bytes ({binary_bytes / json_bytes:.0%}), "
+          f"encode {timed(lambda: encode_binary(messages), args.iterations) * 1e6:.1f} us, "
+          f"decode {timed(lambda: [signal_codec.decode_signal(p) for p in binary_payloads], args.iterations) * 1e6:.1f} us, "
+          f"server routing {timed(lambda: [signal_codec.decode_envelope(p) for p in binary_payloads], args.iterations) * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
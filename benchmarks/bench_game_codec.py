@@ -0,0 +1,65 @@
+# benchmarks/bench_game_codec.py
+# Размер и стоимость кодирования игровых сообщений data channel:
+# JSON (как было) против бинарного формата game_codec.
+#
+# Запуск: python benchmarks/bench_game_codec.py [--players 6] [--iterations 20000]
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from core.network import game_codec
+from games.fool.game import Game
+
+
+def sample_messages(players_count):
+    """Типичные сообщения партии "Дурака" с players_count игроками"""
+    game = Game()
+    players = [str(uuid.uuid4()) for _ in range(players_count)]
+    started = game.start_game(players)
+    attacker, defender = players[0], players[1]
+    state = dict(game.get_game_state(), type='game_state', seq=1042)
+    state['table'] = [{'attack': game.hands[attacker][0], 'defense': game.hands[defender][0]},
+                      {'attack': game.hands[attacker][1], 'defense': None}]
+    return {
+        'game_started': started,
+        'game_state': state,
+        'move': {'type': 'move', 'seq': 1043, 'action': 'attack', 'cards': game.hands[attacker][2:4]},
+        'move_processed': {'type': 'move_processed', 'seq': 1043, 'player': attacker,
+                           'data': {'action': 'attack', 'cards': game.hands[attacker][2:4]}},
+    }
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'message':<16}{'json B':>8}{'bin B':>8}{'json enc':>10}{'bin enc':>9}{'json dec':>10}{'bin dec':>9}  (us)")
+    for name, message in sample_messages(args.players).items():
+        as_json = json.dumps(message, ensure_ascii=False).encode('utf-8')
+        as_binary = game_codec.encode_message(message, game_codec.BINARY)
+        assert game_codec.decode_message(as_binary) == message
+        print(f"{name:<16}{len(as_json):>8}{len(as_binary):>8}"
+              f"{timed(lambda: json.dumps(message, ensure_ascii=False).encode('utf-8'), args.iterations):>10.1f}"
+              f"{timed(lambda: game_codec.encode_message(message, game_codec.BINARY), args.iterations):>9.1f}"
+              f"{timed(lambda: json.loads(as_json), args.iterations):>10.1f}"
+              f"{timed(lambda: game_codec.decode_message(as_binary), args.iterations):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
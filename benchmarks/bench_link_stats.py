@@ -0,0 +1,78 @@
+# benchmarks/bench_link_stats.py
+# Обнаружение "мертвого" клиента: данные клиента перестают доходить до хоста
+# (DTLS-пакеты отбрасываются), а ICE продолжает отвечать - как при зависшем
+# приложении или обрыве за NAT с живой привязкой. Без пингов хост ждет
+# connectionstatechange aiortc, с пингами (link_stats) - DEAD_PEER_TIMEOUT.
+# Перед обрывом выводится P2PHost.get_link_stats() живого соединения.
+#
+# Запуск: python benchmarks/bench_link_stats.py [--interval 1.0] [--wait 30]
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from core.network.p2p_client import P2PClient
+from core.network.p2p_host import P2PHost
+
+
+async def run_case(interval, wait):
+    """Время от обрыва до отключения клиента хостом, с (None - не обнаружен за wait)"""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    gone = loop.create_future()
+    host = None
+    client = P2PClient(heartbeat_interval=interval,
+                       on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                           host.handle_ice_candidate_from_client('guest', candidate)))
+    host = P2PHost(heartbeat_interval=interval,
+                   on_client_ready_callback=lambda _: ready.done() or ready.set_result(None),
+                   on_client_disconnect_callback=lambda _: gone.done() or gone.set_result(time.monotonic()),
+                   on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                       client.handle_ice_candidate_from_host(candidate)))
+    answer = await client.handle_offer_from_host('host', await host.create_offer_for_client('guest'))
+    await host.handle_answer_from_client('guest', answer)
+    await asyncio.wait_for(ready, 10)
+    for n in range(20):
+        host.send_message_to_client('guest', {'type': 'move', 'n': n})
+        await asyncio.sleep(0.2)
+    stats = host.get_link_stats('guest')
+
+    # Обрыв: все исходящие данные клиента теряются, ICE-проверки проходят
+    client.connection.sctp.transport._send_data = lambda data: asyncio.sleep(0)
+    cut = time.monotonic()
+    try:
+        detected = await asyncio.wait_for(gone, wait) - cut
+    except asyncio.TimeoutError:
+        detected = None
+    await host.close_all_connections()
+    await client.close()
+    return stats, detected
+
+
+async def run(args):
+    for name, interval in (('no heartbeat', None), ('ping/pong heartbeat', args.interval)):
+        stats, detected = await run_case(interval, args.wait)
+        if interval:
+            print(f"live link: rtt {stats['rtt_ms']:.2f} ms, jitter {stats['jitter_ms']:.2f} ms, "
+                  f"loss {stats['loss']:.0%}, out {stats['bytes_out']} B / {stats['messages_out']} msgs")
+        result = f"{detected:.1f} s" if detected is not None else f"not detected in {args.wait:.0f} s"
+        print(f"{name}: dead client {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--interval', type=float, default=1.0, help='период пингов, с')
+    parser.add_argument('--wait', type=float, default=30.0, help='сколько ждать обнаружения, с')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
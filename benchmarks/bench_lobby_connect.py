@@ -0,0 +1,80 @@
+# benchmarks/bench_lobby_connect.py
+# Путь лобби от нажатия "Создать комнату"/"Подключиться" до ответа сервера
+# через настоящий SignalingClient и локальный сигнальный сервер (asgi):
+#   sleep    - как было: connect(), time.sleep(1), join_room()
+#   futures  - join_room() сразу, ожидание wait_connected/wait_joined/wait_host
+# Хост: до joined; клиент: до известного хоста (host_id в joined).
+#
+# Запуск: python benchmarks/bench_lobby_connect.py [--rounds 10] [--port 10931]
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from bench_modes import start_server, wait_for_server
+from core.network import signaling_client
+from core.network.signaling_client import SignalingClient
+
+
+def enter(room, is_host, use_sleep):
+    """Время до joined (хост) или до известного хоста (клиент), мс; клиент для закрытия"""
+    client = SignalingClient(on_signal=lambda data: None)
+    client.is_host = is_host
+    client.found_host_callback = lambda host_id: None
+    start = time.perf_counter()
+    client.connect()
+    if use_sleep:
+        time.sleep(1)
+    client.join_room(room)
+    client.wait_connected()
+    client.wait_joined()
+    if not is_host:
+        client.wait_host()
+    return (time.perf_counter() - start) * 1000, client
+
+
+def run_case(rounds, use_sleep):
+    host_times, guest_times = [], []
+    for _ in range(rounds):
+        room = f"bench-{uuid.uuid4().hex[:8]}"
+        host_time, host = enter(room, True, use_sleep)
+        guest_time, guest = enter(room, False, use_sleep)
+        host_times.append(host_time)
+        guest_times.append(guest_time)
+        guest.sio.disconnect()
+        host.sio.disconnect()
+    return host_times, guest_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--port', type=int, default=10931)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger(signaling_client.__name__).setLevel(logging.ERROR)
+
+    signaling_client.SERVER_URL = f"http://127.0.0.1:{args.port}"
+    server = start_server('asgi', args.port)
+    try:
+        asyncio.run(wait_for_server(signaling_client.SERVER_URL))
+        for name, use_sleep in (('sleep(1)', True), ('futures', False)):
+            host_times, guest_times = run_case(args.rounds, use_sleep)
+            print(f"{name}: host joined median {statistics.median(host_times):.0f} ms, "
+                  f"guest found host median {statistics.median(guest_times):.0f} ms, "
+                  f"max {max(host_times + guest_times):.0f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
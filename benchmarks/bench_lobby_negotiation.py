@@ -0,0 +1,103 @@
+# benchmarks/bench_lobby_negotiation.py
+# Время до стола для полного лобби: хост согласует соединения с N клиентами,
+# пришедшими одновременно, - по очереди или параллельно
+# (P2PHost.create_offers_for_clients), с trickle ICE и без него.
+# Выводит сводку P2PHost.get_negotiation_stats() по фазам.
+#
+# Запуск: python benchmarks/bench_lobby_negotiation.py [--clients 5] [--stun-delay 0.3] [--latency 0.05]
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from aiortc import RTCConfiguration, RTCIceServer
+
+from bench_trickle_ice import SlowStunServer
+from core.network.p2p_client import P2PClient
+from core.network.p2p_host import P2PHost
+
+
+async def lobby(clients, concurrent, trickle, configuration, latency):
+    """Подключение clients игроков; сводка get_negotiation_stats()"""
+    loop = asyncio.get_running_loop()
+    guests = {}
+    ready = {f"guest-{n}": loop.create_future() for n in range(clients)}
+
+    def deliver(handler, *args):
+        loop.call_later(latency, lambda: asyncio.ensure_future(handler(*args)))
+
+    def on_ready(client_id):
+        if not ready[client_id].done():
+            ready[client_id].set_result(None)
+
+    host = P2PHost(
+        on_client_ready_callback=on_ready,
+        on_ice_candidate_callback=lambda client_id, candidate: deliver(
+            guests[client_id].handle_ice_candidate_from_host, candidate),
+        configuration=configuration, trickle_ice=trickle
+    )
+
+    def make_guest(client_id):
+        async def on_offer(offer):
+            answer = await guests[client_id].handle_offer_from_host('host', offer)
+            deliver(host.handle_answer_from_client, client_id, answer)
+
+        guests[client_id] = P2PClient(
+            on_ice_candidate_callback=lambda _, candidate: deliver(
+                host.handle_ice_candidate_from_client, client_id, candidate),
+            configuration=configuration, trickle_ice=trickle
+        )
+        return on_offer
+
+    handlers = {client_id: make_guest(client_id) for client_id in ready}
+    if concurrent:
+        for client_id, offer in (await host.create_offers_for_clients(list(ready))).items():
+            deliver(handlers[client_id], offer)
+    else:
+        for client_id in ready:
+            deliver(handlers[client_id], await host.create_offer_for_client(client_id))
+    try:
+        await asyncio.wait_for(asyncio.gather(*ready.values()), 60)
+        return host.get_negotiation_stats()
+    finally:
+        await host.close_all_connections()
+        for guest in guests.values():
+            await guest.close()
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: SlowStunServer(args.stun_delay),
+                                                       local_addr=('127.0.0.1', 0))
+    port = transport.get_extra_info('sockname')[1]
+    configuration = RTCConfiguration(iceServers=[RTCIceServer(f"stun:127.0.0.1:{port}")])
+    try:
+        for trickle in (False, True):
+            for concurrent in (False, True):
+                stats = await lobby(args.clients, concurrent, trickle, configuration, args.latency)
+                name = f"{'trickle ICE' if trickle else 'full gathering'}, {'concurrent' if concurrent else 'sequential'}"
+                phases = ', '.join(f"{phase} {value:.0f}" for phase, value in stats['phase_max_ms'].items())
+                print(f"{name}: time to table {stats['time_to_table_ms']:.0f} ms (max ms: {phases})")
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=5, help='клиентов (6 мест = хост + 5)')
+    parser.add_argument('--stun-delay', type=float, default=0.3, help='задержка ответа STUN, с')
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка сигнального сервера, с')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(f"clients {args.clients}, stun delay {args.stun_delay * 1000:.0f} ms, "
+          f"signaling latency {args.latency * 1000:.0f} ms")
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_matchmaking.py
+# Микро-бенчмарк очереди подбора: тысячи игроков в разных корзинах
+# (игра, режим, колода, мест), стоимость постановки/сборки матча и
+# время ожидания в очереди при заданном темпе прихода игроков.
+#
+# Запуск: python benchmarks/bench_matchmaking.py [--players 100000] [--rate 200]
+import argparse
+import os
+import random
+import sys
+import time
+
+server_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server')
+if server_root not in sys.path:
+    sys.path.insert(0, server_root)
+
+from matchmaking import Matchmaker
+
+MODES = ('подкидной', 'переводной')
+DECKS = (36, 52)
+SEATS = (2, 3, 4, 5, 6)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=100000)
+    parser.add_argument('--rate', type=float, default=200.0, help='игроков в секунду (симулированное время)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    clock = [0.0]
+    matchmaker = Matchmaker(clock=lambda: clock[0])
+    keys = [('fool', mode, deck, seats) for mode in MODES for deck in DECKS for seats in SEATS
+            if deck >= seats * 6]
+
+    waits = []
+    matches = 0
+    start = time.perf_counter()
+    for n in range(args.players):
+        clock[0] += rng.expovariate(args.rate)
+        match, _ = matchmaker.enqueue(f"sid-{n}", f"client-{n}", rng.choice(keys))
+        if match is not None:
+            matches += 1
+            waits.extend(clock[0] - ticket.enqueued_at for ticket in match.tickets)
+    elapsed = time.perf_counter() - start
+
+    print(f"players={args.players} buckets={len(keys)} matches={matches} still_queued={len(matchmaker)}")
+    print(f"enqueue+match: {elapsed / args.players * 1e6:.2f} us/player ({args.players / elapsed:,.0f} players/s)")
+    print(f"queue wait at {args.rate:g} players/s: p50={percentile(waits, 0.5):.2f}s "
+          f"p95={percentile(waits, 0.95):.2f}s p99={percentile(waits, 0.99):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_modes.py
+# Сравнение threading- и asyncio-режимов сигнального сервера.
+# Для каждого режима поднимается локальный сервер, открывается N простаивающих
+# сокетов, после чего пробные клиенты создают комнаты (join -> joined) и
+# измеряется задержка и пропускная способность при такой фоновой нагрузке.
+#
+# Запуск: python benchmarks/bench_modes.py --idle 10000 --probes 200
+# Нужны aiohttp и uvicorn (для asgi). Для 10k сокетов поднимите ulimit -n.
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import socketio
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+server_root = os.path.join(repo_root, 'server')
+node_root = os.path.join(repo_root, 'node_server')
+
+# {режим: (команда, рабочая папка)}; порт передается последним аргументом и в PORT
+SERVER_COMMANDS = {
+    'threading': ([
+        sys.executable, '-c',
+        "import sys; from signaling_server import app, socketio; "
+        "socketio.run(app, host='127.0.0.1', port=int(sys.argv[1]), allow_unsafe_werkzeug=True)"
+    ], server_root),
+    'asgi': ([
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1',
+        '--log-level', 'warning', '--port'
+    ], server_root),
+    'node': (['node', 'server.js'], node_root),
+}
+
+
+def start_server(mode, port):
+    command, cwd = SERVER_COMMANDS[mode]
+    env = dict(os.environ, PORT=str(port))
+    # Журнал комнат бенчмарка не должен попадать в рабочий rooms.sqlite3
+    env.setdefault('ROOM_JOURNAL_PATH', os.path.join(tempfile.gettempdir(), f"bench-rooms-{port}.sqlite3"))
+    return subprocess.Popen(command + [str(port)], cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_for_server(url, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        client = socketio.AsyncClient()
+        try:
+            await client.connect(url, transports=['websocket'])
+            await client.disconnect()
+            return
+        except socketio.exceptions.ConnectionError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def open_idle(url, count, batch=200):
+    clients = []
+    for start in range(0, count, batch):
+        group = [socketio.AsyncClient(reconnection=False) for _ in range(min(batch, count - start))]
+        results = await asyncio.gather(
+            *(client.connect(url, transports=['websocket']) for client in group),
+            return_exceptions=True
+        )
+        clients.extend(c for c, r in zip(group, results) if not isinstance(r, Exception))
+    return clients
+
+
+async def probe_join(url, room_name):
+    client = socketio.AsyncClient(reconnection=False)
+    joined = asyncio.get_running_loop().create_future()
+    client.on('joined', lambda data: joined.done() or joined.set_result(data))
+    await client.connect(url, transports=['websocket'])
+    start = time.perf_counter()
+    await client.emit('join', {'room': room_name, 'password': '', 'is_host': True})
+    await asyncio.wait_for(joined, 10)
+    elapsed = time.perf_counter() - start
+    await client.disconnect()
+    return elapsed
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run_mode(mode, port, idle_count, probes, concurrency):
+    url = f"http://127.0.0.1:{port}"
+    process = start_server(mode, port)
+    try:
+        await wait_for_server(url)
+        idle = await open_idle(url, idle_count)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(index):
+            async with semaphore:
+                return await probe_join(url, f"{mode}-probe-{index}")
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(limited(i) for i in range(probes)), return_exceptions=True)
+        wall = time.perf_counter() - start
+        latencies = [r for r in results if not isinstance(r, Exception)]
+        await asyncio.gather(*(client.disconnect() for client in idle), return_exceptions=True)
+        return {
+            'idle': len(idle),
+            'ok': len(latencies),
+            'failed': probes - len(latencies),
+            'throughput': len(latencies) / wall if wall else 0.0,
+            'p50': percentile(latencies, 50) if latencies else float('nan'),
+            'p99': percentile(latencies, 99) if latencies else float('nan'),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="threading vs asgi")
+    parser.add_argument('--modes', nargs='+', default=['threading', 'asgi'], choices=list(SERVER_COMMANDS))
+    parser.add_argument('--idle', type=int, default=1000, help='простаивающих сокетов')
+    parser.add_argument('--probes', type=int, default=200, help='пробных join')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--port', type=int, default=10100)
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'idle':>7} {'ok':>5} {'fail':>5} {'join/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for offset, mode in enumerate(args.modes):
+        stats = await run_mode(mode, args.port + offset, args.idle, args.probes, args.concurrency)
+        print(f"{mode:>10} {stats['idle']:>7} {stats['ok']:>5} {stats['failed']:>5} "
+              f"{stats['throughput']:>8.1f} {stats['p50'] * 1000:>8.2f} {stats['p99'] * 1000:>8.2f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
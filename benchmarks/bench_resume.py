@@ -0,0 +1,134 @@
+# benchmarks/bench_resume.py
+# Переподключение клиента после обрыва сокета сигналинга посреди партии.
+#   Как было: новый client_id, join, ожидание host_available, join_request
+#   и новое P2P-согласование, затем полный снимок игры.
+#   Возобновление: одно событие resume по токену (место и host_id в ответе),
+#   прямое соединение с хостом живо, хост досылает пропущенные дельты.
+# Сигнальный сервер - SignalingService в процессе, P2P - aiortc через loopback.
+#
+# Запуск: python benchmarks/bench_resume.py [--missed 1,3,10] [--rounds 2000]
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(root, 'app'), os.path.join(root, 'server')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('ROOM_JOURNAL_PATH', '')
+
+from bench_state_sync import play
+from core.network import game_codec
+from core.network.p2p_client import P2PClient
+from core.network.p2p_host import P2PHost
+from core.network.state_sync import HostStateSync, StateReplica
+from games.fool.game import Game
+from signaling_service import SignalingService
+
+
+def emitted(actions, event):
+    return [action[2] for action in actions if action[0] == 'emit' and action[1] == event]
+
+
+def signaling_cost(rounds):
+    """Время обработки сервером: join нового client_id против resume, мкс"""
+    service = SignalingService()
+    service.limiter.sid_limits.clear()
+    service.limiter.room_limits.clear()
+    service.join('host-sid', {'room': 'bench', 'is_host': True, 'client_id': 'host'})
+    service.host_available('host-sid', {'room': 'bench', 'host_id': 'host'})
+    token = emitted(service.join('sid-0', {'room': 'bench', 'client_id': 'guest'}), 'joined')[0]['resume_token']
+
+    start = time.perf_counter()
+    for n in range(rounds):
+        service.join(f"join-{n}", {'room': 'bench', 'client_id': str(uuid.uuid4())})
+    join = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for n in range(rounds):
+        reply = emitted(service.resume(f"resume-{n}", {'room': 'bench', 'client_id': 'guest', 'token': token}),
+                        'resumed')[0]
+    resume = (time.perf_counter() - start) / rounds
+    assert reply['status'] == 'success' and reply['host_id'] == 'host'
+    return join * 1e6, resume * 1e6
+
+
+async def negotiation_time():
+    """P2P-согласование до открытого data channel (loopback), мс"""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    host = None
+    client = P2PClient(on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+        host.handle_ice_candidate_from_client('guest', candidate)))
+    host = P2PHost(on_client_ready_callback=lambda _: ready.done() or ready.set_result(None),
+                   on_ice_candidate_callback=lambda _, candidate: asyncio.ensure_future(
+                       client.handle_ice_candidate_from_host(candidate)))
+    start = time.perf_counter()
+    answer = await client.handle_offer_from_host('host', await host.create_offer_for_client('guest'))
+    await host.handle_answer_from_client('guest', answer)
+    await asyncio.wait_for(ready, 10)
+    elapsed = (time.perf_counter() - start) * 1000
+    await host.close_all_connections()
+    await client.close()
+    return elapsed
+
+
+def catch_up_bytes(missed, players=4):
+    """Байт game_codec: пропущенные дельты, снимок и отправленное HostStateSync.catch_up"""
+    game = Game()
+    game.start_game([str(uuid.uuid4()) for _ in range(players)])
+    channel = []
+    online = [True]
+    sync = HostStateSync(game, send=lambda client_id, message: channel.append(message) or True,
+                         broadcast=lambda message: (online[0] and channel.append(message)) or {})
+    replica = StateReplica()
+    sync.client_ready('guest')
+    moves = play(game, 10000, random.Random(1))
+    for _ in range(50):
+        next(moves)
+        sync.publish()
+    for message in channel:
+        replica.apply(message)
+    channel.clear()
+
+    online[0] = False
+    for _ in range(missed):
+        next(moves)
+        sync.publish()
+    online[0] = True
+    sync.handle_message('guest', replica.resume_message())
+    sent_bytes = sum(len(game_codec.encode_message(message)) for message in channel)
+    for message in channel:
+        replica.apply(message)
+    assert dict(replica.state, type='game_state', seq=replica.seq) == game.get_state_snapshot()
+    delta_bytes = sum(len(game_codec.encode_message(delta)) for delta in list(sync.history)[-missed:])
+    snapshot_bytes = len(game_codec.encode_message(game.get_state_snapshot()))
+    return delta_bytes, snapshot_bytes, sent_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--missed', default='1,3,10', help='версий состояния, пропущенных за обрыв (через запятую)')
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger('signaling').setLevel(logging.ERROR)
+
+    join, resume = signaling_cost(args.rounds)
+    negotiation = asyncio.run(negotiation_time())
+    print(f"signaling: join {join:.1f} us + wait for host_available; resume {resume:.1f} us, host_id in reply")
+    print(f"P2P renegotiation: {negotiation:.0f} ms as before, skipped on resume while the data channel is alive")
+    for missed in (int(value) for value in args.missed.split(',')):
+        delta_bytes, snapshot_bytes, sent_bytes = catch_up_bytes(missed)
+        print(f"state after {missed} missed versions: snapshot {snapshot_bytes} B, "
+              f"deltas {delta_bytes} B, catch-up sent {sent_bytes} B")
+
+
+if __name__ == '__main__':
+    main()
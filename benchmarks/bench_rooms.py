@@ -0,0 +1,87 @@
+# benchmarks/bench_rooms.py
+# Микро-бенчмарк очистки комнат при отключении:
+# старый полный обход словаря rooms против RoomRegistry с обратным индексом.
+#
+# Запуск: python benchmarks/bench_rooms.py [--rooms 10000] [--clients 4]
+import argparse
+import os
+import sys
+import time
+
+server_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server')
+if server_root not in sys.path:
+    sys.path.insert(0, server_root)
+
+from room_registry import RoomRegistry
+
+
+def legacy_disconnect(rooms, sid):
+    """Копия прежнего handle_disconnect: обход всех комнат и list.remove"""
+    rooms_to_remove = []
+    for room_name, room_data in list(rooms.items()):
+        if sid in room_data.get('clients', []):
+            room_data['clients'].remove(sid)
+            if room_data.get('host_id') == sid:
+                rooms_to_remove.append(room_name)
+    for room_name in rooms_to_remove:
+        if room_name in rooms:
+            del rooms[room_name]
+
+
+def build_sids(rooms_count, clients_per_room):
+    return [
+        [f"sid-{room}-{n}" for n in range(clients_per_room)]
+        for room in range(rooms_count)
+    ]
+
+
+def bench_legacy(sids):
+    rooms = {}
+    for index, room_sids in enumerate(sids):
+        rooms[f"room-{index}"] = {
+            'host_id': room_sids[0],
+            'password': '',
+            'clients': list(room_sids)
+        }
+    start = time.perf_counter()
+    for room_sids in sids:
+        for sid in reversed(room_sids):
+            legacy_disconnect(rooms, sid)
+    return time.perf_counter() - start
+
+
+def bench_registry(sids):
+    rooms = RoomRegistry()
+    for index, room_sids in enumerate(sids):
+        room_name = f"room-{index}"
+        rooms.create_room(room_name, room_sids[0])
+        for sid in room_sids[1:]:
+            rooms.add_client(room_name, sid)
+    start = time.perf_counter()
+    for room_sids in sids:
+        for sid in reversed(room_sids):
+            rooms.remove_sid(sid)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=4, help='сокетов в комнате (включая хоста)')
+    args = parser.parse_args()
+
+    sids = build_sids(args.rooms, args.clients)
+    disconnects = args.rooms * args.clients
+
+    registry_time = bench_registry(sids)
+    legacy_time = bench_legacy(sids)
+
+    print(f"rooms={args.rooms} clients/room={args.clients} disconnects={disconnects}")
+    for name, elapsed in (('legacy', legacy_time), ('registry', registry_time)):
+        per_op = elapsed / disconnects * 1e6
+        print(f"{name:>9}: {elapsed:8.3f} s total, {per_op:10.2f} us/disconnect")
+    print(f"  speedup: {legacy_time / registry_time:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
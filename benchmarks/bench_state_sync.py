@@ -0,0 +1,85 @@
+# benchmarks/bench_state_sync.py
+# Синхронизация состояния "Дурака" на ходах: полный снимок game_state после
+# каждого хода (как было) против дельты game_delta (HostStateSync/StateReplica).
+# Ходы меняют игру напрямую: карта из руки атакующего на стол, отбой
+# защищающегося, бито и добор. Сообщения кодируются game_codec, как в канале.
+#
+# Запуск: python benchmarks/bench_state_sync.py [--players 6] [--moves 2000]
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from core.network import game_codec
+from core.network.state_sync import HostStateSync, StateReplica
+from games.fool.game import Game
+
+
+def play(game, moves, rng):
+    """Генератор ходов: после каждого yield игра изменена"""
+    for _ in range(moves):
+        attacker, defender = game.attacker, game.defender
+        if len(game.table) < 6 and game.hands[attacker] and game.hands[defender]:
+            game.table.append({'attack': game.hands[attacker].pop(), 'defense': None})
+            yield
+            game.table[-1] = dict(game.table[-1], defense=game.hands[defender].pop())
+            yield
+            continue
+        # Бито: стол в отбой, добор из новой колоды и переход хода
+        game.discard.extend(card for pair in game.table for card in pair.values() if card)
+        game.table = []
+        for player in game.players:
+            while len(game.hands[player]) < 6:
+                game.hands[player].append(rng.choice(game.create_deck()))
+        game.attacker, game.defender = defender, game.get_next_player(defender)
+        yield
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--moves', type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    game = Game()
+    game.start_game([str(uuid.uuid4()) for _ in range(args.players)])
+    channel = []
+    sync = HostStateSync(game, send=lambda client_id, message: channel.append(message) or True,
+                         broadcast=lambda message: channel.append(message) or {})
+    replica = StateReplica()
+    snapshot_replica = StateReplica()
+    sync.client_ready('client')
+
+    totals = {'snapshot': [0, 0.0], 'delta': [0, 0.0]}
+    for _ in play(game, args.moves, random.Random(1)):
+        sync.publish()
+        snapshot = game_codec.encode_message(game.get_state_snapshot())
+        start = time.perf_counter()
+        snapshot_replica.apply(game_codec.decode_message(snapshot))
+        totals['snapshot'][1] += time.perf_counter() - start
+        totals['snapshot'][0] += len(snapshot)
+        for message in channel:
+            payload = game_codec.encode_message(message)
+            start = time.perf_counter()
+            replica.apply(game_codec.decode_message(payload))
+            totals['delta'][1] += time.perf_counter() - start
+            totals['delta'][0] += len(payload)
+        channel.clear()
+        assert dict(replica.state, type='game_state', seq=replica.seq) == game.get_state_snapshot()
+
+    moves = game.state_seq
+    print(f"players={args.players} state versions={moves}")
+    for name, (size, seconds) in totals.items():
+        print(f"{name:<9}: {size / moves:6.1f} bytes/move, decode+apply {seconds / moves * 1e6:5.1f} us/move")
+
+
+if __name__ == '__main__':
+    main()
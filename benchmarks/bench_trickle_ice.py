@@ -0,0 +1,132 @@
+# benchmarks/bench_trickle_ice.py
+# Время до открытия data channel (хост и клиент) с trickle ICE и без него,
+# а также с пулом заранее подготовленных offer у хоста (offer_pool_size).
+#
+# P2PHost и P2PClient работают в одном цикле asyncio, сигнальный сервер
+# заменен задержкой доставки сообщения. Локальный STUN-сервер отвечает
+# с задержкой --stun-delay: сбор srflx-кандидатов в aiortc ждет ответа STUN,
+# поэтому без trickle ICE offer и answer задерживаются на время сбора
+# последовательно у каждой стороны, а с trickle ICE стороны собирают
+# кандидатов параллельно. С пулом offer хоста готов до прихода клиента,
+# и на пути подключения остается только сбор кандидатов клиента.
+#
+# Запуск: python benchmarks/bench_trickle_ice.py [--runs 5] [--stun-delay 0.3] [--latency 0.05]
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+app_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+if app_root not in sys.path:
+    sys.path.insert(0, app_root)
+
+from aioice import stun
+from aiortc import RTCConfiguration, RTCIceServer
+
+from core.network.p2p_client import P2PClient
+from core.network.p2p_host import P2PHost
+
+
+class SlowStunServer(asyncio.DatagramProtocol):
+    """STUN Binding с ответом через delay секунд"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            request = stun.parse_message(data)
+        except ValueError:
+            return
+        response = stun.Message(message_method=stun.Method.BINDING, message_class=stun.Class.RESPONSE,
+                                transaction_id=request.transaction_id)
+        response.attributes['XOR-MAPPED-ADDRESS'] = addr
+        asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, bytes(response), addr)
+
+
+async def negotiate(trickle, configuration, latency, pool=False):
+    """Одно согласование: (время до offer, время до открытия канала у обеих сторон)"""
+    loop = asyncio.get_running_loop()
+    host_ready = loop.create_future()
+    client_ready = loop.create_future()
+    host = client = None
+
+    def deliver(handler, *args):
+        # Доставка через сигнальный сервер: задержка, порядок сохраняется
+        loop.call_later(latency, lambda: asyncio.ensure_future(handler(*args)))
+
+    host = P2PHost(
+        on_client_ready_callback=lambda _: host_ready.done() or host_ready.set_result(time.perf_counter()),
+        on_ice_candidate_callback=lambda _, candidate: deliver(client.handle_ice_candidate_from_host, candidate),
+        configuration=configuration, trickle_ice=trickle
+    )
+
+    async def on_answer(answer):
+        await host.handle_answer_from_client('guest', answer)
+
+    async def on_offer(offer):
+        answer = await client.handle_offer_from_host('host', offer)
+        deliver(on_answer, answer)
+
+    client = P2PClient(
+        on_ready_callback=lambda _: client_ready.done() or client_ready.set_result(time.perf_counter()),
+        on_ice_candidate_callback=lambda _, candidate: deliver(host.handle_ice_candidate_from_client, 'guest', candidate),
+        configuration=configuration, trickle_ice=trickle
+    )
+
+    if pool:
+        host.set_offer_pool_size(1)
+        while not host.offer_pool:
+            await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    offer = await host.create_offer_for_client('guest')
+    offer_ready = time.perf_counter() - start
+    deliver(on_offer, offer)
+    try:
+        finished = await asyncio.wait_for(asyncio.gather(host_ready, client_ready), 30)
+    finally:
+        await host.close_all_connections()
+        await client.close()
+    return offer_ready, max(finished) - start
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: SlowStunServer(args.stun_delay),
+                                                       local_addr=('127.0.0.1', 0))
+    port = transport.get_extra_info('sockname')[1]
+    configuration = RTCConfiguration(iceServers=[RTCIceServer(f"stun:127.0.0.1:{port}")])
+    try:
+        for name, trickle, pool in (('full gathering', False, False), ('full gathering + offer pool', False, True),
+                                    ('trickle ICE', True, False), ('trickle ICE + offer pool', True, True)):
+            results = [await negotiate(trickle, configuration, args.latency, pool) for _ in range(args.runs)]
+            offers = [offer for offer, _ in results]
+            timings = [connected for _, connected in results]
+            print(f"{name}: offer {statistics.median(offers) * 1000:.1f} ms, "
+                  f"connected median {statistics.median(timings) * 1000:.0f} ms, "
+                  f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--stun-delay', type=float, default=0.3, help='задержка ответа STUN, с')
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка сигнального сервера, с')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(f"stun delay {args.stun_delay * 1000:.0f} ms, signaling latency {args.latency * 1000:.0f} ms, runs {args.runs}")
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# benchmarks/loadgen.py
+# Генератор нагрузки на сигнальный путь (протокол SignalingClient).
+# В каждой комнате один хост и M клиентов проходят полный цикл:
+#   join(хост) -> join(клиенты) -> host_available -> offer -> answer -> ICE
+# Серверы (Python threading/asgi или Node) поднимаются локально, поэтому
+# их можно сравнивать при одинаковой нагрузке.
+#
+# Метрики:
+#   join      - от emit('join') до события 'joined'
+#   signal    - от emit('signal') отправителем до получения адресатом
+#   rooms/core - сколько комнат в секунду проводит через полный цикл одно
+#                полностью занятое ядро сервера (комнаты / CPU-секунды сервера)
+#
+# Запуск:
+#   python benchmarks/loadgen.py --server asgi --ramp 50 100 200 --clients 3
+#   python benchmarks/loadgen.py --server node --ramp 100
+#   python benchmarks/loadgen.py --url http://127.0.0.1:10000 --ramp 100
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+import socketio
+
+from bench_modes import SERVER_COMMANDS, percentile, start_server, wait_for_server
+
+# Размеры, близкие к настоящим сообщениям aiortc
+FAKE_SDP = "v=0\r\n" + "a=fake-sdp-line-for-load-generation\r\n" * 60
+FAKE_CANDIDATE = "candidate:1 1 udp 2130706431 192.168.0.10 50000 typ host"
+
+
+class Peer:
+    """Один участник комнаты: AsyncClient + сбор замеров"""
+
+    def __init__(self, url, room, is_host, stats, target_by):
+        self.url = url
+        self.room = room
+        self.is_host = is_host
+        self.stats = stats
+        self.target_by = target_by
+        self.client_id = str(uuid.uuid4())
+        self.sio = socketio.AsyncClient(reconnection=False)
+        loop = asyncio.get_running_loop()
+        self.joined = loop.create_future()
+        self.host_found = loop.create_future()
+        self.done = loop.create_future()
+        self.pending_candidates = 0
+        self.sio.on('joined', self._on_joined)
+        self.sio.on('host_available', self._on_host_available)
+        self.sio.on('signal', self._on_signal)
+
+    @property
+    def address(self):
+        """ID, по которому к участнику адресуются сигналы"""
+        return self.sio.get_sid() if self.target_by == 'sid' else self.client_id
+
+    async def _on_joined(self, data):
+        if not self.joined.done():
+            self.joined.set_result(data)
+
+    async def _on_host_available(self, data):
+        if not self.is_host and not self.host_found.done():
+            self.host_found.set_result(data['host_id'])
+
+    async def connect(self):
+        await self.sio.connect(self.url, transports=['websocket'])
+
+    async def join(self):
+        payload = {'room': self.room, 'password': '', 'is_host': self.is_host, 'client_id': self.client_id}
+        start = time.perf_counter()
+        await self.sio.emit('join', payload)
+        result = await asyncio.wait_for(self.joined, self.stats.timeout)
+        self.stats.join.append(time.perf_counter() - start)
+        if result.get('status') != 'success':
+            raise RuntimeError(f"join failed: {result.get('message')}")
+
+    async def announce_host(self):
+        await self.sio.emit('host_available', {'host_id': self.address, 'room': self.room})
+
+    async def send_signal(self, target, signal_type, data):
+        data = dict(data, type=signal_type, sent_at=time.perf_counter())
+        await self.sio.emit('signal', {
+            'sender': self.address,
+            'target': target,
+            'room': self.room,
+            'type': signal_type,
+            'data': data
+        })
+
+    async def _on_signal(self, payload):
+        data = payload.get('data', {})
+        self.stats.signal.append(time.perf_counter() - data['sent_at'])
+        signal_type = payload.get('type')
+        sender = payload.get('sender')
+        if signal_type == 'join_request':
+            # Хост: offer + ICE-кандидаты
+            await self.send_signal(sender, 'offer', {'sdp': FAKE_SDP})
+            for _ in range(self.stats.candidates):
+                await self.send_signal(sender, 'ice_candidate', {'candidate': FAKE_CANDIDATE})
+        elif signal_type == 'offer':
+            await self.send_signal(sender, 'answer', {'sdp': FAKE_SDP})
+            for _ in range(self.stats.candidates):
+                await self.send_signal(sender, 'ice_candidate', {'candidate': FAKE_CANDIDATE})
+        elif signal_type == 'ice_candidate' and not self.is_host:
+            self.pending_candidates -= 1
+            if self.pending_candidates <= 0 and not self.done.done():
+                self.done.set_result(True)
+
+    async def close(self):
+        try:
+            await self.sio.disconnect()
+        except Exception:
+            pass
+
+
+class Stats:
+    def __init__(self, candidates, timeout):
+        self.candidates = candidates
+        self.timeout = timeout
+        self.join = []
+        self.signal = []
+        self.rooms_ok = 0
+        self.rooms_failed = 0
+
+
+async def run_room(url, index, clients, stats, target_by, tag):
+    room = f"load-{tag}-{index}"
+    host = Peer(url, room, True, stats, target_by)
+    guests = [Peer(url, room, False, stats, target_by) for _ in range(clients)]
+    peers = [host] + guests
+    try:
+        await host.connect()
+        await host.join()
+        await asyncio.gather(*(guest.connect() for guest in guests))
+        await asyncio.gather(*(guest.join() for guest in guests))
+        await host.announce_host()
+        host_ids = await asyncio.wait_for(
+            asyncio.gather(*(guest.host_found for guest in guests)), stats.timeout)
+        # Клиенты просят у хоста offer и ждут все его ICE-кандидаты
+        for guest, host_id in zip(guests, host_ids):
+            guest.pending_candidates = stats.candidates
+            await guest.send_signal(host_id, 'join_request', {})
+        await asyncio.wait_for(asyncio.gather(*(guest.done for guest in guests)), stats.timeout)
+        stats.rooms_ok += 1
+    except Exception:
+        stats.rooms_failed += 1
+    finally:
+        await asyncio.gather(*(peer.close() for peer in peers))
+
+
+def process_cpu_seconds(pid):
+    """CPU-время процесса (utime + stime) из /proc; None вне Linux"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            fields = stat_file.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def run_step(url, rooms, clients, concurrency, candidates, timeout, target_by, server_pid):
+    stats = Stats(candidates, timeout)
+    semaphore = asyncio.Semaphore(concurrency)
+    tag = uuid.uuid4().hex[:6]
+
+    async def limited(index):
+        async with semaphore:
+            await run_room(url, index, clients, stats, target_by, tag)
+
+    cpu_before = process_cpu_seconds(server_pid) if server_pid else None
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(rooms)))
+    wall = time.perf_counter() - start
+    cpu_after = process_cpu_seconds(server_pid) if server_pid else None
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return stats, wall, cpu
+
+
+def format_ms(samples, p):
+    return f"{percentile(samples, p) * 1000:8.2f}" if samples else f"{'-':>8}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="signaling load generator")
+    parser.add_argument('--server', choices=list(SERVER_COMMANDS), default='asgi',
+                        help='какой сервер поднять локально')
+    parser.add_argument('--url', help='не поднимать сервер, а нагружать уже запущенный')
+    parser.add_argument('--port', type=int, default=10200)
+    parser.add_argument('--ramp', type=int, nargs='+', default=[50, 100, 200], help='число комнат на шаге')
+    parser.add_argument('--clients', type=int, default=3, help='клиентов в комнате (кроме хоста)')
+    parser.add_argument('--candidates', type=int, default=4, help='ICE-кандидатов с каждой стороны')
+    parser.add_argument('--concurrency', type=int, default=50, help='одновременно создаваемых комнат')
+    parser.add_argument('--timeout', type=float, default=15.0)
+    parser.add_argument('--slo-ms', type=float, default=250.0, help='порог p99 join для "выдерживает"')
+    parser.add_argument('--target-by', choices=['sid', 'client_id'], default='sid',
+                        help='адресация сигналов (Node-сервер понимает только sid)')
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    server_pid = None
+    if not url:
+        url = f"http://127.0.0.1:{args.port}"
+        process = start_server(args.server, args.port)
+        server_pid = process.pid
+    try:
+        await wait_for_server(url)
+        label = args.url or args.server
+        print(f"server={label} clients/room={args.clients} candidates={args.candidates}")
+        print(f"{'rooms':>6} {'ok':>5} {'fail':>5} {'join p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'sig p50':>8} {'p95':>8} {'p99':>8} {'rooms/s':>8} {'rooms/core':>10}")
+        best = None
+        for rooms in args.ramp:
+            stats, wall, cpu = await run_step(url, rooms, args.clients, args.concurrency,
+                                              args.candidates, args.timeout, args.target_by, server_pid)
+            rooms_per_core = stats.rooms_ok / cpu if cpu else float('nan')
+            print(f"{rooms:>6} {stats.rooms_ok:>5} {stats.rooms_failed:>5} "
+                  f"{format_ms(stats.join, 50)} {format_ms(stats.join, 95)} {format_ms(stats.join, 99)} "
+                  f"{format_ms(stats.signal, 50)} {format_ms(stats.signal, 95)} {format_ms(stats.signal, 99)} "
+                  f"{stats.rooms_ok / wall:>8.1f} {rooms_per_core:>10.1f}")
+            within_slo = stats.join and not stats.rooms_failed \
+                and percentile(stats.join, 99) * 1000 <= args.slo_ms
+            if within_slo and rooms_per_core == rooms_per_core:
+                best = rooms_per_core if best is None else max(best, rooms_per_core)
+        if best is not None:
+            print(f"max sustainable rooms/core (p99 join <= {args.slo_ms:.0f} ms): {best:.1f}")
+        elif server_pid is None:
+            print("rooms/core needs a locally started server (omit --url)")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+# server/asgi.py
+# Asyncio-режим сигнального сервера: python-socketio AsyncServer под ASGI.
+# Один процесс держит десятки тысяч простаивающих websocket'ов
+# (нет отдельного потока ОС на соединение, как в threading-режиме).
+# Логика событий общая с signaling_server.py (SignalingService).
+#
+# Локальный запуск:
+#   uvicorn asgi:app --host 0.0.0.0 --port 10000
+# Через gunicorn: SIGNALING_MODE=asgi gunicorn -c gunicorn.conf.py
+
+import os
+
+import socketio
+
+import metrics
+from metrics import timed
+from signaling_service import SignalingService
+
+# Общая шина для нескольких воркеров (например redis://...)
+message_queue = os.environ.get('SIGNALING_MESSAGE_QUEUE')
+client_manager = socketio.AsyncRedisManager(message_queue) if message_queue else None
+
+sio = socketio.AsyncServer(async_mode='asgi',
+                           client_manager=client_manager,
+                           cors_allowed_origins="*",
+                           transports=['websocket', 'polling'],
+                           ping_timeout=120,
+                           ping_interval=50)
+
+service = SignalingService()
+rooms = service.rooms
+
+
+async def apply_actions(actions):
+    """Применение действий SignalingService через AsyncServer"""
+    for action in actions:
+        if action[0] == 'emit':
+            _, event, data, to = action
+            await sio.emit(event, data, to=to)
+        elif action[0] == 'enter_room':
+            _, sid, room = action
+            sio.enter_room(sid, room)
+        elif action[0] == 'leave_room':
+            _, sid, room = action
+            sio.leave_room(sid, room)
+        elif action[0] == 'disconnect':
+            await sio.disconnect(action[1])
+        elif action[0] == 'close_room':
+            await sio.close_room(action[1])
+
+
+async def sweep_rooms():
+    """Фоновый цикл вытеснения неактивных комнат (eviction.py)"""
+    while True:
+        await sio.sleep(service.evictor.tick)
+        await apply_actions(service.sweep())
+
+
+async def index(scope, receive, send):
+    """Аналог index() и /metrics из signaling_server.py для всех не-Socket.IO запросов"""
+    if scope['type'] != 'http':
+        return
+    if scope['path'] == '/metrics':
+        body = metrics.registry.render().encode('utf-8')
+        content_type = metrics.CONTENT_TYPE.encode('ascii')
+    else:
+        body = b"Signaling Server is running"
+        content_type = b'text/plain; charset=utf-8'
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', content_type)]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+@sio.event
+@timed('connect')
+async def connect(sid, environ, auth=None):
+    if service.claim_sweeper():
+        sio.start_background_task(sweep_rooms)
+    await apply_actions(service.connect(sid, auth))
+
+
+@sio.event
+@timed('disconnect')
+async def disconnect(sid):
+    await apply_actions(service.disconnect(sid))
+
+
+@sio.on('join')
+@timed('join')
+async def handle_join(sid, data):
+    await apply_actions(service.join(sid, data))
+
+
+@sio.on('resume')
+@timed('resume')
+async def handle_resume(sid, data):
+    await apply_actions(service.resume(sid, data))
+
+
+@sio.on('signal')
+@timed('signal')
+async def handle_signal(sid, data):
+    await apply_actions(service.signal(sid, data))
+
+
+@sio.on('signal_bin')
+@timed('signal_bin')
+async def handle_signal_bin(sid, data):
+    await apply_actions(service.signal_bin(sid, data))
+
+
+@sio.on('host_available')
+@timed('host_available')
+async def handle_host_available(sid, data):
+    await apply_actions(service.host_available(sid, data))
+
+
+@sio.on('list_rooms')
+@timed('list_rooms')
+async def handle_list_rooms(sid, data=None):
+    await apply_actions(service.list_rooms(sid, data))
+
+
+@sio.on('subscribe_rooms')
+@timed('subscribe_rooms')
+async def handle_subscribe_rooms(sid, data=None):
+    await apply_actions(service.subscribe_rooms(sid, data))
+
+
+@sio.on('unsubscribe_rooms')
+@timed('unsubscribe_rooms')
+async def handle_unsubscribe_rooms(sid, data=None):
+    await apply_actions(service.unsubscribe_rooms(sid, data))
+
+
+@sio.on('matchmake')
+@timed('matchmake')
+async def handle_matchmake(sid, data):
+    await apply_actions(service.matchmake(sid, data))
+
+
+@sio.on('cancel_matchmaking')
+@timed('cancel_matchmaking')
+async def handle_cancel_matchmaking(sid, data=None):
+    await apply_actions(service.cancel_matchmaking(sid, data))
+
+
+@sio.on('update_listing')
+@timed('update_listing')
+async def handle_update_listing(sid, data):
+    await apply_actions(service.update_listing(sid, data))
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=index)
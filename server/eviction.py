@@ -0,0 +1,212 @@
+# server/eviction.py
+# Вытеснение неактивных комнат.
+#
+# Комната удаляется при отключении хоста, но полуоткрытые соединения
+# (до ping_timeout=120с) и брошенные лобби могли жить в памяти бесконечно.
+# RoomEvictor помнит время последней активности каждой комнаты
+# (join/signal/host_available) и раз в такт забирает из колеса таймеров
+# только сработавшие таймеры - без обхода всех комнат:
+#
+#   - комната без событий дольше ROOM_IDLE_TTL удаляется, если её хост
+#     не подключен (партия идет по P2P, и живой хост событий не шлет);
+#   - комната без подключенных сокетов (например, восстановленная из журнала
+#     и не дождавшаяся участников) удаляется через ROOM_EMPTY_TTL;
+#   - client_id участников, которые были отключены две проверки подряд
+#     (не меньше ROOM_MEMBER_TTL), удаляются из комнаты.
+#
+# Переменные окружения (секунды, 0 отключает правило):
+#   ROOM_IDLE_TTL        по умолчанию 3600
+#   ROOM_EMPTY_TTL       по умолчанию 300
+#   ROOM_MEMBER_TTL      по умолчанию 600
+#   ROOM_SWEEP_INTERVAL  такт колеса, по умолчанию 5
+#
+# При общем хранилище (ROOM_STORE_URL=redis://) каждый воркер видит только
+# активность своих сокетов, поэтому ROOM_IDLE_TTL стоит выбирать с запасом.
+
+import math
+import os
+import threading
+import time
+
+
+class TimingWheel:
+    """
+    Колесо таймеров с ленивым переносом: таймер лежит в ячейке своего такта,
+    продление таймера только обновляет срок, а ячейка при срабатывании
+    перекладывает такие ключи в новую ячейку. advance() стоит
+    O(прошедших тактов + сработавших таймеров).
+    """
+
+    def __init__(self, tick, now):
+        self.tick = tick
+        self.current = self._tick_of(now)
+        self.slots = {}      # {номер такта: set(ключей)}
+        self.deadlines = {}  # {ключ: срок}
+
+    def _tick_of(self, moment):
+        return math.floor(moment / self.tick)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, deadline):
+        """Постановка или перенос таймера"""
+        previous = self.deadlines.get(key)
+        self.deadlines[key] = deadline
+        # Более поздний срок подхватится при срабатывании старой ячейки
+        if previous is None or deadline < previous:
+            self._put(key, deadline)
+
+    def cancel(self, key):
+        # Ключ остается в ячейке и отбрасывается при её срабатывании
+        self.deadlines.pop(key, None)
+
+    def _put(self, key, deadline):
+        slot = max(self._tick_of(deadline), self.current + 1)
+        self.slots.setdefault(slot, set()).add(key)
+
+    def advance(self, now):
+        """Ключи, срок которых истек к моменту now"""
+        expired = []
+        target = self._tick_of(now)
+        while self.current < target:
+            self.current += 1
+            for key in self.slots.pop(self.current, ()):
+                deadline = self.deadlines.get(key)
+                if deadline is None:
+                    continue
+                if deadline <= now:
+                    del self.deadlines[key]
+                    expired.append(key)
+                elif self._tick_of(deadline) != self.current:
+                    self._put(key, deadline)
+                else:
+                    # Срок внутри текущего такта - ячейка следующего такта
+                    self.slots.setdefault(self.current + 1, set()).add(key)
+        return expired
+
+
+class RoomEvictor:
+    """Учет активности комнат и выбор комнат для вытеснения"""
+
+    def __init__(self, idle_ttl=3600, empty_ttl=300, member_ttl=600, tick=5, clock=time.monotonic):
+        self.idle_ttl = idle_ttl
+        self.empty_ttl = empty_ttl
+        self.member_ttl = member_ttl
+        self.tick = tick
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.wheel = TimingWheel(tick, clock())
+        self.last_activity = {}  # {room: время последнего события}
+        self.empty_since = {}    # {room: время, когда комната впервые оказалась пустой}
+        self.stale_members = {}  # {room: set(client_id), отключенные на прошлой проверке}
+        # Период проверки пустых комнат и участников
+        self.check_period = min([ttl for ttl in (empty_ttl, member_ttl) if ttl > 0], default=0)
+
+    @property
+    def enabled(self):
+        return self.idle_ttl > 0 or self.check_period > 0
+
+    def touch(self, room):
+        """Событие в комнате; первый вызов ставит комнату на учет"""
+        if not self.enabled:
+            return
+        now = self.clock()
+        # Горячий путь (signal): только запись времени, без lock и колеса
+        if room in self.last_activity:
+            self.last_activity[room] = now
+            return
+        with self.lock:
+            self.last_activity[room] = now
+            self.wheel.schedule(room, self._next_check(room, now))
+
+    def forget(self, room):
+        """Комната удалена - снимаем с учета"""
+        with self.lock:
+            self.wheel.cancel(room)
+            self.last_activity.pop(room, None)
+            self.empty_since.pop(room, None)
+            self.stale_members.pop(room, None)
+
+    def __len__(self):
+        return len(self.last_activity)
+
+    def _next_check(self, room, now):
+        deadline = math.inf
+        if self.idle_ttl > 0:
+            deadline = self.last_activity.get(room, now) + self.idle_ttl
+        if self.check_period > 0:
+            deadline = min(deadline, now + self.check_period)
+        return deadline
+
+    def sweep(self, rooms):
+        """
+        Проверка сработавших таймеров.
+        :param rooms: RoomStore
+        :return: (комнаты для удаления, [(room, client_id)] для удаления)
+        """
+        evict = []
+        stale = []
+        if not self.enabled:
+            return evict, stale
+        now = self.clock()
+        with self.lock:
+            due = self.wheel.advance(now)
+        for room in due:
+            room_data = rooms.get(room)
+            with self.lock:
+                if room_data is None:
+                    self._drop(room)
+                    continue
+                reason = self._check(room, room_data, now, stale)
+                if reason:
+                    self._drop(room)
+                    evict.append((room, reason))
+                else:
+                    self.wheel.schedule(room, self._next_check(room, now))
+        return evict, stale
+
+    def _check(self, room, room_data, now, stale):
+        """Причина вытеснения или None; заодно собирает устаревших участников"""
+        if self.idle_ttl > 0:
+            if room_data.get('host_id') in room_data['clients']:
+                # Игра идет по P2P мимо сервера: живой сокет хоста - это активность
+                self.last_activity[room] = now
+            elif now - self.last_activity.get(room, now) >= self.idle_ttl:
+                return 'idle'
+
+        if not room_data['clients']:
+            if self.empty_ttl > 0:
+                since = self.empty_since.setdefault(room, now)
+                if now - since >= self.empty_ttl:
+                    return 'empty'
+            return None
+        self.empty_since.pop(room, None)
+
+        if self.member_ttl > 0:
+            # Участник устарел, если был отключен и на прошлой проверке (период >= TTL)
+            disconnected = {client_id for client_id, sid in room_data['members'].items()
+                            if sid not in room_data['clients'] and client_id != room_data.get('host_client_id')}
+            previous = self.stale_members.get(room, set())
+            stale.extend((room, client_id) for client_id in disconnected & previous)
+            if disconnected - previous:
+                self.stale_members[room] = disconnected - previous
+            else:
+                self.stale_members.pop(room, None)
+        return None
+
+    def _drop(self, room):
+        self.last_activity.pop(room, None)
+        self.empty_since.pop(room, None)
+        self.stale_members.pop(room, None)
+
+
+def create_room_evictor():
+    """RoomEvictor по ROOM_IDLE_TTL, ROOM_EMPTY_TTL, ROOM_MEMBER_TTL, ROOM_SWEEP_INTERVAL"""
+    return RoomEvictor(idle_ttl=float(os.environ.get('ROOM_IDLE_TTL', 3600)),
+                       empty_ttl=float(os.environ.get('ROOM_EMPTY_TTL', 300)),
+                       member_ttl=float(os.environ.get('ROOM_MEMBER_TTL', 600)),
+                       tick=float(os.environ.get('ROOM_SWEEP_INTERVAL', 5)))
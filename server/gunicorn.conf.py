@@ -3,8 +3,16 @@
 # Render может использовать эту конфигурацию или переопределять её.
 # Убедитесь, что она совместима.
 
+import os
+
+# Режим сервера: threading (Flask-SocketIO, web:app) или asgi (AsyncServer, asgi:app)
+signaling_mode = os.environ.get('SIGNALING_MODE', 'threading')
+
 bind = "0.0.0.0:10000"
-workers = 1 # Для Socket.IO часто используется 1 worker
+# Больше одного воркера - только с общим хранилищем комнат (ROOM_STORE_URL=redis://...)
+# и общей шиной сообщений (SIGNALING_MESSAGE_QUEUE), иначе воркеры не видят комнаты друг друга.
+# Для transport=polling балансировщик должен держать sticky sessions.
+workers = int(os.environ.get('SIGNALING_WORKERS', 1)) # Для Socket.IO часто используется 1 worker
 worker_class = "sync" # Используем sync worker, совместимый с threading
 worker_connections = 1000
 timeout = 120 # Увеличиваем таймаут
@@ -12,3 +20,9 @@ keepalive = 2
 max_requests = 1000
 max_requests_jitter = 100
 preload_app = True
+
+if signaling_mode == 'asgi':
+    # Один asyncio-процесс держит все websocket'ы, поток на соединение не нужен
+    wsgi_app = "asgi:app"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    worker_connections = 20000
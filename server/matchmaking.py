@@ -0,0 +1,121 @@
+# server/matchmaking.py
+# Подбор игроков без заранее известного имени комнаты.
+#
+# Игрок встает в очередь с параметрами игры: (игра, режим, колода, мест).
+# Каждый набор параметров - отдельная корзина (OrderedDict в порядке
+# постановки), поэтому постановка, отмена и сборка матча стоят O(1)
+# (сборка - O(мест)) независимо от числа ожидающих игроков в других корзинах.
+# Как только в корзине набирается нужное число игроков, самые ранние из них
+# образуют матч: сервер создает комнату и выбирает хоста.
+#
+# Очереди живут в памяти процесса: при нескольких воркерах игроки
+# подбираются среди подключенных к тому же воркеру.
+
+from collections import OrderedDict
+import threading
+import time
+import uuid
+
+MIN_SEATS = 2
+MAX_SEATS = 6
+
+
+class MatchTicket:
+    """Игрок в очереди подбора"""
+
+    __slots__ = ('sid', 'client_id', 'can_host', 'enqueued_at')
+
+    def __init__(self, sid, client_id, can_host, enqueued_at):
+        self.sid = sid
+        self.client_id = client_id
+        self.can_host = can_host
+        self.enqueued_at = enqueued_at
+
+
+class Match:
+    """Собранный матч: комната, хост и игроки в порядке постановки в очередь"""
+
+    def __init__(self, room, key, tickets, host):
+        self.room = room
+        self.key = key
+        self.tickets = tickets
+        self.host = host
+
+    @property
+    def params(self):
+        game, mode, deck_size, seats = self.key
+        return {'game': game, 'mode': mode, 'deck_size': deck_size, 'players_count': seats}
+
+
+class Matchmaker:
+    """Корзины очередей по (игра, режим, колода, мест)"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = {}     # {key: OrderedDict(sid -> MatchTicket)}
+        self.sid_bucket = {}  # {sid: key}
+
+    def __len__(self):
+        return len(self.sid_bucket)
+
+    @staticmethod
+    def bucket_key(data):
+        """Ключ корзины из запроса клиента; ValueError при неверных параметрах"""
+        game = str(data.get('game') or '').lower()
+        if not game:
+            raise ValueError('Game is required')
+        try:
+            seats = int(data.get('players_count') or data.get('seats') or MIN_SEATS)
+            deck_size = int(data.get('deck_size') or 36)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid match parameters')
+        if not MIN_SEATS <= seats <= MAX_SEATS:
+            raise ValueError(f'Seats must be between {MIN_SEATS} and {MAX_SEATS}')
+        return game, str(data.get('mode') or '').lower(), deck_size, seats
+
+    def enqueue(self, sid, client_id, key, can_host=True):
+        """
+        Постановка в очередь (повторная - переносит игрока в новую корзину).
+        :return: (Match или None, число игроков в корзине после постановки)
+        """
+        with self.lock:
+            self._remove(sid)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = OrderedDict()
+            bucket[sid] = MatchTicket(sid, client_id, can_host, self.clock())
+            self.sid_bucket[sid] = key
+            seats = key[3]
+            if len(bucket) < seats:
+                return None, len(bucket)
+            tickets = [bucket.popitem(last=False)[1] for _ in range(seats)]
+            for ticket in tickets:
+                del self.sid_bucket[ticket.sid]
+            if not bucket:
+                del self.buckets[key]
+            queued = len(bucket)
+        return Match(f"match-{uuid.uuid4().hex[:12]}", key, tickets, _elect_host(tickets)), queued
+
+    def cancel(self, sid):
+        """Выход из очереди; False, если игрок в ней не стоял"""
+        with self.lock:
+            return self._remove(sid)
+
+    def _remove(self, sid):
+        key = self.sid_bucket.pop(sid, None)
+        if key is None:
+            return False
+        bucket = self.buckets[key]
+        del bucket[sid]
+        if not bucket:
+            del self.buckets[key]
+        return True
+
+
+def _elect_host(tickets):
+    """Хост - дольше всех ждавший игрок, который может быть хостом"""
+    for ticket in tickets:
+        if ticket.can_host:
+            return ticket
+    return tickets[0]
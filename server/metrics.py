@@ -0,0 +1,259 @@
+# server/metrics.py
+# Метрики сигнального сервера в текстовом формате Prometheus (/metrics).
+#
+# Запись дешевая: у каждого потока свой шард со счетчиками (threading.local),
+# поэтому inc()/observe() не берут lock и не мешают пересылке сигналов.
+# Шарды суммируются только при чтении /metrics; шарды завершившихся потоков
+# (threading-режим создает поток на событие) сливаются в общий итог - при
+# чтении и при добавлении шарда, когда их число удвоилось с прошлой чистки,
+# поэтому память ограничена и без сборщика /metrics.
+
+import asyncio
+from bisect import bisect_left
+import functools
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы корзин гистограмм задержки, секунды
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Metrics:
+    """Реестр метрик с пошардовой (по потокам) записью"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # [(thread, {key: value})]
+        self._retired = {}  # итоги завершившихся потоков
+        self._prune_at = 64  # чистка шардов при добавлении, когда их больше
+        self._metrics = {}  # {name: metric}
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) > self._prune_at:
+                    # Амортизированно O(1) на поток: порог растет вместе с живыми шардами
+                    self._prune()
+                    self._prune_at = max(64, 2 * len(self._shards))
+        return shard
+
+    def _prune(self):
+        """Слияние шардов завершившихся потоков в общий итог (под self._lock)"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = alive
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label=None):
+        return self._register(Counter(self, name, help_text, label))
+
+    def gauge(self, name, help_text, label=None):
+        return self._register(Gauge(self, name, help_text, label))
+
+    def histogram(self, name, help_text, label=None, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, help_text, label, buckets))
+
+    def gauge_callback(self, name, help_text, callback):
+        """Gauge, значение которого вычисляется при чтении /metrics"""
+        return self._register(CallbackGauge(name, help_text, callback))
+
+    def histogram_callback(self, name, help_text, buckets, callback):
+        """Гистограмма по значениям callback(), вычисляется при чтении /metrics"""
+        return self._register(CallbackHistogram(name, help_text, buckets, callback))
+
+    def _collect(self):
+        """Сумма всех шардов: {(name, label_value): value}"""
+        with self._lock:
+            self._prune()
+            totals = {}
+            _merge(totals, self._retired)
+            for _, shard in self._shards:
+                _merge(totals, dict(shard))
+        return totals
+
+    def value(self, name, label_value=''):
+        """Текущее значение счетчика/gauge (для статистики и отладки)"""
+        return self._collect().get((name, label_value), 0)
+
+    def render(self):
+        totals = self._collect()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render(totals))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, label):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+
+    def inc(self, label_value='', amount=1):
+        shard = self.registry._shard()
+        key = (self.name, label_value)
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, totals):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for (name, label_value), value in sorted(totals.items(), key=_sort_key):
+            if name == self.name:
+                lines.append(f"{self.name}{_labels(self.label, label_value)} {value}")
+        if len(lines) == 2 and self.label is None:
+            lines.append(f"{self.name} 0")
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, label_value='', amount=1):
+        self.inc(label_value, -amount)
+
+
+class Histogram:
+    def __init__(self, registry, name, help_text, label, buckets):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+
+    def observe(self, label_value, value):
+        shard = self.registry._shard()
+        key = (self.name, label_value)
+        counts = shard.get(key)
+        if counts is None:
+            # [корзины..., +Inf, сумма]
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self, totals):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for (name, label_value), counts in sorted(totals.items(), key=_sort_key):
+            if name == self.name:
+                lines.extend(_render_histogram(self.name, self.buckets, counts, self.label, label_value))
+        return lines
+
+
+class CallbackGauge:
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self, totals):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.callback()}"]
+
+
+class CallbackHistogram:
+    def __init__(self, name, help_text, buckets, callback):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.callback = callback
+
+    def render(self, totals):
+        counts = [0] * (len(self.buckets) + 2)
+        for value in self.callback():
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        lines.extend(_render_histogram(self.name, self.buckets, counts, None, ''))
+        return lines
+
+
+def _render_histogram(name, buckets, counts, label, label_value):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets + (float('inf'),), counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f"{name}_bucket{_labels(label, label_value, le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(label, label_value)} {counts[-1]}")
+    lines.append(f"{name}_count{_labels(label, label_value)} {cumulative}")
+    return lines
+
+
+def _labels(label, label_value, le=None):
+    parts = []
+    if label is not None:
+        parts.append(f'{label}="{label_value}"')
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _merge(target, shard):
+    for key, value in shard.items():
+        if isinstance(value, list):
+            merged = target.get(key)
+            target[key] = [a + b for a, b in zip(merged, value)] if merged else list(value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _sort_key(item):
+    return item[0]
+
+
+registry = Metrics()
+
+EVENTS = registry.counter('signaling_events_total', 'Socket.IO events handled', 'event')
+EVENT_DURATION = registry.histogram('signaling_event_duration_seconds',
+                                    'Socket.IO event handling time', 'event')
+OPEN_SOCKETS = registry.gauge('signaling_open_sockets', 'Currently connected Socket.IO clients')
+THROTTLED = registry.counter('signaling_throttled_total', 'Events rejected by rate limits', 'event')
+THROTTLE_DISCONNECTS = registry.counter('signaling_throttle_disconnects_total',
+                                        'Clients disconnected for exceeding rate limits', 'event')
+ROOMS_EVICTED = registry.counter('signaling_rooms_evicted_total', 'Rooms removed by the idle sweeper', 'reason')
+MEMBERS_EVICTED = registry.counter('signaling_members_evicted_total',
+                                   'Stale member entries removed by the idle sweeper')
+MATCHES = registry.counter('signaling_matches_total', 'Rooms assembled by matchmaking', 'game')
+MATCH_WAIT = registry.histogram('signaling_match_wait_seconds', 'Time spent in the matchmaking queue', 'game',
+                                (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300))
+
+
+def timed(event):
+    """Декоратор обработчика: счетчик и гистограмма задержки события"""
+    def decorator(handler):
+        if asyncio.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await handler(*args, **kwargs)
+                finally:
+                    EVENTS.inc(event)
+                    EVENT_DURATION.observe(event, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                EVENTS.inc(event)
+                EVENT_DURATION.observe(event, time.perf_counter() - start)
+        return wrapper
+    return decorator
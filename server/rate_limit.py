@@ -0,0 +1,122 @@
+# server/rate_limit.py
+# Ограничение частоты событий (token bucket) по sid и по комнате.
+#
+# Один клиент, засыпающий сервер событиями signal, не должен замедлять
+# пересылку сигналов в остальных комнатах. Каждое событие join/resume/signal/
+# host_available списывает токен из корзины отправителя и из корзины
+# комнаты; корзины пополняются лениво при обращении (без таймеров),
+# поэтому учет стоит пару арифметических операций на событие.
+# Запросы каталога комнат (list_rooms, subscribe_rooms) делят лимит list_rooms.
+#
+# Переменные окружения (формат "событие=скорость/емкость", скорость - токенов в секунду):
+#   SIGNALING_RATE_LIMITS       лимиты на sid, например "signal=20/60,join=1/5"
+#   SIGNALING_ROOM_RATE_LIMITS  лимиты на комнату
+#   SIGNALING_RATE_POLICY       drop (по умолчанию) - отбросить событие (на запросы
+#                               join/resume/matchmake сервер отвечает ошибкой
+#                               "Rate limited"), disconnect - отключить нарушителя
+#
+# Лимиты действуют в пределах процесса: sid живет в одном воркере, а лимит
+# комнаты при нескольких воркерах считается в каждом воркере отдельно.
+
+import os
+import time
+
+DROP = 'drop'
+DISCONNECT = 'disconnect'
+
+# ICE-кандидаты приходят пачкой в начале соединения, отсюда запас емкости для signal
+DEFAULT_SID_LIMITS = 'join=1/5,resume=1/5,signal=20/60,host_available=0.5/3,list_rooms=2/10,update_listing=1/5,matchmake=1/5'
+DEFAULT_ROOM_LIMITS = 'join=5/20,resume=5/20,signal=100/300,host_available=1/5'
+
+
+class TokenBucket:
+    """Корзина токенов с ленивым пополнением"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'stamp')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    def take(self, now, cost=1.0):
+        """Списать cost токенов; False, если их не хватает"""
+        tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < cost:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - cost
+        return True
+
+
+class RateLimiter:
+    """Корзины по (событие, sid) и (событие, комната)"""
+
+    def __init__(self, sid_limits=None, room_limits=None, policy=DROP, clock=time.monotonic):
+        if policy not in (DROP, DISCONNECT):
+            raise ValueError(f"Unknown rate limit policy: {policy}")
+        self.sid_limits = dict(sid_limits or {})
+        self.room_limits = dict(room_limits or {})
+        self.policy = policy
+        self.clock = clock
+        self.sid_buckets = {}   # {sid: {event: TokenBucket}}
+        self.room_buckets = {}  # {room: {event: TokenBucket}}
+
+    def allow(self, event, sid, room=None):
+        """
+        Проверка события перед обработкой.
+        :return: None, если событие разрешено, иначе 'sid' или 'room' - чей лимит превышен.
+        """
+        now = self.clock()
+        limit = self.sid_limits.get(event)
+        if limit is not None and not _take(self.sid_buckets, sid, event, limit, now):
+            return 'sid'
+        limit = self.room_limits.get(event)
+        if room is not None and limit is not None \
+                and not _take(self.room_buckets, room, event, limit, now):
+            return 'room'
+        return None
+
+    def forget_sid(self, sid):
+        """Удаление корзин отключившегося sid"""
+        self.sid_buckets.pop(sid, None)
+
+    def forget_room(self, room):
+        """Удаление корзин удаленной комнаты"""
+        self.room_buckets.pop(room, None)
+
+
+def _take(buckets, key, event, limit, now):
+    # Гонка потоков в threading-режиме может списать токен неточно -
+    # это дешевле, чем lock на каждое событие, и лимит от этого не ломается
+    owner = buckets.get(key)
+    if owner is None:
+        owner = buckets[key] = {}
+    bucket = owner.get(event)
+    if bucket is None:
+        bucket = owner[event] = TokenBucket(limit[0], limit[1], now)
+    return bucket.take(now)
+
+
+def parse_limits(spec):
+    """'signal=20/60,join=1/5' -> {'signal': (20.0, 60.0), 'join': (1.0, 5.0)}; '/0' отключает лимит"""
+    limits = {}
+    for part in (spec or '').split(','):
+        if '=' not in part:
+            continue
+        event, value = part.split('=', 1)
+        rate, _, capacity = value.partition('/')
+        rate = float(rate)
+        capacity = float(capacity) if capacity else max(rate, 1.0)
+        if rate > 0 and capacity > 0:
+            limits[event.strip()] = (rate, capacity)
+    return limits
+
+
+def create_rate_limiter():
+    """RateLimiter по SIGNALING_RATE_LIMITS, SIGNALING_ROOM_RATE_LIMITS и SIGNALING_RATE_POLICY"""
+    return RateLimiter(parse_limits(os.environ.get('SIGNALING_RATE_LIMITS', DEFAULT_SID_LIMITS)),
+                       parse_limits(os.environ.get('SIGNALING_ROOM_RATE_LIMITS', DEFAULT_ROOM_LIMITS)),
+                       os.environ.get('SIGNALING_RATE_POLICY', DROP).strip().lower())
@@ -0,0 +1,76 @@
+# server/resume_tokens.py
+# Токены возобновления сессии сигналинга.
+#
+# После join/matched клиент получает короткоживущий токен, привязанный
+# к его client_id и комнате. Если сокет оборвался, клиент переподключается
+# и одним событием resume возвращает себе место в комнате (хост - и роль
+# хоста), не проходя join заново. Комната хоста на время TTL токена
+# не удаляется при его отключении - см. SignalingService.disconnect.
+# Токен - единственный способ вернуть роль хоста: join с client_id хоста
+# ее не возвращает.
+# Пока сокет подключен, SignalingService.sweep() выдает ему новый токен
+# (событие resume_token) каждые TTL/2 - срок отсчитывается от обрыва
+# с точностью до половины TTL.
+#
+# Токен "срок.подпись": срок действия (unix-время) и HMAC-SHA256 от
+# client_id, комнаты и срока. Сервер ничего не хранит - токен проверяет
+# любой воркер с тем же секретом.
+#
+# Переменные окружения:
+#   RESUME_TOKEN_SECRET  общий секрет воркеров; без него - секрет из журнала
+#                        комнат (RoomJournal.token_secret), а без журнала -
+#                        случайный на процесс (с preload_app мастер создает его
+#                        до fork, поэтому воркеры gunicorn все равно делят его)
+#   RESUME_TOKEN_TTL     срок действия токена и ожидания хоста, с
+#                        (по умолчанию 120, 0 отключает возобновление)
+
+import hashlib
+import hmac
+import os
+import time
+
+
+class ResumeTokens:
+    """Выдача и проверка токенов возобновления"""
+
+    def __init__(self, secret, ttl=120, clock=time.time):
+        self.secret = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.clock = clock
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _sign(self, client_id, room, expires):
+        message = f"{client_id}\n{room}\n{expires}".encode('utf-8')
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def issue(self, client_id, room):
+        """Токен для client_id в комнате room; None, если возобновление отключено"""
+        if not self.enabled or not client_id or not room:
+            return None
+        expires = int(self.clock() + self.ttl)
+        return f"{expires}.{self._sign(client_id, room, expires)}"
+
+    def verify(self, token, client_id, room):
+        """True, если токен выдан этому client_id в этой комнате и не истек"""
+        if not self.enabled or not isinstance(token, str) or not client_id or not room:
+            return False
+        expires, _, signature = token.partition('.')
+        try:
+            expires = int(expires)
+        except ValueError:
+            return False
+        if expires < self.clock():
+            return False
+        return hmac.compare_digest(signature, self._sign(client_id, room, expires))
+
+
+def create_resume_tokens(secret=None):
+    """
+    ResumeTokens по RESUME_TOKEN_SECRET и RESUME_TOKEN_TTL.
+    :param secret: секрет, если RESUME_TOKEN_SECRET не задан (None - случайный)
+    """
+    secret = os.environ.get('RESUME_TOKEN_SECRET') or secret or os.urandom(32)
+    return ResumeTokens(secret, ttl=float(os.environ.get('RESUME_TOKEN_TTL', 120)))
@@ -0,0 +1,232 @@
+# server/room_directory.py
+# Публичный каталог комнат: список открытых игр для лобби клиента.
+#
+# Хост при создании комнаты передает описание (listing): игра, режим,
+# колода, число мест. Каталог хранит вторичный индекс (игра, режим) ->
+# открытые комнаты в порядке создания, поэтому запрос страницы не
+# обходит все комнаты сервера: берутся только корзины подходящей игры/режима,
+# а курсор - порядковый номер последней выданной комнаты.
+#
+# Изменения каталога (add/update/remove) рассылаются подписчикам в комнату
+# Socket.IO канала игры, клиент применяет их к уже загруженному списку.
+#
+# Каталог живет в памяти процесса: при нескольких воркерах каждый воркер
+# показывает комнаты, созданные через него.
+
+from bisect import bisect_right, insort
+import heapq
+import itertools
+import threading
+
+# Префикс каналов подписки; имена комнат с этим префиксом зарезервированы
+CHANNEL_PREFIX = '#directory/'
+ALL_GAMES = '*'
+
+MAX_PAGE_SIZE = 50
+
+
+def channel(game):
+    """Комната Socket.IO, в которую рассылаются изменения каталога игры"""
+    return f"{CHANNEL_PREFIX}{game or ALL_GAMES}"
+
+
+class _Bucket:
+    """Открытые комнаты одной пары (игра, режим), упорядоченные по seq"""
+
+    __slots__ = ('seqs', 'names')
+
+    def __init__(self):
+        self.seqs = []   # возрастающие seq
+        self.names = {}  # {seq: room}
+
+    def add(self, seq, room):
+        # Новые комнаты получают максимальный seq - обычно это вставка в конец
+        if not self.seqs or seq > self.seqs[-1]:
+            self.seqs.append(seq)
+        else:
+            insort(self.seqs, seq)
+        self.names[seq] = room
+
+    def remove(self, seq):
+        index = bisect_right(self.seqs, seq) - 1
+        if index >= 0 and self.seqs[index] == seq:
+            del self.seqs[index]
+            del self.names[seq]
+
+    def after(self, cursor):
+        """(seq, room) с seq > cursor по возрастанию"""
+        for index in range(bisect_right(self.seqs, cursor), len(self.seqs)):
+            seq = self.seqs[index]
+            yield seq, self.names[seq]
+
+
+class RoomDirectory:
+    """Каталог публичных комнат со вторичным индексом и курсорной пагинацией"""
+
+    def __init__(self):
+        # Обработчики threading-режима вызывают каталог из разных потоков
+        self.lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.listings = {}  # {room: описание комнаты}
+        self.buckets = {}   # {(game, mode): _Bucket} - только комнаты со свободными местами
+        self.players = {}   # {room: set(sid)}
+        self.sid_rooms = {}  # {sid: set(room)}
+
+    def __contains__(self, room):
+        return room in self.listings
+
+    def __len__(self):
+        return len(self.listings)
+
+    def publish(self, room, listing, has_password=False, host_sid=None):
+        """
+        Публикация комнаты при создании.
+        :return: изменение для подписчиков или None, если комната не публичная.
+        """
+        if not listing or not listing.get('public', True):
+            return None
+        with self.lock:
+            if room in self.listings:
+                return None
+            return self._publish(room, listing, has_password, host_sid)
+
+    def _publish(self, room, listing, has_password, host_sid):
+        entry = {
+            'room': room,
+            'seq': next(self._seq),
+            'game': str(listing.get('game') or ''),
+            'mode': str(listing.get('mode') or ''),
+            'deck_size': _int(listing.get('deck_size'), 0),
+            'max_players': max(1, _int(listing.get('max_players'), 2)),
+            'players': 0,
+            'has_password': bool(has_password),
+            'open': True
+        }
+        self.listings[room] = entry
+        self.players[room] = set()
+        if host_sid is not None:
+            self.players[room].add(host_sid)
+            self.sid_rooms.setdefault(host_sid, set()).add(room)
+            entry['players'] = 1
+        self._index(entry)
+        return _diff('add', entry)
+
+    def update(self, room, **changes):
+        """Изменение описания хостом (mode, max_players, open)"""
+        with self.lock:
+            entry = self.listings.get(room)
+            if entry is None:
+                return None
+            self._unindex(entry)
+            if changes.get('mode') is not None:
+                entry['mode'] = str(changes['mode'])
+            if changes.get('max_players') is not None:
+                entry['max_players'] = max(1, _int(changes['max_players'], entry['max_players']))
+            if changes.get('open') is not None:
+                entry['open'] = bool(changes['open'])
+            self._index(entry)
+            return _diff('update', entry)
+
+    def player_joined(self, room, sid):
+        with self.lock:
+            players = self.players.get(room)
+            if players is None or sid in players:
+                return None
+            players.add(sid)
+            self.sid_rooms.setdefault(sid, set()).add(room)
+            return self._set_players(room, len(players))
+
+    def remove_sid(self, sid):
+        """Отключение sid: изменения числа игроков в его публичных комнатах"""
+        diffs = []
+        with self.lock:
+            for room in self.sid_rooms.pop(sid, ()):
+                players = self.players.get(room)
+                if players is not None:
+                    players.discard(sid)
+                    diff = self._set_players(room, len(players))
+                    if diff is not None:
+                        diffs.append(diff)
+        return diffs
+
+    def unpublish(self, room):
+        """Комната удалена"""
+        with self.lock:
+            entry = self.listings.pop(room, None)
+            if entry is None:
+                return None
+            self._unindex(entry)
+            for sid in self.players.pop(room, ()):
+                sid_rooms = self.sid_rooms.get(sid)
+                if sid_rooms is not None:
+                    sid_rooms.discard(room)
+                    if not sid_rooms:
+                        del self.sid_rooms[sid]
+        return {'op': 'remove', 'room': {'room': room, 'game': entry['game'], 'seq': entry['seq']}}
+
+    def query(self, game=None, mode=None, min_free_seats=1, cursor=0, limit=20):
+        """
+        Страница открытых комнат в порядке создания.
+        :return: (список описаний, курсор следующей страницы или None)
+        """
+        limit = max(1, min(_int(limit, 20), MAX_PAGE_SIZE))
+        cursor = _int(cursor, 0)
+        min_free_seats = max(1, _int(min_free_seats, 1))
+        page = []
+        with self.lock:
+            buckets = [bucket for (bucket_game, bucket_mode), bucket in self.buckets.items()
+                       if (not game or bucket_game == game) and (not mode or bucket_mode == mode)]
+            # Слияние корзин по seq: страница читает комнаты только после курсора
+            for seq, room in heapq.merge(*(bucket.after(cursor) for bucket in buckets)):
+                entry = self.listings[room]
+                if _free_seats(entry) >= min_free_seats:
+                    page.append(_public(entry))
+                    if len(page) == limit:
+                        return page, seq
+        return page, None
+
+    def _set_players(self, room, count):
+        entry = self.listings.get(room)
+        if entry is None or entry['players'] == count:
+            return None
+        self._unindex(entry)
+        entry['players'] = count
+        self._index(entry)
+        return _diff('update', entry)
+
+    def _index(self, entry):
+        if entry['open'] and _free_seats(entry) > 0:
+            key = (entry['game'], entry['mode'])
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = _Bucket()
+            bucket.add(entry['seq'], entry['room'])
+
+    def _unindex(self, entry):
+        key = (entry['game'], entry['mode'])
+        bucket = self.buckets.get(key)
+        if bucket is not None:
+            bucket.remove(entry['seq'])
+            if not bucket.seqs:
+                del self.buckets[key]
+
+
+def _free_seats(entry):
+    return max(0, entry['max_players'] - entry['players'])
+
+
+def _public(entry):
+    listing = dict(entry)
+    listing['free_seats'] = _free_seats(entry)
+    return listing
+
+
+def _diff(op, entry):
+    return {'op': op, 'room': _public(entry)}
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
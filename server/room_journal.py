@@ -0,0 +1,129 @@
+# server/room_journal.py
+# Журнал комнат в SQLite (WAL) - переживает перезапуск воркера gunicorn
+# (max_requests) и падение процесса. Каждое изменение комнаты пишется сразу
+# одной короткой транзакцией, при старте воркера комнаты восстанавливаются
+# одним SELECT'ом. sid'ы в журнал не попадают: после перезапуска сокеты
+# всё равно новые, участники узнаются по client_id из SignalingClient.
+#
+# ROOM_JOURNAL_PATH - путь к файлу журнала (по умолчанию rooms.sqlite3,
+# пустая строка отключает журнал).
+#
+# Журнал работает в паре с токенами возобновления (resume_tokens.py): роль
+# хоста и места участников восстановленной комнаты возвращаются только
+# resume по токену. Поэтому журнал хранит секрет токенов (если не задан
+# RESUME_TOKEN_SECRET) - токены, выданные до перезапуска, остаются
+# действительными, - а при RESUME_TOKEN_TTL=0 комнаты из журнала не
+# восстанавливаются (вернуть их было бы некому) и удаляются из него.
+
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    name TEXT PRIMARY KEY,
+    password TEXT NOT NULL DEFAULT '',
+    host_client_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    room TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    PRIMARY KEY (room, client_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class RoomJournal:
+    """Инкрементальный журнал комнат в SQLite WAL"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # Соединение открывается лениво и заново после fork (preload_app=True)
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _write(self, *statements):
+        with self.lock:
+            connection = self._connect()
+            if len(statements) == 1:
+                connection.execute(*statements[0])
+                return
+            connection.execute("BEGIN")
+            try:
+                for statement in statements:
+                    connection.execute(*statement)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def room_created(self, room_name, password, host_client_id):
+        self._write(
+            ("DELETE FROM members WHERE room = ?", (room_name,)),
+            ("INSERT OR REPLACE INTO rooms (name, password, host_client_id, updated_at) VALUES (?, ?, ?, ?)",
+             (room_name, password or '', host_client_id, time.time()))
+        )
+
+    def member_joined(self, room_name, client_id):
+        self._write(("INSERT OR IGNORE INTO members (room, client_id) VALUES (?, ?)", (room_name, client_id)))
+
+    def member_left(self, room_name, client_id):
+        self._write(("DELETE FROM members WHERE room = ? AND client_id = ?", (room_name, client_id)))
+
+    def room_deleted(self, room_name):
+        self._write(
+            ("DELETE FROM members WHERE room = ?", (room_name,)),
+            ("DELETE FROM rooms WHERE name = ?", (room_name,))
+        )
+
+    def load(self):
+        """Все комнаты журнала: [{'name', 'password', 'host_client_id', 'members'}]"""
+        with self.lock:
+            connection = self._connect()
+            rooms = {
+                name: {'name': name, 'password': password, 'host_client_id': host_client_id, 'members': []}
+                for name, password, host_client_id in connection.execute(
+                    "SELECT name, password, host_client_id FROM rooms")
+            }
+            for room_name, client_id in connection.execute("SELECT room, client_id FROM members"):
+                if room_name in rooms:
+                    rooms[room_name]['members'].append(client_id)
+        return list(rooms.values())
+
+    def token_secret(self):
+        """Секрет токенов возобновления: создается один раз и переживает перезапуски"""
+        with self.lock:
+            connection = self._connect()
+            # INSERT OR IGNORE - воркеры, стартующие одновременно, получат один секрет
+            connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('resume_token_secret', ?)",
+                               (os.urandom(32).hex(),))
+            return connection.execute("SELECT value FROM meta WHERE key = 'resume_token_secret'").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+def create_room_journal(path=None):
+    """Журнал по ROOM_JOURNAL_PATH; None, если журнал отключен"""
+    path = path if path is not None else os.environ.get('ROOM_JOURNAL_PATH', 'rooms.sqlite3')
+    return RoomJournal(path) if path else None
@@ -0,0 +1,131 @@
+# server/room_registry.py
+# Хранилище комнат сигнального сервера.
+# Участники комнаты хранятся в set, а обратный индекс sid -> комнаты
+# позволяет обрабатывать join, проверку адресата signal и disconnect за O(1)
+# (disconnect - за O(число комнат этого sid), обычно 1).
+
+from room_store import RoomStore
+
+
+class RoomRegistry(RoomStore):
+    """Комнаты и членство в них с обратным индексом sid -> комнаты"""
+
+    def __init__(self):
+        # {room_name: {'host_id', 'password', 'host_client_id', 'clients': set, 'members': {client_id: sid}}}
+        self.rooms = {}
+        self.sid_rooms = {}  # {sid: set(room_name)}
+
+    def __contains__(self, room_name):
+        return room_name in self.rooms
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def get(self, room_name):
+        """Данные комнаты или None"""
+        return self.rooms.get(room_name)
+
+    def create_room(self, room_name, host_id, password='', host_client_id=None):
+        """Создание комнаты; False, если комната уже существует"""
+        if room_name in self.rooms:
+            return False
+        self.rooms[room_name] = {
+            'host_id': host_id,
+            'password': password,
+            'host_client_id': host_client_id,
+            'clients': set(),
+            'members': {}
+        }
+        if host_id is not None:
+            self.add_client(room_name, host_id, host_client_id)
+        return True
+
+    def restore_room(self, room_name, password='', host_client_id=None, member_client_ids=()):
+        """Восстановление комнаты без живых сокетов (после перезапуска воркера)"""
+        if not self.create_room(room_name, None, password, host_client_id):
+            return False
+        self.rooms[room_name]['members'] = {client_id: None for client_id in member_client_ids}
+        return True
+
+    def add_client(self, room_name, sid, client_id=None):
+        """Добавление sid в комнату"""
+        room_data = self.rooms.get(room_name)
+        if room_data is None:
+            return False
+        room_data['clients'].add(sid)
+        if client_id:
+            room_data['members'][client_id] = sid
+        self.sid_rooms.setdefault(sid, set()).add(room_name)
+        return True
+
+    def has_client(self, room_name, sid):
+        """Проверка, что sid состоит в комнате"""
+        room_data = self.rooms.get(room_name)
+        return room_data is not None and sid in room_data['clients']
+
+    def resolve(self, room_name, target):
+        """sid участника по sid или client_id; None, если он сейчас не в комнате"""
+        room_data = self.rooms.get(room_name)
+        if room_data is None:
+            return None
+        if target in room_data['clients']:
+            return target
+        sid = room_data['members'].get(target)
+        return sid if sid in room_data['clients'] else None
+
+    def set_host(self, room_name, host_id, host_client_id=None):
+        """Назначение хоста комнаты"""
+        room_data = self.rooms.get(room_name)
+        if room_data is None:
+            return False
+        room_data['host_id'] = host_id
+        if host_client_id:
+            room_data['host_client_id'] = host_client_id
+        return True
+
+    def remove_member(self, room_name, client_id):
+        """Удаление client_id участника без живого сокета"""
+        room_data = self.rooms.get(room_name)
+        if room_data is None or client_id not in room_data['members']:
+            return False
+        if room_data['members'][client_id] in room_data['clients']:
+            return False
+        del room_data['members'][client_id]
+        return True
+
+    def delete_room(self, room_name):
+        """Удаление комнаты вместе с записями обратного индекса"""
+        room_data = self.rooms.pop(room_name, None)
+        if room_data is None:
+            return False
+        for sid in room_data['clients']:
+            sid_rooms = self.sid_rooms.get(sid)
+            if sid_rooms is not None:
+                sid_rooms.discard(room_name)
+                if not sid_rooms:
+                    del self.sid_rooms[sid]
+        return True
+
+    def remove_sid(self, sid, keep_hosted=False):
+        """
+        Удаление sid из всех его комнат.
+        :param keep_hosted: не удалять комнаты хоста, а оставить их без хоста
+        :return: список комнат, хостом которых был sid.
+        """
+        removed_rooms = []
+        for room_name in self.sid_rooms.pop(sid, ()):
+            room_data = self.rooms.get(room_name)
+            if room_data is None:
+                continue
+            room_data['clients'].discard(sid)
+            if room_data.get('host_id') == sid:
+                if keep_hosted:
+                    room_data['host_id'] = None
+                else:
+                    self.delete_room(room_name)
+                removed_rooms.append(room_name)
+        return removed_rooms
+
+    def room_sizes(self):
+        """Число подключенных sid в каждой комнате"""
+        return [len(room_data['clients']) for room_data in self.rooms.values()]
@@ -0,0 +1,454 @@
+# server/room_store.py
+# Подключаемые хранилища комнат сигнального сервера.
+#
+#   RoomRegistry      - комнаты в памяти процесса (room_registry.py)
+#   RedisRoomStore    - общее хранилище в Redis, видимое всем воркерам
+#   LocalRedis        - локальная замена Redis для разработки и проверок
+#   ShardedRoomStore  - хеш-шардирование комнат по нескольким хранилищам
+#
+# Выбор хранилища - переменная окружения ROOM_STORE_URL:
+#   memory://                        (по умолчанию) память процесса
+#   local://                         RedisRoomStore поверх LocalRedis
+#   redis://host:6379/0[,redis://..] Redis; несколько URL - несколько шардов
+# ROOM_STORE_SHARDS - число шардов для memory:// и local:// (по умолчанию 8).
+#
+# Чтобы несколько воркеров обслуживали одну комнату, кроме общего хранилища
+# нужна общая шина сообщений Socket.IO (SIGNALING_MESSAGE_QUEUE, см. gunicorn.conf.py).
+
+from abc import ABC, abstractmethod
+import os
+import threading
+import zlib
+
+try:
+    import redis
+except ImportError:  # redis нужен только для ROOM_STORE_URL=redis://
+    redis = None
+
+
+class RoomStore(ABC):
+    """Базовый класс хранилища комнат"""
+
+    @abstractmethod
+    def __contains__(self, room_name):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def get(self, room_name):
+        """
+        Данные комнаты или None:
+        {'host_id', 'password', 'host_client_id', 'clients': set(sid), 'members': {client_id: sid}}
+        """
+        pass
+
+    @abstractmethod
+    def create_room(self, room_name, host_id, password='', host_client_id=None):
+        """Создание комнаты; False, если комната уже существует"""
+        pass
+
+    @abstractmethod
+    def restore_room(self, room_name, password='', host_client_id=None, member_client_ids=()):
+        """Восстановление комнаты без живых сокетов (после перезапуска воркера)"""
+        pass
+
+    @abstractmethod
+    def add_client(self, room_name, sid, client_id=None):
+        """Добавление sid (и client_id участника) в комнату"""
+        pass
+
+    @abstractmethod
+    def has_client(self, room_name, sid):
+        """Проверка, что sid состоит в комнате"""
+        pass
+
+    @abstractmethod
+    def resolve(self, room_name, target):
+        """sid участника по sid или client_id; None, если он сейчас не в комнате"""
+        pass
+
+    @abstractmethod
+    def set_host(self, room_name, host_id, host_client_id=None):
+        """Назначение хоста комнаты"""
+        pass
+
+    @abstractmethod
+    def remove_member(self, room_name, client_id):
+        """Удаление client_id участника без живого сокета; False, если он подключен или его нет"""
+        pass
+
+    @abstractmethod
+    def delete_room(self, room_name):
+        """Удаление комнаты"""
+        pass
+
+    @abstractmethod
+    def remove_sid(self, sid, keep_hosted=False):
+        """
+        Удаление sid из всех комнат; возвращает комнаты, хостом которых был sid.
+        Такие комнаты удаляются, а с keep_hosted=True остаются без хоста
+        (host_id сбрасывается, хост может вернуться по host_client_id).
+        """
+        pass
+
+    @abstractmethod
+    def room_sizes(self):
+        """Число подключенных sid в каждой комнате (для /metrics)"""
+        pass
+
+
+class RedisRoomStore(RoomStore):
+    """
+    Комнаты в Redis (или в совместимом клиенте, например LocalRedis).
+    Ключи:
+      {prefix}:room:{name}          hash  host_id, password, host_client_id
+      {prefix}:room:{name}:clients  set   sid участников
+      {prefix}:room:{name}:members  hash  client_id -> sid ('' - нет сокета)
+      {prefix}:sid:{sid}            set   комнаты sid (обратный индекс)
+      {prefix}:rooms                set   имена всех комнат шарда
+    """
+
+    def __init__(self, client, prefix='signaling'):
+        self.client = client
+        self.prefix = prefix
+
+    def _room_key(self, room_name):
+        return f"{self.prefix}:room:{room_name}"
+
+    def _clients_key(self, room_name):
+        return f"{self.prefix}:room:{room_name}:clients"
+
+    def _members_key(self, room_name):
+        return f"{self.prefix}:room:{room_name}:members"
+
+    def _sid_key(self, sid):
+        return f"{self.prefix}:sid:{sid}"
+
+    def _index_key(self):
+        return f"{self.prefix}:rooms"
+
+    def __contains__(self, room_name):
+        return bool(self.client.exists(self._room_key(room_name)))
+
+    def __len__(self):
+        return self.client.scard(self._index_key())
+
+    def get(self, room_name):
+        pipe = self.client.pipeline()
+        pipe.hgetall(self._room_key(room_name))
+        pipe.smembers(self._clients_key(room_name))
+        pipe.hgetall(self._members_key(room_name))
+        room_hash, clients, members = pipe.execute()
+        if not room_hash:
+            return None
+        return {
+            'host_id': room_hash.get('host_id') or None,
+            'password': room_hash.get('password', ''),
+            'host_client_id': room_hash.get('host_client_id') or None,
+            'clients': set(clients),
+            'members': {client_id: sid or None for client_id, sid in members.items()}
+        }
+
+    def create_room(self, room_name, host_id, password='', host_client_id=None):
+        # HSETNX - атомарная проверка существования между воркерами
+        if not self.client.hsetnx(self._room_key(room_name), 'host_id', host_id or ''):
+            return False
+        pipe = self.client.pipeline()
+        pipe.hset(self._room_key(room_name), 'password', password or '')
+        pipe.hset(self._room_key(room_name), 'host_client_id', host_client_id or '')
+        pipe.sadd(self._index_key(), room_name)
+        pipe.execute()
+        if host_id is not None:
+            self.add_client(room_name, host_id, host_client_id)
+        return True
+
+    def restore_room(self, room_name, password='', host_client_id=None, member_client_ids=()):
+        if not self.create_room(room_name, None, password, host_client_id):
+            return False
+        pipe = self.client.pipeline()
+        for client_id in member_client_ids:
+            pipe.hset(self._members_key(room_name), client_id, '')
+        pipe.execute()
+        return True
+
+    def add_client(self, room_name, sid, client_id=None):
+        if room_name not in self:
+            return False
+        pipe = self.client.pipeline()
+        pipe.sadd(self._clients_key(room_name), sid)
+        if client_id:
+            pipe.hset(self._members_key(room_name), client_id, sid)
+        pipe.sadd(self._sid_key(sid), room_name)
+        pipe.execute()
+        return True
+
+    def has_client(self, room_name, sid):
+        return bool(self.client.sismember(self._clients_key(room_name), sid))
+
+    def resolve(self, room_name, target):
+        if self.has_client(room_name, target):
+            return target
+        sid = self.client.hget(self._members_key(room_name), target)
+        return sid if sid and self.has_client(room_name, sid) else None
+
+    def set_host(self, room_name, host_id, host_client_id=None):
+        if room_name not in self:
+            return False
+        self.client.hset(self._room_key(room_name), 'host_id', host_id)
+        if host_client_id:
+            self.client.hset(self._room_key(room_name), 'host_client_id', host_client_id)
+        return True
+
+    def remove_member(self, room_name, client_id):
+        sid = self.client.hget(self._members_key(room_name), client_id)
+        if sid is None or (sid and self.has_client(room_name, sid)):
+            return False
+        return bool(self.client.hdel(self._members_key(room_name), client_id))
+
+    def delete_room(self, room_name):
+        clients = self.client.smembers(self._clients_key(room_name))
+        pipe = self.client.pipeline()
+        for sid in clients:
+            pipe.srem(self._sid_key(sid), room_name)
+        pipe.delete(self._room_key(room_name), self._clients_key(room_name), self._members_key(room_name))
+        pipe.srem(self._index_key(), room_name)
+        results = pipe.execute()
+        return bool(results[len(clients)])
+
+    def remove_sid(self, sid, keep_hosted=False):
+        removed_rooms = []
+        for room_name in self.client.smembers(self._sid_key(sid)):
+            pipe = self.client.pipeline()
+            pipe.srem(self._clients_key(room_name), sid)
+            pipe.hget(self._room_key(room_name), 'host_id')
+            _, host_id = pipe.execute()
+            if host_id == sid:
+                if keep_hosted:
+                    self.client.hset(self._room_key(room_name), 'host_id', '')
+                else:
+                    self.delete_room(room_name)
+                removed_rooms.append(room_name)
+        self.client.delete(self._sid_key(sid))
+        return removed_rooms
+
+    def room_sizes(self):
+        pipe = self.client.pipeline()
+        for room_name in self.client.smembers(self._index_key()):
+            pipe.scard(self._clients_key(room_name))
+        return pipe.execute()
+
+
+class ShardedRoomStore(RoomStore):
+    """
+    Хеш-шардирование комнат: комната всегда живет в шарде crc32(имя) % N,
+    поэтому все воркеры находят её в одном и том же шарде.
+    С thread_safe=True у каждого шарда свой lock (threading-режим сервера).
+    """
+
+    def __init__(self, shards, thread_safe=True):
+        self.shards = list(shards)
+        self.locks = [threading.Lock() if thread_safe else _NoLock() for _ in self.shards]
+
+    def shard_index(self, room_name):
+        return zlib.crc32(room_name.encode('utf-8')) % len(self.shards)
+
+    def _call(self, room_name, method, *args):
+        index = self.shard_index(room_name)
+        with self.locks[index]:
+            return getattr(self.shards[index], method)(room_name, *args)
+
+    def __contains__(self, room_name):
+        index = self.shard_index(room_name)
+        with self.locks[index]:
+            return room_name in self.shards[index]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def get(self, room_name):
+        return self._call(room_name, 'get')
+
+    def create_room(self, room_name, host_id, password='', host_client_id=None):
+        return self._call(room_name, 'create_room', host_id, password, host_client_id)
+
+    def restore_room(self, room_name, password='', host_client_id=None, member_client_ids=()):
+        return self._call(room_name, 'restore_room', password, host_client_id, member_client_ids)
+
+    def add_client(self, room_name, sid, client_id=None):
+        return self._call(room_name, 'add_client', sid, client_id)
+
+    def has_client(self, room_name, sid):
+        return self._call(room_name, 'has_client', sid)
+
+    def resolve(self, room_name, target):
+        return self._call(room_name, 'resolve', target)
+
+    def set_host(self, room_name, host_id, host_client_id=None):
+        return self._call(room_name, 'set_host', host_id, host_client_id)
+
+    def remove_member(self, room_name, client_id):
+        return self._call(room_name, 'remove_member', client_id)
+
+    def delete_room(self, room_name):
+        return self._call(room_name, 'delete_room')
+
+    def remove_sid(self, sid, keep_hosted=False):
+        # Обратный индекс у каждого шарда свой: O(число шардов)
+        removed_rooms = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                removed_rooms.extend(shard.remove_sid(sid, keep_hosted))
+        return removed_rooms
+
+    def room_sizes(self):
+        sizes = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                sizes.extend(shard.room_sizes())
+        return sizes
+
+
+class LocalRedis:
+    """
+    Локальная замена Redis с подмножеством команд, которые использует
+    RedisRoomStore. Данные живут в памяти процесса, поэтому между воркерами
+    не разделяются - это заглушка для разработки и проверок.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.RLock()
+
+    def pipeline(self):
+        return _LocalPipeline(self)
+
+    def exists(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if key in self.data)
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def hsetnx(self, key, field, value):
+        with self.lock:
+            room_hash = self.data.setdefault(key, {})
+            if field in room_hash:
+                return 0
+            room_hash[field] = value
+            return 1
+
+    def hset(self, key, field, value):
+        with self.lock:
+            room_hash = self.data.setdefault(key, {})
+            is_new = field not in room_hash
+            room_hash[field] = value
+            return int(is_new)
+
+    def hget(self, key, field):
+        with self.lock:
+            return self.data.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self.data.get(key, {}))
+
+    def hdel(self, key, *fields):
+        with self.lock:
+            room_hash = self.data.get(key)
+            if not room_hash:
+                return 0
+            removed = sum(1 for field in fields if room_hash.pop(field, None) is not None)
+            if not room_hash:
+                del self.data[key]
+            return removed
+
+    def sadd(self, key, *members):
+        with self.lock:
+            members_set = self.data.setdefault(key, set())
+            before = len(members_set)
+            members_set.update(members)
+            return len(members_set) - before
+
+    def srem(self, key, *members):
+        with self.lock:
+            members_set = self.data.get(key)
+            if not members_set:
+                return 0
+            before = len(members_set)
+            members_set.difference_update(members)
+            removed = before - len(members_set)
+            if not members_set:
+                del self.data[key]
+            return removed
+
+    def smembers(self, key):
+        with self.lock:
+            return set(self.data.get(key, ()))
+
+    def sismember(self, key, member):
+        with self.lock:
+            return int(member in self.data.get(key, ()))
+
+    def scard(self, key):
+        with self.lock:
+            return len(self.data.get(key, ()))
+
+
+class _LocalPipeline:
+    """Pipeline для LocalRedis: команды копятся и выполняются в execute()"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args):
+            self.commands.append((method, args))
+            return self
+        return queue
+
+    def execute(self):
+        with self.client.lock:
+            results = [method(*args) for method, args in self.commands]
+        self.commands = []
+        return results
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def create_room_store(url=None, shards=None):
+    """Создание хранилища комнат по ROOM_STORE_URL / ROOM_STORE_SHARDS"""
+    from room_registry import RoomRegistry
+
+    url = url if url is not None else os.environ.get('ROOM_STORE_URL', 'memory://')
+    shards = shards if shards is not None else int(os.environ.get('ROOM_STORE_SHARDS', 8))
+
+    if url.startswith('memory://'):
+        return ShardedRoomStore([RoomRegistry() for _ in range(shards)])
+
+    if url.startswith('local://'):
+        client = LocalRedis()
+        return ShardedRoomStore(
+            [RedisRoomStore(client, prefix=f"signaling:{n}") for n in range(shards)],
+            thread_safe=False
+        )
+
+    if url.startswith(('redis://', 'rediss://')):
+        if redis is None:
+            raise RuntimeError("ROOM_STORE_URL=redis:// requires the 'redis' package")
+        clients = [redis.Redis.from_url(u.strip(), decode_responses=True) for u in url.split(',')]
+        return ShardedRoomStore([RedisRoomStore(client) for client in clients], thread_safe=False)
+
+    raise ValueError(f"Unsupported ROOM_STORE_URL: {url}")
@@ -0,0 +1,160 @@
+# server/signaling_log.py
+# Неблокирующее структурированное логирование сигнального сервера.
+#
+# Обработчики событий не пишут в stdout сами: запись кладется в очередь,
+# а форматирует и выводит её отдельный поток (QueueListener). Частые события
+# (в первую очередь пересылка signal) сэмплируются счетчиком: при доле 0.01
+# выводится каждое сотое событие с полем sampled=100, остальные отбрасываются
+# до создания LogRecord и форматирования.
+#
+# Переменные окружения:
+#   SIGNALING_LOG_LEVEL   уровень (по умолчанию INFO)
+#   SIGNALING_LOG_SAMPLE  доли по событиям, например "signal=0.01,join=1,*=1"
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+DEFAULT_SAMPLE = 'signal=0.01,signal_dropped=0.01,throttled=0.01'
+
+
+class EventSampler:
+    """Детерминированный сэмплинг: каждое N-е событие данного типа"""
+
+    def __init__(self, ratios=None, default_ratio=1.0):
+        ratios = dict(ratios or {})
+        default_ratio = ratios.pop('*', default_ratio)
+        self.default_every = _every(default_ratio)
+        self.every = {event: _every(ratio) for event, ratio in ratios.items()}
+        self.counts = {}
+
+    def take(self, event):
+        """Сколько событий представляет эта запись; 0 - не логировать"""
+        every = self.every.get(event, self.default_every)
+        if every == 1:
+            return 1
+        if every == 0:
+            return 0
+        count = self.counts.get(event, 0) + 1
+        if count >= every:
+            self.counts[event] = 0
+            return count
+        self.counts[event] = count
+        return 0
+
+
+class StructuredFormatter(logging.Formatter):
+    """time level logger message key=value ..."""
+
+    def format(self, record):
+        line = (f"{self.formatTime(record, '%Y-%m-%dT%H:%M:%S')} {record.levelname} "
+                f"{record.name} {record.getMessage()}")
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # Стандартный prepare() форматирует запись в потоке вызова;
+    # очередь внутрипроцессная, поэтому передаем запись как есть
+    def prepare(self, record):
+        return record
+
+
+class EventLogger:
+    """Логгер с сэмплингом по типам событий и полями key=value"""
+
+    def __init__(self, logger, sampler):
+        self.logger = logger
+        self.sampler = sampler
+
+    def event(self, event, message, level=logging.INFO, **fields):
+        """Частое событие: проходит через сэмплер"""
+        if not self.logger.isEnabledFor(level):
+            return
+        sampled = self.sampler.take(event)
+        if not sampled:
+            return
+        fields['event'] = event
+        if sampled > 1:
+            fields['sampled'] = sampled
+        self.logger.log(level, message, extra={'fields': fields})
+
+    def debug(self, message, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message, exc_info=False, **fields):
+        self._log(logging.ERROR, message, fields, exc_info)
+
+    def _log(self, level, message, fields, exc_info=False):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, exc_info=exc_info, extra={'fields': fields})
+
+
+def _every(ratio):
+    ratio = float(ratio)
+    if ratio <= 0:
+        return 0
+    return max(1, round(1 / min(ratio, 1.0)))
+
+
+def parse_sample(spec):
+    """'signal=0.01,join=1' -> {'signal': 0.01, 'join': 1.0}"""
+    ratios = {}
+    for part in (spec or '').split(','):
+        if '=' in part:
+            event, ratio = part.split('=', 1)
+            ratios[event.strip()] = float(ratio)
+    return ratios
+
+
+_queue = queue.SimpleQueue()
+_listener = None
+_loggers = {}
+
+
+def _start_listener():
+    global _listener
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter())
+    _listener = logging.handlers.QueueListener(_queue, handler)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def get_logger(name='signaling'):
+    """EventLogger с очередью и сэмплингом; все логгеры процесса делят один поток вывода"""
+    if name in _loggers:
+        return _loggers[name]
+
+    if _listener is None:
+        _start_listener()
+        # Поток слушателя не переживает fork (gunicorn preload_app) - запускаем заново в воркере
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_start_listener)
+        atexit.register(_stop_listener)
+
+    logger = logging.getLogger(name)
+    logger.setLevel(os.environ.get('SIGNALING_LOG_LEVEL', 'INFO').upper())
+    logger.propagate = False
+    logger.addHandler(_DeferredQueueHandler(_queue))
+
+    sampler = EventSampler(parse_sample(os.environ.get('SIGNALING_LOG_SAMPLE', DEFAULT_SAMPLE)))
+    _loggers[name] = EventLogger(logger, sampler)
+    return _loggers[name]
@@ -1,112 +1,126 @@
 # server/signaling_server.py
-from flask import Flask, request
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask, Response, request
+from flask_socketio import SocketIO, disconnect, join_room, leave_room
 import os
 
+import metrics
+from metrics import timed
+from signaling_service import SignalingService
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret!'
 
 # Вернем threading, так как eventlet несовместим с Python 3.13
+# Asyncio-режим (python-socketio AsyncServer под ASGI) - см. asgi.py
 socketio = SocketIO(app, 
                    cors_allowed_origins="*",
                    transports=['websocket', 'polling'],
                    ping_timeout=120,      # Увеличиваем таймауты
                    ping_interval=50,      # Увеличиваем интервал
-                   async_mode='threading') # Явно указываем threading
+                   async_mode='threading', # Явно указываем threading
+                   # Общая шина для нескольких воркеров (например redis://...)
+                   message_queue=os.environ.get('SIGNALING_MESSAGE_QUEUE'))
+
+service = SignalingService()
+rooms = service.rooms
+
+def apply_actions(actions):
+    """Применение действий SignalingService через Flask-SocketIO"""
+    for action in actions:
+        if action[0] == 'emit':
+            _, event, data, to = action
+            socketio.emit(event, data, to=to)
+        elif action[0] == 'enter_room':
+            _, sid, room = action
+            join_room(room, sid=sid)
+        elif action[0] == 'leave_room':
+            _, sid, room = action
+            leave_room(room, sid=sid)
+        elif action[0] == 'disconnect':
+            disconnect(sid=action[1])
+        elif action[0] == 'close_room':
+            socketio.close_room(action[1])
 
-rooms = {}
+def sweep_rooms():
+    """Фоновый цикл вытеснения неактивных комнат (eviction.py)"""
+    while True:
+        socketio.sleep(service.evictor.tick)
+        apply_actions(service.sweep())
 
 @app.route('/')
 def index():
     return "Signaling Server is running"
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
 @socketio.on('connect')
-def handle_connect():
-    print(f"Client connected: {request.sid}")
+@timed('connect')
+def handle_connect(auth=None):
+    if service.claim_sweeper():
+        socketio.start_background_task(sweep_rooms)
+    apply_actions(service.connect(request.sid, auth))
 
 @socketio.on('disconnect')
+@timed('disconnect')
 def handle_disconnect():
-    print(f"Client disconnected: {request.sid}")
-    rooms_to_remove = []
-    for room_name, room_data in list(rooms.items()):
-        if request.sid in room_data.get('clients', []):
-            room_data['clients'].remove(request.sid)
-            if room_data.get('host_id') == request.sid:
-                rooms_to_remove.append(room_name)
-                print(f"Room {room_name} deleted (host disconnected)")
-    
-    for room_name in rooms_to_remove:
-        if room_name in rooms:
-            del rooms[room_name]
+    apply_actions(service.disconnect(request.sid))
 
 @socketio.on('join')
+@timed('join')
 def handle_join(data):
-    room_name = data.get('room')
-    password = data.get('password', '')
-    is_host = data.get('is_host', False)
-    
-    print(f"Join request: room={room_name}, is_host={is_host}, has_password={bool(password)}")
-    
-    if not room_name:
-        emit('joined', {'status': 'error', 'message': 'Room name is required'})
-        return
-    
-    if is_host:
-        if room_name in rooms:
-            emit('joined', {'status': 'error', 'message': 'Room already exists'})
-            return
-        
-        rooms[room_name] = {
-            'host_id': request.sid,
-            'password': password,
-            'clients': [request.sid]
-        }
-        join_room(room_name)
-        emit('joined', {'status': 'success', 'message': 'Room created successfully', 'room': room_name})
-        print(f"Room {room_name} created by {request.sid}")
-        
-    else:
-        if room_name not in rooms:
-            emit('joined', {'status': 'error', 'message': 'Room not found'})
-            return
-        
-        room_data = rooms[room_name]
-        
-        required_password = room_data.get('password', '')
-        if required_password and password != required_password:
-            emit('joined', {'status': 'error', 'message': 'Invalid password'})
-            return
-        
-        if request.sid not in room_data['clients']:
-            room_data['clients'].append(request.sid)
-        join_room(room_name)
-        emit('joined', {'status': 'success', 'message': 'Joined room successfully', 'room': room_name})
-        print(f"Client {request.sid} joined room {room_name}")
+    apply_actions(service.join(request.sid, data))
+
+@socketio.on('resume')
+@timed('resume')
+def handle_resume(data):
+    apply_actions(service.resume(request.sid, data))
 
 @socketio.on('signal')
+@timed('signal')
 def handle_signal(data):
-    target = data['target']
-    room = data.get('room')
-    
-    if room and room in rooms:
-        room_data = rooms[room]
-        if target in room_data.get('clients', []):
-            print(f"Forwarding signal from {data['sender']} to {target}")
-            emit('signal', data, room=target)
-        else:
-            print(f"Target {target} not found in room {room}")
-    else:
-        print(f"Room {room} not found or invalid")
+    apply_actions(service.signal(request.sid, data))
+
+@socketio.on('signal_bin')
+@timed('signal_bin')
+def handle_signal_bin(data):
+    apply_actions(service.signal_bin(request.sid, data))
 
 @socketio.on('host_available')
+@timed('host_available')
 def handle_host_available(data):
-    room = data['room']
-    host_id = data['host_id']
-    
-    if room in rooms:
-        rooms[room]['host_id'] = host_id
-        print(f"Host {host_id} available in room {room}")
-        emit('host_available', data, room=room)
+    apply_actions(service.host_available(request.sid, data))
+
+@socketio.on('list_rooms')
+@timed('list_rooms')
+def handle_list_rooms(data=None):
+    apply_actions(service.list_rooms(request.sid, data))
+
+@socketio.on('subscribe_rooms')
+@timed('subscribe_rooms')
+def handle_subscribe_rooms(data=None):
+    apply_actions(service.subscribe_rooms(request.sid, data))
+
+@socketio.on('unsubscribe_rooms')
+@timed('unsubscribe_rooms')
+def handle_unsubscribe_rooms(data=None):
+    apply_actions(service.unsubscribe_rooms(request.sid, data))
+
+@socketio.on('matchmake')
+@timed('matchmake')
+def handle_matchmake(data):
+    apply_actions(service.matchmake(request.sid, data))
+
+@socketio.on('cancel_matchmaking')
+@timed('cancel_matchmaking')
+def handle_cancel_matchmaking(data=None):
+    apply_actions(service.cancel_matchmaking(request.sid, data))
+
+@socketio.on('update_listing')
+@timed('update_listing')
+def handle_update_listing(data):
+    apply_actions(service.update_listing(request.sid, data))
 
 # --- УДАЛЕН БЛОК if __name__ == '__main__': ---
 # Render сам запустит приложение app (WSGI).
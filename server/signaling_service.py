@@ -0,0 +1,550 @@
+# server/signaling_service.py
+# Логика сигнального сервера, не зависящая от режима работы.
+# Обработчики возвращают список действий, а threading (Flask-SocketIO)
+# и asyncio (python-socketio AsyncServer) режимы только применяют их,
+# поэтому контракт событий join/signal/host_available одинаков в обоих режимах.
+#
+# Действия:
+#   ('emit', event, data, to)   - отправить событие sid'у или комнате Socket.IO
+#   ('enter_room', sid, room)   - добавить sid в комнату Socket.IO
+#   ('leave_room', sid, room)   - убрать sid из комнаты Socket.IO
+#   ('disconnect', sid)         - отключить sid (превышение лимита при политике disconnect)
+#   ('close_room', room)        - убрать всех из комнаты Socket.IO (комната вытеснена)
+
+import logging
+import os
+import sqlite3
+
+import metrics
+import signal_codec
+from eviction import create_room_evictor
+from matchmaking import Matchmaker
+from rate_limit import DISCONNECT, create_rate_limiter
+from resume_tokens import create_resume_tokens
+from room_directory import CHANNEL_PREFIX, RoomDirectory, channel
+from room_journal import create_room_journal
+from room_store import create_room_store
+from signaling_log import get_logger
+
+log = get_logger('signaling')
+
+
+class SignalingService:
+    """Обработка событий сигнального сервера"""
+
+    def __init__(self, rooms=None, journal=None, limiter=None, evictor=None, directory=None,
+                 matchmaker=None, tokens=None):
+        self.rooms = rooms if rooms is not None else create_room_store()
+        self.journal = journal if journal is not None else create_room_journal()
+        self.limiter = limiter if limiter is not None else create_rate_limiter()
+        self.evictor = evictor if evictor is not None else create_room_evictor()
+        self.directory = directory if directory is not None else RoomDirectory()
+        self.matchmaker = matchmaker if matchmaker is not None else Matchmaker()
+        self.tokens = tokens if tokens is not None else create_resume_tokens(self._journal_secret())
+        # {room: срок} - комнаты отключившегося хоста, ждущие его resume
+        self.orphaned = {}
+        # {sid: (client_id, room, время выдачи токена)} - токены живых сокетов этого
+        # процесса; sweep() продлевает их, пока сокет подключен
+        self.sessions = {}
+        self.codecs = {}  # {sid: имя бинарного кодека signal}, только для sid этого процесса
+        self._restored_pid = None
+        self._sweeper_pid = None
+        metrics.registry.gauge_callback('signaling_rooms', 'Live rooms', lambda: len(self.rooms))
+        metrics.registry.histogram_callback('signaling_room_clients', 'Connected clients per room',
+                                            (1, 2, 3, 4, 5, 6, 8, 12), self.rooms.room_sizes)
+        metrics.registry.gauge_callback('signaling_listed_rooms', 'Rooms in the public directory',
+                                        lambda: len(self.directory))
+        metrics.registry.gauge_callback('signaling_matchmaking_queued', 'Players waiting for a match',
+                                        lambda: len(self.matchmaker))
+
+    def _journal_secret(self):
+        """Секрет токенов из журнала - токены переживают перезапуск вместе с комнатами"""
+        if self.journal is None:
+            return None
+        try:
+            return self.journal.token_secret()
+        except sqlite3.Error as e:
+            log.error("Room journal error", method='token_secret', error=e)
+            return None
+
+    def restore(self):
+        """Восстановление комнат из журнала (после перезапуска воркера)"""
+        if self.journal is None:
+            return 0
+        rooms = self.journal.load()
+        if not self.tokens.enabled:
+            # Без токенов вернуть комнату хосту нельзя - она только занимала бы имя
+            for room in rooms:
+                self._record('room_deleted', room['name'])
+            if rooms:
+                log.warning("Journal rooms dropped: resume tokens are disabled", dropped=len(rooms))
+            return 0
+        restored = 0
+        for room in rooms:
+            if self.rooms.restore_room(room['name'], room['password'],
+                                       room['host_client_id'], room['members']):
+                self.evictor.touch(room['name'])
+                # Хост вернет комнату resume по токену, выданному до перезапуска
+                self.orphaned[room['name']] = self.tokens.clock() + self.tokens.ttl
+                restored += 1
+        log.info("Rooms restored from journal", restored=restored)
+        return restored
+
+    def _record(self, method, *args):
+        """Запись в журнал; ошибка журнала не должна ломать сигналинг"""
+        if self.journal is None:
+            return
+        try:
+            getattr(self.journal, method)(*args)
+        except sqlite3.Error as e:
+            log.error("Room journal error", method=method, error=e)
+
+    def _throttle(self, event, sid, room=None, reply=None):
+        """
+        None, если событие в пределах лимитов, иначе действия для нарушителя.
+        :param reply: ответ на отброшенный запрос (join, resume, matchmake) - иначе
+            клиент узнал бы об отказе только по таймауту ожидания ответа
+        """
+        exceeded = self.limiter.allow(event, sid, room)
+        if exceeded is None:
+            return None
+        metrics.THROTTLED.inc(event)
+        log.event('throttled', "Rate limit exceeded", logging.WARNING,
+                  type=event, sid=sid, room=room, limit=exceeded)
+        if self.limiter.policy == DISCONNECT:
+            metrics.THROTTLE_DISCONNECTS.inc(event)
+            return [('disconnect', sid)]
+        return [reply] if reply is not None else []
+
+    def claim_sweeper(self):
+        """True один раз на процесс: вызвавший запускает фоновый цикл sweep()"""
+        if not (self.evictor.enabled or self.tokens.enabled) or self._sweeper_pid == os.getpid():
+            return False
+        self._sweeper_pid = os.getpid()
+        return True
+
+    def sweep(self):
+        """Вытеснение неактивных комнат и устаревших участников, продление токенов (фоновый цикл)"""
+        actions = []
+        try:
+            evicted, stale = self.evictor.sweep(self.rooms)
+            for room_name, reason in evicted:
+                if self.rooms.delete_room(room_name):
+                    actions.extend(self._room_removed(room_name))
+                    metrics.ROOMS_EVICTED.inc(reason)
+                    log.info("Room evicted", room=room_name, reason=reason)
+                    actions.append(('close_room', room_name))
+            for room_name, client_id in stale:
+                if self.rooms.remove_member(room_name, client_id):
+                    self._record('member_left', room_name, client_id)
+                    metrics.MEMBERS_EVICTED.inc()
+            actions.extend(self._sweep_orphaned())
+            actions.extend(self._refresh_tokens())
+        except Exception:
+            # Фоновый цикл не должен умирать из-за ошибки хранилища
+            log.error("Room sweep failed", exc_info=True)
+        return actions
+
+    def _sweep_orphaned(self):
+        """Удаление комнат, хост которых не вернулся за время токена возобновления"""
+        actions = []
+        now = self.tokens.clock()
+        for room_name, deadline in list(self.orphaned.items()):
+            if deadline > now:
+                continue
+            del self.orphaned[room_name]
+            room_data = self.rooms.get(room_name)
+            # Хост мог вернуться через другой воркер - тогда у комнаты снова есть host_id
+            if room_data is None or room_data.get('host_id') is not None:
+                continue
+            if self.rooms.delete_room(room_name):
+                actions.extend(self._room_removed(room_name))
+                metrics.ROOMS_EVICTED.inc('host_gone')
+                log.info("Room deleted (host did not resume)", room=room_name)
+                actions.append(('close_room', room_name))
+        return actions
+
+    def _issue_token(self, sid, client_id, room_name):
+        """Токен возобновления для sid; запоминается для продления в sweep()"""
+        token = self.tokens.issue(client_id, room_name)
+        if token is not None:
+            self.sessions[sid] = (client_id, room_name, self.tokens.clock())
+        return token
+
+    def _refresh_tokens(self):
+        """
+        Новые токены живым сокетам, чьи токены прожили половину TTL: срок
+        токена отсчитывается от последнего продления, а не от входа в комнату
+        """
+        actions = []
+        if not self.tokens.enabled:
+            return actions
+        now = self.tokens.clock()
+        for sid, (client_id, room_name, issued_at) in list(self.sessions.items()):
+            if now - issued_at < self.tokens.ttl / 2:
+                continue
+            if not self.rooms.has_client(room_name, sid):
+                # Комната удалена или сокет вышел из нее
+                del self.sessions[sid]
+                continue
+            actions.append(('emit', 'resume_token', {
+                'room': room_name,
+                'resume_token': self._issue_token(sid, client_id, room_name)
+            }, sid))
+        return actions
+
+    def connect(self, sid, auth=None):
+        # Восстанавливаем комнаты в каждом процессе-воркере один раз:
+        # при preload_app мастер импортирует модуль, но событий не обрабатывает
+        if self._restored_pid != os.getpid():
+            self._restored_pid = os.getpid()
+            self.restore()
+        metrics.OPEN_SOCKETS.inc()
+        log.event('connect', "Client connected", sid=sid)
+        # Клиент перечисляет поддерживаемые кодеки в auth при подключении
+        codecs = auth.get('codecs') if isinstance(auth, dict) else None
+        if signal_codec.available() and codecs and signal_codec.CODEC_NAME in codecs:
+            self.codecs[sid] = signal_codec.CODEC_NAME
+            return [('emit', 'codec', {'codec': signal_codec.CODEC_NAME}, sid)]
+        return []
+
+    def _room_removed(self, room_name):
+        """Очистка вспомогательных структур удаленной комнаты; изменения каталога"""
+        self.limiter.forget_room(room_name)
+        self.evictor.forget(room_name)
+        self._record('room_deleted', room_name)
+        return _directory_diff(self.directory.unpublish(room_name))
+
+    def disconnect(self, sid):
+        metrics.OPEN_SOCKETS.dec()
+        log.event('disconnect', "Client disconnected", sid=sid)
+        self.limiter.forget_sid(sid)
+        self.matchmaker.cancel(sid)
+        self.codecs.pop(sid, None)
+        session = self.sessions.pop(sid, None)
+        actions = []
+        # С токенами возобновления комната хоста ждет его resume, пока действует его токен
+        keep_hosted = self.tokens.enabled
+        for room_name in self.rooms.remove_sid(sid, keep_hosted):
+            if keep_hosted:
+                issued_at = session[2] if session and session[1] == room_name else self.tokens.clock()
+                self.orphaned[room_name] = issued_at + self.tokens.ttl
+                log.info("Host disconnected, room kept for resume", room=room_name, ttl=self.tokens.ttl)
+                continue
+            actions.extend(self._room_removed(room_name))
+            log.info("Room deleted (host disconnected)", room=room_name)
+        for diff in self.directory.remove_sid(sid):
+            actions.extend(_directory_diff(diff))
+        return actions
+
+    def join(self, sid, data):
+        room_name = data.get('room')
+        password = data.get('password', '')
+        is_host = data.get('is_host', False)
+        client_id = data.get('client_id')
+
+        log.event('join', "Join request", room=room_name, is_host=is_host, has_password=bool(password))
+
+        if not room_name:
+            return [_error(sid, 'Room name is required')]
+        if room_name.startswith(CHANNEL_PREFIX):
+            return [_error(sid, 'Room name is reserved')]
+
+        room_data = self.rooms.get(room_name)
+        # Корзина комнаты - только для существующих комнат, иначе перебором имен
+        # можно было бы заполнить память корзинами
+        throttled = self._throttle('join', sid, room_name if room_data is not None else None,
+                                   _error(sid, 'Rate limited'))
+        if throttled is not None:
+            return throttled
+
+        if is_host:
+            # Роль хоста существующей комнаты возвращается только событием resume
+            # по токену: client_id хоста не секрет (он рассылается в host_available),
+            # и по client_id с паролем ее мог бы перехватить любой участник
+            if room_data is not None or not self.rooms.create_room(room_name, sid, password, client_id):
+                return [_error(sid, 'Room already exists')]
+            self._record('room_created', room_name, password, client_id)
+            self.evictor.touch(room_name)
+            log.info("Room created", room=room_name, sid=sid)
+            diff = self.directory.publish(room_name, data.get('listing'), bool(password), sid)
+            return _joined(sid, room_name, 'Room created successfully',
+                           token=self._issue_token(sid, client_id, room_name)) + _directory_diff(diff)
+
+        if room_data is None:
+            return [_error(sid, 'Room not found')]
+
+        required_password = room_data.get('password', '')
+        if required_password and password != required_password:
+            return [_error(sid, 'Invalid password')]
+
+        # host_id в joined - client_id хоста; занять им место (и получить токен
+        # на него) нельзя, иначе resume по этому токену отдал бы роль хоста
+        if client_id and client_id == room_data.get('host_client_id'):
+            return [_error(sid, 'Client id already in use')]
+        # Место участника (и его signal, и токен на его client_id) возвращается
+        # только resume по токену: client_id не секрет - он приходит в sender
+        # сигналов и в players подбора
+        members = room_data.get('members', {})
+        known = bool(client_id) and client_id in members
+        if known and members[client_id] != sid:
+            return [_error(sid, 'Client id already in use')]
+        self.rooms.add_client(room_name, sid, client_id)
+        if client_id and not known:
+            self._record('member_joined', room_name, client_id)
+        self.evictor.touch(room_name)
+        log.event('join', "Client joined room", room=room_name, sid=sid)
+        # Хост уже в комнате - клиент сразу получает его id, не дожидаясь host_available
+        host_id = room_data.get('host_id')
+        host_id = (room_data.get('host_client_id') or host_id) if host_id in room_data['clients'] else None
+        return _joined(sid, room_name, 'Joined room successfully',
+                       token=self._issue_token(sid, client_id, room_name), host_id=host_id) \
+            + _directory_diff(self.directory.player_joined(room_name, sid))
+
+    def resume(self, sid, data):
+        """
+        Возвращение в комнату после обрыва сокета по токену из joined/matched/resumed:
+        {'room', 'client_id', 'token', 'listing'}. Место участника и роль хоста
+        восстанавливаются за один ответ resumed, без повторного join.
+        """
+        room_name = data.get('room')
+        client_id = data.get('client_id')
+        room_data = self.rooms.get(room_name) if room_name else None
+        throttled = self._throttle('resume', sid, room_name if room_data is not None else None,
+                                   _resume_error(sid, 'Rate limited'))
+        if throttled is not None:
+            return throttled
+
+        if room_data is None:
+            return [_resume_error(sid, 'Room not found')]
+        if not self.tokens.verify(data.get('token'), client_id, room_name):
+            log.event('resume', "Resume rejected", logging.WARNING, room=room_name, sid=sid)
+            return [_resume_error(sid, 'Invalid or expired resume token')]
+
+        self.rooms.add_client(room_name, sid, client_id)
+        self.evictor.touch(room_name)
+        host_client_id = room_data.get('host_client_id')
+        is_host = client_id == host_client_id
+        actions = [('enter_room', sid, room_name)]
+        if is_host:
+            self.rooms.set_host(room_name, sid)
+            self.orphaned.pop(room_name, None)
+            diff = self.directory.publish(room_name, data.get('listing'), bool(room_data.get('password')), sid) \
+                or self.directory.player_joined(room_name, sid)
+            # Клиенты, потерявшие соединение с хостом, пока его не было, переподключаются к нему
+            actions.append(('emit', 'host_available',
+                            {'host_id': client_id, 'room': room_name, 'resumed': True}, room_name))
+        else:
+            diff = self.directory.player_joined(room_name, sid)
+        log.event('resume', "Session resumed", room=room_name, sid=sid, is_host=is_host)
+        actions.append(('emit', 'resumed', {
+            'status': 'success',
+            'room': room_name,
+            'is_host': is_host,
+            # client_id хоста - адресат signal; None, если хост комнаты неизвестен
+            'host_id': host_client_id or room_data.get('host_id'),
+            'resume_token': self._issue_token(sid, client_id, room_name)
+        }, sid))
+        return actions + _directory_diff(diff)
+
+    def signal(self, sid, data):
+        room = data.get('room')
+        # Лимит проверяется до любой работы с комнатой: флуд должен стоить минимум
+        throttled = self._throttle('signal', sid, room if room and room in self.rooms else None)
+        if throttled is not None:
+            return throttled
+        target_sid = self._route(room, data['target'], data['sender'])
+        if target_sid is None:
+            return []
+        return [('emit', 'signal', data, target_sid)]
+
+    def signal_bin(self, sid, blob):
+        """signal в формате signal_codec: адресат определяется без распаковки SDP"""
+        try:
+            sender, target, room, _, _ = signal_codec.decode_envelope(blob)
+        except Exception:
+            log.event('signal_dropped', "Malformed binary signal", logging.WARNING, sid=sid)
+            return []
+        throttled = self._throttle('signal', sid, room if room and room in self.rooms else None)
+        if throttled is not None:
+            return throttled
+        target_sid = self._route(room, target, sender)
+        if target_sid is None:
+            return []
+        if self.codecs.get(target_sid) == signal_codec.CODEC_NAME:
+            return [('emit', 'signal_bin', blob, target_sid)]
+        # Адресат без кодека (старый клиент или sid другого воркера) получает JSON
+        try:
+            data = signal_codec.decode_signal(blob)
+        except Exception:
+            log.event('signal_dropped', "Malformed binary signal body", logging.WARNING, sid=sid)
+            return []
+        return [('emit', 'signal', data, target_sid)]
+
+    def _route(self, room, target, sender):
+        """sid адресата signal или None"""
+        if room and room in self.rooms:
+            self.evictor.touch(room)
+            # target - sid или client_id участника (client_id переживает переподключение)
+            target_sid = self.rooms.resolve(room, target)
+            if target_sid is not None:
+                log.event('signal', "Forwarding signal", sender=sender, target=target)
+                return target_sid
+            log.event('signal_dropped', "Signal target not found", logging.WARNING, target=target, room=room)
+        else:
+            log.event('signal_dropped', "Signal room not found or invalid", logging.WARNING, room=room)
+        return None
+
+    def host_available(self, sid, data):
+        """
+        Хост объявляет себя клиентам комнаты: {'room', 'host_id'}. Принимается
+        только от текущего хоста; роль хоста здесь не назначается (см. resume).
+        """
+        room = data.get('room')
+        room_data = self.rooms.get(room) if room else None
+        throttled = self._throttle('host_available', sid, room if room_data is not None else None)
+        if throttled is not None:
+            return throttled
+        if room_data is None:
+            return []
+
+        host_client_id = room_data.get('host_client_id')
+        is_host = room_data.get('host_id') == sid \
+            or (host_client_id is not None and room_data.get('members', {}).get(host_client_id) == sid)
+        # host_id - адресат signal: client_id или sid самого хоста
+        if not is_host or data.get('host_id') not in (host_client_id or sid, sid):
+            log.event('host_available', "Host announcement rejected", logging.WARNING, room=room, sid=sid)
+            return []
+        self.evictor.touch(room)
+        log.event('host_available', "Host available", host_id=data['host_id'], room=room)
+        return [('emit', 'host_available', {'host_id': data['host_id'], 'room': room}, room)]
+
+    def list_rooms(self, sid, data):
+        """Страница каталога: {'game', 'mode', 'min_free_seats', 'cursor', 'limit'}"""
+        data = data or {}
+        throttled = self._throttle('list_rooms', sid)
+        if throttled is not None:
+            return throttled
+        return [self._rooms_page(sid, data)]
+
+    def subscribe_rooms(self, sid, data):
+        """Подписка на изменения каталога игры (game пустой - все игры) и первая страница"""
+        data = data or {}
+        throttled = self._throttle('list_rooms', sid)
+        if throttled is not None:
+            return throttled
+        return [('enter_room', sid, channel(data.get('game'))), self._rooms_page(sid, data)]
+
+    def unsubscribe_rooms(self, sid, data):
+        return [('leave_room', sid, channel((data or {}).get('game')))]
+
+    def update_listing(self, sid, data):
+        """Хост меняет описание комнаты: {'room', 'mode', 'max_players', 'open'}"""
+        room = data.get('room')
+        throttled = self._throttle('update_listing', sid, room if room in self.directory else None)
+        if throttled is not None:
+            return throttled
+        room_data = self.rooms.get(room) if room else None
+        if room_data is None or room_data.get('host_id') != sid:
+            return []
+        diff = self.directory.update(room, mode=data.get('mode'), max_players=data.get('max_players'),
+                                     open=data.get('open'))
+        return _directory_diff(diff)
+
+    def matchmake(self, sid, data):
+        """Постановка в очередь подбора: {'game', 'mode', 'deck_size', 'players_count', 'client_id', 'can_host'}"""
+        throttled = self._throttle('matchmake', sid,
+                                   reply=('emit', 'match_queued', {'status': 'error', 'message': 'Rate limited'}, sid))
+        if throttled is not None:
+            return throttled
+        try:
+            key = self.matchmaker.bucket_key(data)
+        except ValueError as e:
+            return [('emit', 'match_queued', {'status': 'error', 'message': str(e)}, sid)]
+
+        match, queued = self.matchmaker.enqueue(sid, data.get('client_id'), key, data.get('can_host', True))
+        if match is None:
+            log.event('matchmake', "Player queued", sid=sid, bucket=key, queued=queued)
+            return [('emit', 'match_queued', {'status': 'queued', 'queued': queued, 'needed': key[3]}, sid)]
+        return self._start_match(match)
+
+    def cancel_matchmaking(self, sid, data=None):
+        cancelled = self.matchmaker.cancel(sid)
+        return [('emit', 'match_queued', {'status': 'cancelled' if cancelled else 'not_queued'}, sid)]
+
+    def _start_match(self, match):
+        """Комната для собранного матча: хост и игроки добавляются сервером, без join"""
+        host = match.host
+        host_id = host.client_id or host.sid
+        self.rooms.create_room(match.room, host.sid, '', host.client_id)
+        self._record('room_created', match.room, '', host.client_id)
+        for ticket in match.tickets:
+            if ticket is not host:
+                self.rooms.add_client(match.room, ticket.sid, ticket.client_id)
+                if ticket.client_id:
+                    self._record('member_joined', match.room, ticket.client_id)
+        self.evictor.touch(match.room)
+
+        game = match.key[0]
+        now = self.matchmaker.clock()
+        metrics.MATCHES.inc(game)
+        players = [ticket.client_id or ticket.sid for ticket in match.tickets]
+        actions = []
+        for ticket in match.tickets:
+            metrics.MATCH_WAIT.observe(game, now - ticket.enqueued_at)
+            actions.append(('enter_room', ticket.sid, match.room))
+            actions.append(('emit', 'matched', {
+                'room': match.room,
+                'host_id': host_id,
+                'is_host': ticket is host,
+                'players': players,
+                'params': match.params,
+                'resume_token': self._issue_token(ticket.sid, ticket.client_id, match.room)
+            }, ticket.sid))
+        # Хост уже известен - клиенты сразу начинают подключение к нему
+        actions.append(('emit', 'host_available', {'host_id': host_id, 'room': match.room}, match.room))
+        log.info("Match assembled", room=match.room, bucket=match.key, host=host_id)
+        return actions
+
+    def _rooms_page(self, sid, data):
+        rooms, next_cursor = self.directory.query(data.get('game'), data.get('mode'),
+                                                  data.get('min_free_seats', 1),
+                                                  data.get('cursor') or 0, data.get('limit', 20))
+        return ('emit', 'rooms', {
+            'game': data.get('game'),
+            'mode': data.get('mode'),
+            'cursor': data.get('cursor'),
+            'rooms': rooms,
+            'next_cursor': next_cursor
+        }, sid)
+
+
+def _directory_diff(diff):
+    """Рассылка изменения каталога подписчикам игры и подписчикам всех игр"""
+    if diff is None:
+        return []
+    game = diff['room'].get('game')
+    actions = [('emit', 'rooms_diff', diff, channel(None))]
+    if game:
+        actions.append(('emit', 'rooms_diff', diff, channel(game)))
+    return actions
+
+
+def _joined(sid, room_name, message, token=None, host_id=None):
+    payload = {'status': 'success', 'message': message, 'room': room_name}
+    if token:
+        payload['resume_token'] = token
+    if host_id:
+        payload['host_id'] = host_id
+    return [
+        ('enter_room', sid, room_name),
+        ('emit', 'joined', payload, sid)
+    ]
+
+
+def _error(sid, message):
+    return ('emit', 'joined', {'status': 'error', 'message': message}, sid)
+
+
+def _resume_error(sid, message):
+    return ('emit', 'resumed', {'status': 'error', 'message': message}, sid)
@@ -0,0 +1,75 @@
+# server/tests/conftest.py
+# Тесты сигнального сервера: модули server/ импортируются по имени, как в
+# signaling_server.py и asgi.py. Сокеты не нужны - SignalingService
+# возвращает список действий, который тесты и разбирают.
+#
+# Запуск: python -m pytest -q server/tests
+import os
+import sys
+
+import pytest
+
+server_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if server_root not in sys.path:
+    sys.path.insert(0, server_root)
+
+# Фабрики create_*() читают окружение при создании сервиса
+os.environ['ROOM_JOURNAL_PATH'] = ''
+
+from eviction import RoomEvictor
+from rate_limit import RateLimiter
+from resume_tokens import ResumeTokens
+from room_store import create_room_store
+from signaling_service import SignalingService
+
+
+class FakeClock:
+    """Управляемое время для корзин, токенов и вытеснения"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def emitted(actions, event, to=None):
+    """Данные всех emit события event (и адресата to, если задан)"""
+    return [action[2] for action in actions
+            if action[0] == 'emit' and action[1] == event and (to is None or action[3] == to)]
+
+
+def reply(actions, event):
+    """Единственный ответ event отправителю"""
+    replies = emitted(actions, event)
+    assert len(replies) == 1, actions
+    return replies[0]
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_service(clock):
+    """Сервис с хранилищем в памяти, без лимитов и вытеснения, токены по clock"""
+    def make(journal=None, tokens=None, limiter=None, evictor=None, store='memory://'):
+        service = SignalingService(
+            rooms=create_room_store(store, shards=4),
+            journal=journal,
+            limiter=limiter if limiter is not None else RateLimiter(),
+            evictor=evictor if evictor is not None else RoomEvictor(idle_ttl=0, empty_ttl=0, member_ttl=0),
+            tokens=tokens if tokens is not None else ResumeTokens('test-secret', ttl=120, clock=clock)
+        )
+        service.restore()
+        return service
+    return make
+
+
+@pytest.fixture
+def service(make_service):
+    return make_service()
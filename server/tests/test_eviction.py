@@ -0,0 +1,69 @@
+# server/tests/test_eviction.py
+from conftest import FakeClock
+from eviction import RoomEvictor
+from room_registry import RoomRegistry
+
+
+def make(**ttls):
+    clock = FakeClock()
+    return RoomEvictor(tick=1, clock=clock, **ttls), RoomRegistry(), clock
+
+
+def test_idle_room_without_host_is_evicted():
+    evictor, rooms, clock = make(idle_ttl=10, empty_ttl=0, member_ttl=0)
+    rooms.create_room('hosted', 'host-sid')
+    rooms.create_room('orphan', 'host-sid-2')
+    rooms.add_client('orphan', 'guest-sid')
+    rooms.rooms['orphan']['host_id'] = None
+    evictor.touch('hosted')
+    evictor.touch('orphan')
+    clock.advance(12)
+    evicted, _ = evictor.sweep(rooms)
+    # Живой хост ведет партию по P2P - комната не простаивает
+    assert evicted == [('orphan', 'idle')]
+    clock.advance(12)
+    assert evictor.sweep(rooms) == ([], [])
+
+
+def test_touch_postpones_idle_eviction():
+    evictor, rooms, clock = make(idle_ttl=10, empty_ttl=0, member_ttl=0)
+    rooms.restore_room('room')
+    rooms.add_client('room', 'guest-sid')
+    evictor.touch('room')
+    clock.advance(8)
+    evictor.touch('room')
+    clock.advance(4)
+    assert evictor.sweep(rooms) == ([], [])
+    clock.advance(8)
+    assert evictor.sweep(rooms)[0] == [('room', 'idle')]
+
+
+def test_empty_room_is_evicted():
+    evictor, rooms, clock = make(idle_ttl=0, empty_ttl=5, member_ttl=0)
+    rooms.restore_room('room', host_client_id='host', member_client_ids=['host'])
+    evictor.touch('room')
+    evicted = []
+    for _ in range(3):
+        clock.advance(5)
+        evicted += evictor.sweep(rooms)[0]
+    assert evicted == [('room', 'empty')]
+
+
+def test_disconnected_member_goes_stale_after_two_checks():
+    evictor, rooms, clock = make(idle_ttl=0, empty_ttl=0, member_ttl=5)
+    rooms.create_room('room', 'host-sid', '', 'host')
+    rooms.add_client('room', 'guest-sid', 'guest')
+    rooms.remove_sid('guest-sid')
+    evictor.touch('room')
+    clock.advance(5)
+    assert evictor.sweep(rooms) == ([], [])
+    clock.advance(5)
+    assert evictor.sweep(rooms) == ([], [('room', 'guest')])
+
+
+def test_disabled_evictor_does_nothing():
+    evictor, rooms, clock = make(idle_ttl=0, empty_ttl=0, member_ttl=0)
+    rooms.restore_room('room')
+    evictor.touch('room')
+    clock.advance(10 ** 6)
+    assert not evictor.enabled and evictor.sweep(rooms) == ([], [])
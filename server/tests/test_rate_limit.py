@@ -0,0 +1,47 @@
+# server/tests/test_rate_limit.py
+import pytest
+
+from conftest import FakeClock
+from rate_limit import RateLimiter, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits('signal=20/60, join=1/5,list_rooms=2') == {
+        'signal': (20.0, 60.0), 'join': (1.0, 5.0), 'list_rooms': (2.0, 2.0)}
+    assert parse_limits('join=0/5,bad') == {}
+
+
+def test_sid_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter({'join': (1, 2)}, clock=clock)
+    assert limiter.allow('join', 'sid') is None
+    assert limiter.allow('join', 'sid') is None
+    assert limiter.allow('join', 'sid') == 'sid'
+    assert limiter.allow('join', 'other-sid') is None
+    clock.advance(1)
+    assert limiter.allow('join', 'sid') is None
+    assert limiter.allow('join', 'sid') == 'sid'
+
+
+def test_room_bucket_is_shared_by_senders():
+    clock = FakeClock()
+    limiter = RateLimiter(room_limits={'signal': (1, 2)}, clock=clock)
+    assert limiter.allow('signal', 'a', 'room') is None
+    assert limiter.allow('signal', 'b', 'room') is None
+    assert limiter.allow('signal', 'c', 'room') == 'room'
+    assert limiter.allow('signal', 'c', 'other-room') is None
+    assert limiter.allow('signal', 'c') is None  # без комнаты лимит комнаты не действует
+
+
+def test_forget_resets_buckets():
+    limiter = RateLimiter({'join': (1, 1)}, {'join': (1, 1)}, clock=FakeClock())
+    limiter.allow('join', 'sid', 'room')
+    limiter.forget_sid('sid')
+    assert limiter.allow('join', 'sid') is None
+    limiter.forget_room('room')
+    assert limiter.allow('join', 'other-sid', 'room') is None
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        RateLimiter(policy='ignore')
@@ -0,0 +1,38 @@
+# server/tests/test_resume_tokens.py
+from conftest import FakeClock
+from resume_tokens import ResumeTokens
+
+
+def test_token_is_bound_to_client_and_room():
+    tokens = ResumeTokens('secret', ttl=60, clock=FakeClock())
+    token = tokens.issue('client', 'room')
+    assert tokens.verify(token, 'client', 'room')
+    assert not tokens.verify(token, 'other', 'room')
+    assert not tokens.verify(token, 'client', 'other-room')
+    assert not ResumeTokens('other-secret', ttl=60, clock=tokens.clock).verify(token, 'client', 'room')
+
+
+def test_token_expires():
+    clock = FakeClock()
+    tokens = ResumeTokens('secret', ttl=60, clock=clock)
+    token = tokens.issue('client', 'room')
+    clock.advance(60)
+    assert tokens.verify(token, 'client', 'room')
+    clock.advance(1)
+    assert not tokens.verify(token, 'client', 'room')
+
+
+def test_forged_and_malformed_tokens():
+    clock = FakeClock()
+    tokens = ResumeTokens('secret', ttl=60, clock=clock)
+    expires, _, signature = tokens.issue('client', 'room').partition('.')
+    assert not tokens.verify(f"{int(expires) + 3600}.{signature}", 'client', 'room')
+    for token in (None, '', 'abc', 'abc.def', 42):
+        assert not tokens.verify(token, 'client', 'room')
+
+
+def test_disabled_tokens():
+    tokens = ResumeTokens('secret', ttl=0, clock=FakeClock())
+    assert not tokens.enabled
+    assert tokens.issue('client', 'room') is None
+    assert tokens.issue(None, 'room') is None
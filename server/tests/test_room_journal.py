@@ -0,0 +1,79 @@
+# server/tests/test_room_journal.py
+# Журнал комнат и восстановление комнат после перезапуска сервера.
+import pytest
+
+from conftest import reply
+from resume_tokens import ResumeTokens
+from room_journal import RoomJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = RoomJournal(str(tmp_path / 'rooms.sqlite3'))
+    yield journal
+    journal.close()
+
+
+def test_journal_records_rooms_and_members(journal):
+    journal.room_created('room', 'secret', 'host')
+    journal.member_joined('room', 'guest')
+    journal.member_joined('room', 'other')
+    journal.member_left('room', 'other')
+    journal.room_created('gone', '', 'host-2')
+    journal.room_deleted('gone')
+    assert journal.load() == [{'name': 'room', 'password': 'secret', 'host_client_id': 'host',
+                               'members': ['guest']}]
+
+
+def test_token_secret_is_stable(journal, tmp_path):
+    secret = journal.token_secret()
+    assert secret and journal.token_secret() == secret
+    reopened = RoomJournal(str(tmp_path / 'rooms.sqlite3'))
+    assert reopened.token_secret() == secret
+    reopened.close()
+
+
+def test_restart_restores_rooms_for_token_holders(make_service, journal, clock):
+    before = make_service(journal=journal,
+                          tokens=ResumeTokens(journal.token_secret(), ttl=120, clock=clock))
+    host_token = reply(before.join('host-sid', {'room': 'room', 'is_host': True, 'client_id': 'host',
+                                                'password': 'secret'}), 'joined')['resume_token']
+    guest_token = reply(before.join('guest-sid', {'room': 'room', 'client_id': 'guest',
+                                                  'password': 'secret'}), 'joined')['resume_token']
+
+    # Новый процесс: пустое хранилище, тот же журнал и его секрет
+    after = make_service(journal=journal,
+                         tokens=ResumeTokens(journal.token_secret(), ttl=120, clock=clock))
+    room = after.rooms.get('room')
+    assert room['host_client_id'] == 'host' and set(room['members']) == {'guest'}
+    assert 'room' in after.orphaned
+
+    # Без токена роль хоста и место участника не вернуть
+    assert reply(after.join('evil-sid', {'room': 'room', 'is_host': True, 'client_id': 'host',
+                                         'password': 'secret'}), 'joined')['status'] == 'error'
+    assert reply(after.join('evil-sid', {'room': 'room', 'client_id': 'guest',
+                                         'password': 'secret'}), 'joined')['status'] == 'error'
+
+    host = reply(after.resume('host-sid-2', {'room': 'room', 'client_id': 'host', 'token': host_token}),
+                 'resumed')
+    assert host['status'] == 'success' and host['is_host']
+    guest = reply(after.resume('guest-sid-2', {'room': 'room', 'client_id': 'guest', 'token': guest_token}),
+                  'resumed')
+    assert guest['status'] == 'success' and guest['host_id'] == 'host'
+    assert 'room' not in after.orphaned
+
+
+def test_restored_room_is_deleted_if_host_never_returns(make_service, journal, clock):
+    before = make_service(journal=journal)
+    before.join('host-sid', {'room': 'room', 'is_host': True, 'client_id': 'host'})
+    after = make_service(journal=journal)
+    clock.advance(121)
+    assert ('close_room', 'room') in after.sweep()
+    assert 'room' not in after.rooms and journal.load() == []
+
+
+def test_restore_skipped_without_tokens(make_service, journal, clock):
+    journal.room_created('room', '', 'host')
+    service = make_service(journal=journal, tokens=ResumeTokens('test-secret', ttl=0, clock=clock))
+    assert 'room' not in service.rooms
+    assert journal.load() == []
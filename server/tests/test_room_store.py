@@ -0,0 +1,74 @@
+# server/tests/test_room_store.py
+# Общий контракт хранилищ комнат: шарды в памяти и RedisRoomStore (LocalRedis).
+import pytest
+
+from room_registry import RoomRegistry
+from room_store import ShardedRoomStore, create_room_store
+
+
+@pytest.fixture(params=['memory://', 'local://'])
+def rooms(request):
+    return create_room_store(request.param, shards=4)
+
+
+def test_create_and_join(rooms):
+    assert rooms.create_room('room', 'host-sid', 'secret', 'host')
+    assert not rooms.create_room('room', 'other-sid')
+    assert rooms.add_client('room', 'guest-sid', 'guest')
+    room = rooms.get('room')
+    assert room['host_id'] == 'host-sid' and room['host_client_id'] == 'host'
+    assert room['password'] == 'secret'
+    assert room['clients'] == {'host-sid', 'guest-sid'}
+    assert room['members'] == {'host': 'host-sid', 'guest': 'guest-sid'}
+    assert len(rooms) == 1 and 'room' in rooms
+
+
+def test_resolve_by_sid_and_client_id(rooms):
+    rooms.create_room('room', 'host-sid', '', 'host')
+    rooms.add_client('room', 'guest-sid', 'guest')
+    assert rooms.resolve('room', 'guest') == 'guest-sid'
+    assert rooms.resolve('room', 'host-sid') == 'host-sid'
+    rooms.remove_sid('guest-sid')
+    assert rooms.resolve('room', 'guest') is None
+
+
+def test_host_disconnect_deletes_room(rooms):
+    rooms.create_room('room', 'host-sid', '', 'host')
+    rooms.add_client('room', 'guest-sid', 'guest')
+    assert rooms.remove_sid('host-sid') == ['room']
+    assert 'room' not in rooms
+
+
+def test_host_disconnect_keeps_room_for_resume(rooms):
+    rooms.create_room('room', 'host-sid', '', 'host')
+    assert rooms.remove_sid('host-sid', keep_hosted=True) == ['room']
+    room = rooms.get('room')
+    assert room['host_id'] is None and room['host_client_id'] == 'host'
+    assert rooms.add_client('room', 'host-sid-2', 'host') and rooms.set_host('room', 'host-sid-2')
+    assert rooms.get('room')['members']['host'] == 'host-sid-2'
+
+
+def test_restore_room_without_sockets(rooms):
+    assert rooms.restore_room('room', 'secret', 'host', ['host', 'guest'])
+    room = rooms.get('room')
+    assert room['host_id'] is None and room['clients'] == set()
+    assert set(room['members']) == {'host', 'guest'}
+    assert rooms.resolve('room', 'guest') is None
+
+
+def test_remove_member_only_when_disconnected(rooms):
+    rooms.create_room('room', 'host-sid', '', 'host')
+    rooms.add_client('room', 'guest-sid', 'guest')
+    assert not rooms.remove_member('room', 'guest')
+    rooms.remove_sid('guest-sid')
+    assert rooms.remove_member('room', 'guest')
+    assert 'guest' not in rooms.get('room')['members']
+
+
+def test_sharded_store_spreads_rooms():
+    rooms = ShardedRoomStore([RoomRegistry() for _ in range(4)])
+    for n in range(40):
+        rooms.create_room(f"room-{n}", f"sid-{n}")
+    assert len(rooms) == 40
+    assert sum(1 for shard in rooms.shards if len(shard)) > 1
+    assert rooms.remove_sid('sid-7') == ['room-7'] and len(rooms) == 39
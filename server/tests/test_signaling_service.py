@@ -0,0 +1,161 @@
+# server/tests/test_signaling_service.py
+# Вход в комнату, возобновление сессии и попытки захвата чужого места.
+from conftest import emitted, reply
+
+from rate_limit import RateLimiter
+from resume_tokens import ResumeTokens
+
+
+def create(service, sid='host-sid', room='room', client_id='host', password=''):
+    """Комната с хостом; токен хоста"""
+    joined = reply(service.join(sid, {'room': room, 'is_host': True, 'client_id': client_id,
+                                      'password': password}), 'joined')
+    assert joined['status'] == 'success'
+    return joined.get('resume_token')
+
+
+def join(service, sid, client_id, room='room', password=''):
+    return reply(service.join(sid, {'room': room, 'client_id': client_id, 'password': password}), 'joined')
+
+
+def resume(service, sid, client_id, token, room='room'):
+    return reply(service.resume(sid, {'room': room, 'client_id': client_id, 'token': token}), 'resumed')
+
+
+def test_join_reports_live_host_and_issues_token(service):
+    create(service)
+    joined = join(service, 'guest-sid', 'guest')
+    assert joined['status'] == 'success'
+    assert joined['host_id'] == 'host'
+    assert service.tokens.verify(joined['resume_token'], 'guest', 'room')
+
+
+def test_join_checks_password(service):
+    create(service, password='secret')
+    assert join(service, 'guest-sid', 'guest', password='wrong')['message'] == 'Invalid password'
+    assert join(service, 'guest-sid', 'guest', password='secret')['status'] == 'success'
+
+
+def test_host_join_cannot_take_over_existing_room(service):
+    create(service, password='secret')
+    # client_id хоста публичен (host_available), пароль знает любой участник
+    hijack = reply(service.join('evil-sid', {'room': 'room', 'is_host': True, 'client_id': 'host',
+                                             'password': 'secret'}), 'joined')
+    assert hijack == {'status': 'error', 'message': 'Room already exists'}
+    assert service.rooms.get('room')['host_id'] == 'host-sid'
+
+
+def test_host_join_after_host_disconnect_needs_token(service):
+    token = create(service)
+    service.disconnect('host-sid')
+    hijack = reply(service.join('evil-sid', {'room': 'room', 'is_host': True, 'client_id': 'host'}), 'joined')
+    assert hijack['status'] == 'error'
+    resumed = resume(service, 'host-sid-2', 'host', token)
+    assert resumed['status'] == 'success' and resumed['is_host']
+    assert service.rooms.get('room')['host_id'] == 'host-sid-2'
+
+
+def test_join_with_host_client_id_is_rejected(service):
+    create(service)
+    assert join(service, 'evil-sid', 'host')['message'] == 'Client id already in use'
+    service.disconnect('host-sid')
+    assert join(service, 'evil-sid', 'host')['message'] == 'Client id already in use'
+
+
+def test_dropped_member_seat_returns_only_through_resume(service):
+    create(service)
+    token = join(service, 'guest-sid', 'guest')['resume_token']
+    service.disconnect('guest-sid')
+    # client_id участника виден в sender сигналов и в players подбора
+    taken = join(service, 'evil-sid', 'guest')
+    assert taken == {'status': 'error', 'message': 'Client id already in use'}
+    assert 'evil-sid' not in service.rooms.get('room')['clients']
+    resumed = resume(service, 'guest-sid-2', 'guest', token)
+    assert resumed['status'] == 'success' and not resumed['is_host']
+    assert service.rooms.resolve('room', 'guest') == 'guest-sid-2'
+
+
+def test_repeated_join_from_same_sid_succeeds(service):
+    create(service)
+    join(service, 'guest-sid', 'guest')
+    assert join(service, 'guest-sid', 'guest')['status'] == 'success'
+
+
+def test_host_available_only_from_host(service):
+    create(service)
+    join(service, 'guest-sid', 'guest')
+    assert service.host_available('guest-sid', {'room': 'room', 'host_id': 'guest'}) == []
+    assert service.host_available('outsider-sid', {'room': 'room', 'host_id': 'outsider'}) == []
+    assert service.host_available('host-sid', {'room': 'room', 'host_id': 'someone-else'}) == []
+    room = service.rooms.get('room')
+    assert room['host_id'] == 'host-sid' and room['host_client_id'] == 'host'
+    announced = emitted(service.host_available('host-sid', {'room': 'room', 'host_id': 'host'}),
+                        'host_available', 'room')
+    assert announced == [{'host_id': 'host', 'room': 'room'}]
+
+
+def test_member_token_never_grants_host_role(service):
+    create(service)
+    token = join(service, 'guest-sid', 'guest')['resume_token']
+    service.host_available('guest-sid', {'room': 'room', 'host_id': 'guest'})
+    service.disconnect('guest-sid')
+    resumed = resume(service, 'guest-sid-2', 'guest', token)
+    assert resumed['status'] == 'success' and not resumed['is_host']
+
+
+def test_outsider_cannot_update_listing(service):
+    create(service)
+    service.host_available('outsider-sid', {'room': 'room', 'host_id': 'outsider'})
+    assert service.update_listing('outsider-sid', {'room': 'room', 'open': False}) == []
+
+
+def test_resume_rejects_foreign_and_expired_tokens(service, clock):
+    create(service)
+    token = join(service, 'guest-sid', 'guest')['resume_token']
+    service.disconnect('guest-sid')
+    assert resume(service, 'other-sid', 'other', token)['status'] == 'error'
+    assert resume(service, 'other-sid', 'guest', token, room='other-room')['status'] == 'error'
+    clock.advance(121)
+    assert resume(service, 'guest-sid-2', 'guest', token)['message'] == 'Invalid or expired resume token'
+
+
+def test_host_room_waits_for_resume_then_is_deleted(service, clock):
+    create(service)
+    service.disconnect('host-sid')
+    assert 'room' in service.rooms and 'room' in service.orphaned
+    clock.advance(60)
+    assert service.sweep() == [] and 'room' in service.rooms
+    clock.advance(61)
+    actions = service.sweep()
+    assert ('close_room', 'room') in actions
+    assert 'room' not in service.rooms
+
+
+def test_tokens_are_renewed_while_socket_is_connected(service, clock):
+    create(service)
+    clock.advance(70)
+    renewed = emitted(service.sweep(), 'resume_token', 'host-sid')
+    assert len(renewed) == 1 and renewed[0]['room'] == 'room'
+    clock.advance(100)  # первый токен уже истек, продленный действует
+    service.disconnect('host-sid')
+    resumed = resume(service, 'host-sid-2', 'host', renewed[0]['resume_token'])
+    assert resumed['status'] == 'success' and resumed['is_host']
+
+
+def test_host_without_tokens_takes_room_down(make_service, clock):
+    service = make_service(tokens=ResumeTokens('test-secret', ttl=0, clock=clock))
+    assert create(service) is None
+    service.disconnect('host-sid')
+    assert 'room' not in service.rooms
+
+
+def test_throttled_requests_get_an_error_reply(make_service, clock):
+    limiter = RateLimiter({'join': (1, 1), 'resume': (1, 1), 'signal': (1, 1)}, clock=clock)
+    service = make_service(limiter=limiter)
+    create(service)
+    assert join(service, 'host-sid', 'again')['message'] == 'Rate limited'
+    resume(service, 'guest-sid', 'guest', 'bad')
+    assert resume(service, 'guest-sid', 'guest', 'bad')['message'] == 'Rate limited'
+    signal = {'room': 'room', 'target': 'host', 'sender': 'guest', 'type': 'offer', 'data': {}}
+    service.signal('guest-sid', signal)
+    assert service.signal('guest-sid', signal) == []